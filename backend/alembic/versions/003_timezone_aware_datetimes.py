@@ -0,0 +1,58 @@
+"""Store all datetime columns as timezone-aware UTC
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+DATETIME_COLUMNS = {
+    'clients': ['created_at', 'updated_at'],
+    'appointments': ['time', 'reminder_time', 'created_at', 'updated_at'],
+    'analytics': ['date', 'created_at'],
+}
+
+# Zone the existing naive values were written in (the server clock; UTC in our containers)
+LEGACY_TIMEZONE = os.getenv('LEGACY_DATA_TIMEZONE', 'UTC')
+
+
+def upgrade() -> None:
+    # SQLite has no timestamptz; naive values there are already read back as UTC
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    
+    for table, columns in DATETIME_COLUMNS.items():
+        for column in columns:
+            op.alter_column(
+                table,
+                column,
+                type_=sa.DateTime(timezone=True),
+                existing_type=sa.DateTime(),
+                postgresql_using=f"{column} AT TIME ZONE '{LEGACY_TIMEZONE}'"
+            )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    
+    for table, columns in DATETIME_COLUMNS.items():
+        for column in columns:
+            op.alter_column(
+                table,
+                column,
+                type_=sa.DateTime(),
+                existing_type=sa.DateTime(timezone=True),
+                postgresql_using=f"{column} AT TIME ZONE 'UTC'"
+            )
@@ -0,0 +1,80 @@
+"""Soft delete: deleted_at, live-row partial indexes and archived_records
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text('is_active = true')
+
+
+def upgrade() -> None:
+    is_postgres = op.get_bind().dialect.name == 'postgresql'
+    
+    for table in ('clients', 'appointments'):
+        op.execute(f"UPDATE {table} SET is_active = true WHERE is_active IS NULL")
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+            batch_op.alter_column(
+                'is_active',
+                existing_type=sa.Boolean(),
+                nullable=False,
+                server_default=sa.true()
+            )
+    
+    # Email uniqueness now only applies to live clients
+    if is_postgres:
+        op.drop_constraint('clients_email_key', 'clients', type_='unique')
+    
+    op.create_index('ix_clients_email_live', 'clients', ['email'], unique=True,
+                    postgresql_where=LIVE, sqlite_where=LIVE)
+    op.create_index('ix_clients_created_at_live', 'clients', ['created_at'],
+                    postgresql_where=LIVE, sqlite_where=LIVE)
+    op.create_index('ix_appointments_client_time_live', 'appointments', ['client_id', 'time'],
+                    postgresql_where=LIVE, sqlite_where=LIVE)
+    op.create_index('ix_appointments_time_live', 'appointments', ['time'],
+                    postgresql_where=LIVE, sqlite_where=LIVE)
+    op.create_index('ix_appointments_deleted_at', 'appointments', ['deleted_at'],
+                    postgresql_where=sa.text('deleted_at IS NOT NULL'),
+                    sqlite_where=sa.text('deleted_at IS NOT NULL'))
+    
+    op.create_table(
+        'archived_records',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('table_name', sa.String(50), nullable=False),
+        sa.Column('record_id', sa.String(), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(timezone=True)),
+        sa.Column('archived_at', sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('archived_records')
+    
+    op.drop_index('ix_appointments_deleted_at', table_name='appointments')
+    op.drop_index('ix_appointments_time_live', table_name='appointments')
+    op.drop_index('ix_appointments_client_time_live', table_name='appointments')
+    op.drop_index('ix_clients_created_at_live', table_name='clients')
+    op.drop_index('ix_clients_email_live', table_name='clients')
+    
+    # Soft-deleted rows would block the global unique constraint, so remove them first
+    op.execute("DELETE FROM appointments WHERE is_active = false")
+    op.execute("DELETE FROM clients WHERE is_active = false")
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_unique_constraint('clients_email_key', 'clients', ['email'])
+    
+    for table in ('clients', 'appointments'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('is_active', existing_type=sa.Boolean(), nullable=True, server_default=None)
+            batch_op.drop_column('deleted_at')
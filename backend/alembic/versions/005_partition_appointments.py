@@ -0,0 +1,101 @@
+"""Range-partition appointments by month on time (Postgres)
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+import os
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = int(os.getenv('APPOINTMENT_PARTITION_MONTHS_AHEAD', '13'))
+
+# Naming as in partition_service at this revision; inlined so the migration does not depend on app code
+DEFAULT_PARTITION = 'appointments_default'
+ARCHIVE_SCHEMA = 'archive'
+
+
+def _month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _create_partitions(first_month: datetime) -> None:
+    """Monthly partitions from first_month to MONTHS_AHEAD months from now (the default partition is still empty)"""
+    month = first_month
+    last = _add_months(_month_start(datetime.now(timezone.utc)), MONTHS_AHEAD)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE appointments_p{month.year:04d}{month.month:02d} PARTITION OF appointments "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+        month = upper
+
+
+def _create_indexes() -> None:
+    live = sa.text('is_active = true')
+    op.create_index('ix_appointments_id', 'appointments', ['id'])
+    op.create_index('ix_appointments_client_time_live', 'appointments', ['client_id', 'time'], postgresql_where=live)
+    op.create_index('ix_appointments_time_live', 'appointments', ['time'], postgresql_where=live)
+    op.create_index('ix_appointments_deleted_at', 'appointments', ['deleted_at'],
+                    postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+
+def upgrade() -> None:
+    # SQLite has no declarative partitioning; the table stays as it is there
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        return
+    
+    op.rename_table('appointments', 'appointments_legacy')
+    op.execute("ALTER INDEX appointments_pkey RENAME TO appointments_legacy_pkey")
+    
+    # The partition key has to be part of the primary key
+    op.execute(
+        "CREATE TABLE appointments (LIKE appointments_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (time)"
+    )
+    op.execute("ALTER TABLE appointments ADD PRIMARY KEY (id, time)")
+    op.create_foreign_key('appointments_client_id_fkey', 'appointments', 'clients', ['client_id'], ['id'])
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF appointments DEFAULT")
+    
+    oldest = conn.execute(sa.text("SELECT min(time) FROM appointments_legacy")).scalar()
+    _create_partitions(_month_start(oldest or datetime.now(timezone.utc)))
+    
+    op.execute("INSERT INTO appointments SELECT * FROM appointments_legacy")
+    op.drop_table('appointments_legacy')
+    _create_indexes()
+    
+    op.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    
+    # Archived partitions are left in the archive schema
+    op.rename_table('appointments', 'appointments_partitioned')
+    op.execute("ALTER INDEX appointments_pkey RENAME TO appointments_partitioned_pkey")
+    op.execute(
+        "CREATE TABLE appointments (LIKE appointments_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    op.execute("INSERT INTO appointments SELECT * FROM appointments_partitioned")
+    op.execute("DROP TABLE appointments_partitioned CASCADE")
+    op.execute("ALTER TABLE appointments ADD PRIMARY KEY (id)")
+    op.create_foreign_key('appointments_client_id_fkey', 'appointments', 'clients', ['client_id'], ['id'])
+    _create_indexes()
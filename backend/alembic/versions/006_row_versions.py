@@ -0,0 +1,28 @@
+"""Row versions on clients and appointments for ETags
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The server default fills existing rows (and every appointments partition)
+    for table in ('clients', 'appointments'):
+        op.add_column(table, sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    for table in ('clients', 'appointments'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version')
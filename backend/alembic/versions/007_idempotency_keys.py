@@ -0,0 +1,35 @@
+"""Idempotency keys for client and appointment creation
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('key', sa.String(255), primary_key=True),
+        sa.Column('request_hash', sa.String(64), nullable=False),
+        sa.Column('status_code', sa.Integer()),
+        sa.Column('content_type', sa.String(100)),
+        sa.Column('response_body', sa.LargeBinary()),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
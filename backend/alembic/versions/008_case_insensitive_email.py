@@ -0,0 +1,92 @@
+"""Lowercase client emails and make live emails unique case-insensitively
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text('is_active = true')
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+
+def _drop_sqlite_email_unique(conn) -> None:
+    """Drop the unnamed UNIQUE(email) SQLite databases keep from the baseline schema (004 only drops it on Postgres)
+
+    SQLite cannot drop a constraint in place, so the table is rebuilt; its partial
+    indexes are dropped first and recreated afterwards to keep their WHERE clauses.
+    """
+    uniques = sa.inspect(conn).get_unique_constraints('clients')
+    if not any(unique['column_names'] == ['email'] for unique in uniques):
+        return
+    op.drop_index('ix_clients_created_at_live', table_name='clients')
+    with op.batch_alter_table('clients', naming_convention={'uq': 'uq_%(table_name)s_%(column_0_name)s'}) as batch_op:
+        batch_op.drop_constraint('uq_clients_email', type_='unique')
+    op.create_index('ix_clients_created_at_live', 'clients', ['created_at'], sqlite_where=LIVE)
+
+
+def _merge_duplicate_clients(conn) -> None:
+    """Keep the oldest live client per lowercased email; move the others' appointments to it and soft-delete them"""
+    rows = conn.execute(sa.text(
+        "SELECT id, email FROM clients WHERE is_active = true ORDER BY created_at, id"
+    )).fetchall()
+    by_email = defaultdict(list)
+    for client_id, email in rows:
+        by_email[email.strip().lower()].append(client_id)
+
+    deleted_at = datetime.now(timezone.utc)
+    if conn.dialect.name == 'sqlite':
+        deleted_at = deleted_at.replace(tzinfo=None)  # stored as naive UTC, see UTCDateTime
+    for keeper, *duplicates in by_email.values():
+        for duplicate in duplicates:
+            moved = conn.execute(
+                sa.text("SELECT id FROM appointments WHERE client_id = :duplicate AND is_active = true ORDER BY time"),
+                {"duplicate": duplicate}
+            ).scalars().all()
+            if moved:
+                # The kept client may now have overlapping bookings
+                logger.warning(
+                    f"Moved appointments {', '.join(moved)} of duplicate client {duplicate} to {keeper}; "
+                    "check them for overlaps"
+                )
+            conn.execute(
+                sa.text("UPDATE appointments SET client_id = :keeper WHERE client_id = :duplicate"),
+                {"keeper": keeper, "duplicate": duplicate}
+            )
+            conn.execute(
+                sa.text("UPDATE clients SET is_active = false, deleted_at = :deleted_at WHERE id = :duplicate"),
+                {"deleted_at": deleted_at, "duplicate": duplicate}
+            )
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    op.drop_index('ix_clients_email_live', table_name='clients')
+    if conn.dialect.name == 'sqlite':
+        _drop_sqlite_email_unique(conn)
+    _merge_duplicate_clients(conn)
+    op.execute("UPDATE clients SET email = lower(trim(email)) WHERE email <> lower(trim(email))")
+
+    op.create_index('ix_clients_email_lower_live', 'clients', [sa.text('lower(email)')], unique=True,
+                    postgresql_where=LIVE, sqlite_where=LIVE)
+
+
+def downgrade() -> None:
+    # Emails stay lowercased, merged duplicates stay soft-deleted and SQLite keeps no global UNIQUE(email)
+    op.drop_index('ix_clients_email_lower_live', table_name='clients')
+    op.create_index('ix_clients_email_live', 'clients', ['email'], unique=True,
+                    postgresql_where=LIVE, sqlite_where=LIVE)
@@ -0,0 +1,68 @@
+"""Per-client appointment statistics table
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+# Mirrors client_stats_service._stats_select as of this revision; kept as SQL so
+# the migration does not depend on the current models
+BACKFILL = sa.text("""
+    INSERT INTO client_stats (
+        client_id, total_appointments, scheduled_appointments, completed_appointments,
+        cancelled_appointments, no_show_appointments, upcoming_appointments,
+        last_appointment_time, next_appointment_time, refreshed_at
+    )
+    SELECT
+        clients.id,
+        count(appointments.id),
+        coalesce(sum(CASE WHEN appointments.status = 'scheduled' THEN 1 ELSE 0 END), 0),
+        coalesce(sum(CASE WHEN appointments.status = 'completed' THEN 1 ELSE 0 END), 0),
+        coalesce(sum(CASE WHEN appointments.status = 'cancelled' THEN 1 ELSE 0 END), 0),
+        coalesce(sum(CASE WHEN appointments.status = 'no-show' THEN 1 ELSE 0 END), 0),
+        coalesce(sum(CASE WHEN appointments.status = 'scheduled' AND appointments.time > :now THEN 1 ELSE 0 END), 0),
+        max(appointments.time),
+        min(CASE WHEN appointments.status = 'scheduled' AND appointments.time > :now THEN appointments.time END),
+        :now
+    FROM clients
+    LEFT JOIN appointments ON appointments.client_id = clients.id AND appointments.is_active = true
+    GROUP BY clients.id
+""")
+
+
+def upgrade() -> None:
+    op.create_table(
+        'client_stats',
+        sa.Column('client_id', sa.String(), sa.ForeignKey('clients.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('total_appointments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('scheduled_appointments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed_appointments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cancelled_appointments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('no_show_appointments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('upcoming_appointments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_appointment_time', sa.DateTime(timezone=True)),
+        sa.Column('next_appointment_time', sa.DateTime(timezone=True)),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    # One row per existing client, from its live appointments
+    conn = op.get_bind()
+    now = datetime.now(timezone.utc)
+    if conn.dialect.name == 'sqlite':
+        now = now.replace(tzinfo=None)  # stored as naive UTC, see UTCDateTime
+    conn.execute(BACKFILL, {"now": now})
+
+
+def downgrade() -> None:
+    op.drop_table('client_stats')
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, Depends, Query # type: ignore
+from fastapi import APIRouter, Depends, HTTPException, Query # type: ignore
+from sqlalchemy import case, func # type: ignore
 from sqlalchemy.orm import Session # type: ignore
 from typing import Optional
 from datetime import datetime, timedelta
 
-from ..db.database import get_db
-from ..models.models import Client, Appointment, Analytics
+from ..db.database import get_read_db
+from ..core.timeutils import utc_now
+from ..core.metrics import metrics
+from ..core.rate_limit import COST_ANALYTICS, COST_REPORT, RateLimit
+from ..services.trends_service import resolve_timezone, bucketed_counts
+from ..models.models import Client, Appointment, Analytics, ClientStats
 from ..models.schemas import SystemAnalytics, ClientAnalytics, AppointmentAnalytics
 
 router = APIRouter()
 
-@router.get("/dashboard", response_model=SystemAnalytics)
-async def get_dashboard_analytics(db: Session = Depends(get_db)):
+@router.get("/dashboard", response_model=SystemAnalytics, dependencies=[Depends(RateLimit(COST_ANALYTICS))])
+async def get_dashboard_analytics(db: Session = Depends(get_read_db)):
     """Get comprehensive dashboard analytics"""
     # Client analytics
     total_clients = db.query(Client).count()
@@ -18,7 +23,7 @@ async def get_dashboard_analytics(db: Session = Depends(get_db)):
     inactive_clients = db.query(Client).filter(Client.status == "inactive").count()
     
     # New clients this month
-    start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start_of_month = utc_now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     new_clients_this_month = db.query(Client).filter(Client.created_at >= start_of_month).count()
     
     # Client growth rate
@@ -49,7 +54,7 @@ async def get_dashboard_analytics(db: Session = Depends(get_db)):
     cancelled_appointments = len([apt for apt in appointments if apt.status == "cancelled"])
     no_show_appointments = len([apt for apt in appointments if apt.status == "no-show"])
     
-    current_time = datetime.now()
+    current_time = utc_now()
     upcoming_appointments = len([apt for apt in appointments if apt.status == "scheduled" and apt.time > current_time])
     
     completion_rate = (completed_appointments / total_appointments * 100) if total_appointments > 0 else 0
@@ -66,13 +71,18 @@ async def get_dashboard_analytics(db: Session = Depends(get_db)):
         cancellation_rate=cancellation_rate
     )
     
-    # Performance metrics
+    # Performance metrics (measured by the metrics middleware since process start)
+    request_summary = metrics.summary()
     performance_metrics = {
         "system_uptime": 99.9,  # Mock value
-        "avg_response_time": 150,  # Mock value in ms
-        "active_sessions": 25,  # Mock value
-        "database_connections": 5,  # Mock value
-        "last_backup": datetime.now().isoformat(),
+        "uptime_seconds": request_summary["uptime_seconds"],
+        "avg_response_time": request_summary["avg_response_time"],  # ms
+        "avg_db_time": request_summary["avg_db_time"],  # ms
+        "avg_db_queries_per_request": request_summary["avg_db_queries_per_request"],
+        "total_requests": request_summary["total_requests"],
+        "active_sessions": request_summary["active_sessions"],
+        "database_connections": metrics.db_connections_in_use() or 0,
+        "last_backup": utc_now().isoformat(),
         "storage_used": "2.5GB",  # Mock value
         "storage_total": "10GB"  # Mock value
     }
@@ -83,160 +93,151 @@ async def get_dashboard_analytics(db: Session = Depends(get_db)):
         performance_metrics=performance_metrics
     )
 
-@router.get("/trends")
+@router.get("/trends", dependencies=[Depends(RateLimit(COST_ANALYTICS))])
 async def get_system_trends(
-    days: int = Query(30, description="Number of days to analyze"),
-    db: Session = Depends(get_db)
+    days: int = Query(30, ge=1, description="Number of days to analyze"),
+    granularity: str = Query("day", description="Bucket size: hour, day, week or month"),
+    tz: str = Query("UTC", description="IANA timezone used for bucketing"),
+    db: Session = Depends(get_read_db)
 ):
-    """Get system trends over time"""
-    end_date = datetime.now()
+    """Get system trends over time, bucketed in SQL with empty buckets filled"""
+    end_date = utc_now()
     start_date = end_date - timedelta(days=days)
     
-    # Client trends
-    clients = db.query(Client).filter(
-        Client.created_at >= start_date,
-        Client.created_at <= end_date
-    ).all()
+    try:
+        zone = resolve_timezone(tz)
+        client_series = bucketed_counts(
+            db, Client.created_at, start_date, end_date, granularity, zone,
+            [func.count(Client.id)]
+        )
+        appointment_series = bucketed_counts(
+            db, Appointment.time, start_date, end_date, granularity, zone,
+            [func.count(Appointment.id), func.sum(case((Appointment.status == "completed", 1), else_=0))]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Appointment trends
-    appointments = db.query(Appointment).filter(
-        Appointment.time >= start_date,
-        Appointment.time <= end_date
-    ).all()
+    buckets = []
+    for (bucket, (new_clients,)), (_, (appointment_count, completed)) in zip(client_series, appointment_series):
+        buckets.append({
+            "bucket": bucket.replace(tzinfo=zone).isoformat(),
+            "new_clients": new_clients,
+            "appointments": appointment_count,
+            "completed_appointments": completed
+        })
     
-    # Group by date
-    daily_stats = {}
-    for client in clients:
-        date_key = client.created_at.date().isoformat()
-        if date_key not in daily_stats:
-            daily_stats[date_key] = {
-                "new_clients": 0,
-                "appointments": 0,
-                "completed_appointments": 0
-            }
-        daily_stats[date_key]["new_clients"] += 1
+    total_new_clients = sum(bucket["new_clients"] for bucket in buckets)
+    total_appointments = sum(bucket["appointments"] for bucket in buckets)
     
-    for apt in appointments:
-        date_key = apt.time.date().isoformat()
-        if date_key not in daily_stats:
-            daily_stats[date_key] = {
-                "new_clients": 0,
-                "appointments": 0,
-                "completed_appointments": 0
-            }
-        daily_stats[date_key]["appointments"] += 1
-        if apt.status == "completed":
-            daily_stats[date_key]["completed_appointments"] += 1
-    
-    return {
+    response = {
         "period": {
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat(),
-            "days": days
+            "days": days,
+            "granularity": granularity,
+            "timezone": tz
         },
-        "daily_stats": daily_stats,
+        "buckets": buckets,
         "summary": {
-            "total_new_clients": len(clients),
-            "total_appointments": len(appointments),
-            "avg_daily_clients": len(clients) / days if days > 0 else 0,
-            "avg_daily_appointments": len(appointments) / days if days > 0 else 0
+            "total_new_clients": total_new_clients,
+            "total_appointments": total_appointments,
+            "avg_daily_clients": total_new_clients / days,
+            "avg_daily_appointments": total_appointments / days,
+            "avg_appointments_per_bucket": total_appointments / len(buckets) if buckets else 0
         }
     }
+    
+    # Keep the date-keyed map existing dashboards read
+    if granularity == "day":
+        response["daily_stats"] = {
+            bucket["bucket"][:10]: {key: value for key, value in bucket.items() if key != "bucket"}
+            for bucket in buckets
+        }
+    
+    return response
 
-@router.get("/reports/client-activity")
+@router.get("/reports/client-activity", dependencies=[Depends(RateLimit(COST_REPORT))])
 async def get_client_activity_report(
     client_id: Optional[str] = Query(None, description="Specific client ID"),
     date_from: Optional[datetime] = Query(None, description="Start date"),
     date_to: Optional[datetime] = Query(None, description="End date"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Generate client activity report"""
-    query = db.query(Appointment)
-    
-    if client_id:
-        query = query.filter(Appointment.client_id == client_id)
-    
-    if date_from is not None:
-        query = query.filter(Appointment.time >= date_from)
-    
-    if date_to is not None:
-        query = query.filter(Appointment.time <= date_to)
-    
-    appointments = query.all()
-    
-    # Group by client
-    client_activity = {}
-    for apt in appointments:
-        if apt.client_id not in client_activity:
-            client_activity[apt.client_id] = {
-                "total_appointments": 0,
-                "completed": 0,
-                "cancelled": 0,
-                "no_show": 0,
-                "last_appointment": None
-            }
-        
-        client_activity[apt.client_id]["total_appointments"] += 1
-        
-        if apt.status == "completed":
-            client_activity[apt.client_id]["completed"] += 1
-        elif apt.status == "cancelled":
-            client_activity[apt.client_id]["cancelled"] += 1
-        elif apt.status == "no-show":
-            client_activity[apt.client_id]["no_show"] += 1
-        
-        if (client_activity[apt.client_id]["last_appointment"] is None or 
-            apt.time > client_activity[apt.client_id]["last_appointment"]):
-            client_activity[apt.client_id]["last_appointment"] = apt.time
+    """Generate client activity report
+
+    Without a date range the counts come straight from client_stats;
+    with one they are aggregated in a single GROUP BY query.
+    """
+    if date_from is None and date_to is None:
+        query = db.query(
+            ClientStats.client_id,
+            ClientStats.total_appointments,
+            ClientStats.completed_appointments,
+            ClientStats.cancelled_appointments,
+            ClientStats.no_show_appointments,
+            ClientStats.last_appointment_time,
+            Client.name, Client.email, Client.status
+        ).join(Client, Client.id == ClientStats.client_id).filter(ClientStats.total_appointments > 0)
+        if client_id:
+            query = query.filter(ClientStats.client_id == client_id)
+    else:
+        query = db.query(
+            Appointment.client_id,
+            func.count(Appointment.id),
+            func.sum(case((Appointment.status == "completed", 1), else_=0)),
+            func.sum(case((Appointment.status == "cancelled", 1), else_=0)),
+            func.sum(case((Appointment.status == "no-show", 1), else_=0)),
+            func.max(Appointment.time),
+            Client.name, Client.email, Client.status
+        ).outerjoin(Client, Client.id == Appointment.client_id).group_by(
+            Appointment.client_id, Client.name, Client.email, Client.status
+        )
+        if client_id:
+            query = query.filter(Appointment.client_id == client_id)
+        if date_from is not None:
+            query = query.filter(Appointment.time >= date_from)
+        if date_to is not None:
+            query = query.filter(Appointment.time <= date_to)
     
-    # Add client details
-    for client_id, activity in client_activity.items():
-        client = db.query(Client).filter(Client.id == client_id).first()
-        if client:
-            activity["client_name"] = client.name
-            activity["client_email"] = client.email
-            activity["client_status"] = client.status
+    client_activity = []
+    for _, total, completed, cancelled, no_show, last_appointment, name, email, client_status in query.all():
+        activity = {
+            "total_appointments": total,
+            "completed": completed,
+            "cancelled": cancelled,
+            "no_show": no_show,
+            "last_appointment": last_appointment
+        }
+        # Add client details
+        if name is not None:
+            activity["client_name"] = name
+            activity["client_email"] = email
+            activity["client_status"] = client_status
+        client_activity.append(activity)
     
     return {
         "report_period": {
             "date_from": date_from.isoformat() if date_from else None,
             "date_to": date_to.isoformat() if date_to else None
         },
-        "client_activity": list(client_activity.values())
+        "client_activity": client_activity
     }
 
-@router.get("/reports/appointment-performance")
+@router.get("/reports/appointment-performance", dependencies=[Depends(RateLimit(COST_REPORT))])
 async def get_appointment_performance_report(
     date_from: Optional[datetime] = Query(None, description="Start date"),
     date_to: Optional[datetime] = Query(None, description="End date"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Generate appointment performance report"""
-    query = db.query(Appointment)
-    
-    if date_from is not None:
-        query = query.filter(Appointment.time >= date_from)
-    
-    if date_to is not None:
-        query = query.filter(Appointment.time <= date_to)
-    
-    appointments = query.all()
-    
-    # Calculate performance metrics
-    total_appointments = len(appointments)
-    completed = len([apt for apt in appointments if apt.status == "completed"])
-    cancelled = len([apt for apt in appointments if apt.status == "cancelled"])
-    no_show = len([apt for apt in appointments if apt.status == "no-show"])
-    scheduled = len([apt for apt in appointments if apt.status == "scheduled"])
+    # NumPy is only needed by this report, so load it on first use
+    from ..services.analytics_service import fetch_status_hour_columns, compute_performance
     
-    completion_rate = (completed / total_appointments * 100) if total_appointments > 0 else 0
-    cancellation_rate = (cancelled / total_appointments * 100) if total_appointments > 0 else 0
-    no_show_rate = (no_show / total_appointments * 100) if total_appointments > 0 else 0
-    
-    # Time-based analysis
-    morning_appointments = len([apt for apt in appointments if 6 <= apt.time.hour < 12])
-    afternoon_appointments = len([apt for apt in appointments if 12 <= apt.time.hour < 18])
-    evening_appointments = len([apt for apt in appointments if 18 <= apt.time.hour < 22])
+    # Columnar fetch of (status, hour) with vectorized counting instead of per-object loops
+    statuses, hours = fetch_status_hour_columns(db, date_from, date_to)
+    performance = compute_performance(statuses, hours)
+    totals = performance["totals"]
+    rates = performance["rates"]
     
     return {
         "report_period": {
@@ -244,21 +245,17 @@ async def get_appointment_performance_report(
             "date_to": date_to.isoformat() if date_to else None
         },
         "performance_metrics": {
-            "total_appointments": total_appointments,
-            "completion_rate": completion_rate,
-            "cancellation_rate": cancellation_rate,
-            "no_show_rate": no_show_rate,
-            "scheduled_appointments": scheduled
-        },
-        "time_distribution": {
-            "morning": morning_appointments,
-            "afternoon": afternoon_appointments,
-            "evening": evening_appointments
+            "total_appointments": totals["total_appointments"],
+            "completion_rate": rates["completion_rate"],
+            "cancellation_rate": rates["cancellation_rate"],
+            "no_show_rate": rates["no_show_rate"],
+            "scheduled_appointments": totals["scheduled"]
         },
+        "time_distribution": performance["time_distribution"],
         "status_breakdown": {
-            "completed": completed,
-            "cancelled": cancelled,
-            "no_show": no_show,
-            "scheduled": scheduled
+            "completed": totals["completed"],
+            "cancelled": totals["cancelled"],
+            "no_show": totals["no_show"],
+            "scheduled": totals["scheduled"]
         }
-    } 
\ No newline at end of file
+    }
\ No newline at end of file
@@ -1,23 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException, Query # type: ignore
-from sqlalchemy.orm import Session # type: ignore
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response # type: ignore
+from sqlalchemy import case, exists, func, or_, true, update # type: ignore
+from sqlalchemy.orm import Session, aliased # type: ignore
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
+import heapq
 import uuid
 
-from ..db.database import get_db
+from ..db.database import get_db, get_read_db
+from ..db.versioning import check_version, fingerprint_columns, versioned_update
 from ..models.models import Appointment, Client, Analytics
 from ..models.schemas import (
+    Client as ClientSchema,
     Appointment as AppointmentSchema, 
     AppointmentWithClient, 
     AppointmentCreate, 
     AppointmentUpdate,
     AppointmentAnalytics,
-    SystemAnalytics
+    SystemAnalytics,
+    BatchConflictCheck
 )
-from ..services.mock_api_service import MockAPIService
+from ..core.etag import etag_matches, make_etag, not_modified, validator_headers
+from ..core.rate_limit import COST_ANALYTICS, RateLimit
+from ..core.serialization import rows_response, schema_columns, select_fields
+from ..core.timeutils import utc_now, ensure_utc
+from ..services.client_stats_service import refresh_client_stats
+from ..services.trends_service import resolve_timezone, bucketed_counts
+from ..services.scheduling_service import fetch_busy_times, merge_intervals, find_free_slots, IntervalIndex
 
 router = APIRouter()
 
+# The appointment list selects these columns (or the fields= subset), with the client
+# outer-joined when any of its fields are requested, and serializes the row tuples directly
+APPOINTMENT_COLUMNS = schema_columns(Appointment, AppointmentSchema)
+CLIENT_COLUMNS = schema_columns(Client, ClientSchema)
+
+def _conflict_criteria(entity, client_id, appointment_time: datetime, appointment_duration: int = 60):
+    """Filters matching entity rows (Appointment or an alias) that overlap the given slot"""
+    return [
+        entity.client_id == client_id,
+        entity.status.in_(["scheduled", "completed"]),
+        entity.time < appointment_time + timedelta(minutes=appointment_duration),
+        entity.time > appointment_time - timedelta(minutes=60)  # Assume 60-minute appointments
+    ]
+
 def _check_appointment_conflicts_internal(
     client_id: str,
     appointment_time: datetime,
@@ -26,16 +51,9 @@ def _check_appointment_conflicts_internal(
     db: Session = None
 ):
     """Internal helper function to check for appointment conflicts"""
-    # Calculate time window
-    start_time = appointment_time
-    end_time = appointment_time + timedelta(minutes=appointment_duration)
-    
     # Query for conflicting appointments
     query = db.query(Appointment).filter(
-        Appointment.client_id == client_id,
-        Appointment.status.in_(["scheduled", "completed"]),
-        Appointment.time < end_time,
-        Appointment.time + timedelta(minutes=60) > start_time  # Assume 60-minute appointments
+        *_conflict_criteria(Appointment, client_id, appointment_time, appointment_duration)
     )
     
     if exclude_appointment_id:
@@ -63,10 +81,25 @@ async def get_appointments(
     date_from: Optional[datetime] = Query(None, description="Filter appointments from this date"),
     date_to: Optional[datetime] = Query(None, description="Filter appointments to this date"),
     is_recurring: Optional[bool] = Query(None, description="Filter by recurring appointments"),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return, e.g. time,status,client.name (id is always included); defaults to all"
+    ),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
     """Get all appointments with optional filtering"""
-    query = db.query(Appointment)
+    try:
+        keys, nested = select_fields(fields, APPOINTMENT_COLUMNS, {"client": CLIENT_COLUMNS})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    columns = [APPOINTMENT_COLUMNS[key] for key in keys]
+    client_keys = nested.get("client")
+    if client_keys:
+        columns += [CLIENT_COLUMNS[key] for key in client_keys]
+    query = db.query(*columns).select_from(Appointment)
+    if client_keys:
+        query = query.outerjoin(Appointment.client)
     
     if client_id:
         query = query.filter(Appointment.client_id == client_id)
@@ -83,8 +116,17 @@ async def get_appointments(
     if is_recurring is not None:
         query = query.filter(Appointment.is_recurring == is_recurring)
     
+    # Answer revalidations from aggregates before loading any rows
+    aggregates = fingerprint_columns(Appointment)
+    if client_keys:
+        aggregates += fingerprint_columns(Client)
+    fingerprint = tuple(query.with_entities(*aggregates).one())
+    etag = make_etag(fingerprint, keys, nested, client_id, status, date_from, date_to, is_recurring)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
     appointments = query.order_by(Appointment.time).all()
-    return appointments
+    return rows_response(appointments, keys, nested, headers=validator_headers(etag))
 
 @router.get("/conflicts")
 async def check_appointment_conflicts(
@@ -101,10 +143,7 @@ async def check_appointment_conflicts(
     
     # Query for conflicting appointments
     query = db.query(Appointment).filter(
-        Appointment.client_id == client_id,
-        Appointment.status.in_(["scheduled", "completed"]),
-        Appointment.time < end_time,
-        Appointment.time + timedelta(minutes=60) > start_time  # Assume 60-minute appointments
+        *_conflict_criteria(Appointment, client_id, appointment_time, appointment_duration)
     )
     
     if exclude_appointment_id:
@@ -125,11 +164,126 @@ async def check_appointment_conflicts(
         ]
     }
 
-@router.get("/analytics", response_model=AppointmentAnalytics)
+@router.post("/conflicts/batch")
+async def check_batch_conflicts(batch: BatchConflictCheck, db: Session = Depends(get_db)):
+    """Check many proposed appointments against existing bookings (and each other) at once"""
+    candidates = batch.candidates
+    if not candidates:
+        return {"total_candidates": 0, "conflicting_candidates": 0, "results": []}
+    
+    # Build the interval index from one range query over all affected clients
+    client_ids = list({candidate.client_id for candidate in candidates})
+    range_start = min(candidate.time for candidate in candidates)
+    range_end = max(candidate.time + timedelta(minutes=candidate.duration) for candidate in candidates)
+    index = IntervalIndex.build(db, client_ids, range_start, range_end)
+    
+    results = []
+    for position, candidate in enumerate(candidates):
+        overlapping = index.overlapping(
+            candidate.client_id,
+            candidate.time,
+            candidate.time + timedelta(minutes=candidate.duration),
+            candidate.exclude_appointment_id
+        )
+        results.append({
+            "index": position,
+            "client_id": candidate.client_id,
+            "time": candidate.time,
+            "has_conflicts": bool(overlapping),
+            "conflicts": [
+                {"id": appointment_id, "time": start, "status": status}
+                for appointment_id, start, status in overlapping
+            ],
+            "batch_conflicts": []
+        })
+    
+    if batch.check_within_batch:
+        # Sweep each client's candidates in start order, keeping the ones still running in a heap
+        by_client = {}
+        for position, candidate in enumerate(candidates):
+            by_client.setdefault(candidate.client_id, []).append(position)
+        for positions in by_client.values():
+            positions.sort(key=lambda p: candidates[p].time)
+            running = []
+            for position in positions:
+                start = candidates[position].time
+                while running and running[0][0] <= start:
+                    heapq.heappop(running)
+                for _, other in running:
+                    results[position]["batch_conflicts"].append(other)
+                    results[other]["batch_conflicts"].append(position)
+                heapq.heappush(running, (start + timedelta(minutes=candidates[position].duration), position))
+        for result in results:
+            if result["batch_conflicts"]:
+                result["batch_conflicts"].sort()
+                result["has_conflicts"] = True
+    
+    return {
+        "total_candidates": len(candidates),
+        "conflicting_candidates": sum(1 for result in results if result["has_conflicts"]),
+        "results": results
+    }
+
+@router.get("/availability")
+async def get_availability(
+    client_id: List[str] = Query(..., description="Client ID(s); slots are free for all listed clients"),
+    date_from: datetime = Query(..., description="Start of the search range"),
+    date_to: datetime = Query(..., description="End of the search range"),
+    duration: int = Query(60, ge=5, le=480, description="Slot duration in minutes"),
+    work_start: time = Query(time(9, 0), description="Start of working hours"),
+    work_end: time = Query(time(17, 0), description="End of working hours"),
+    slot_interval: int = Query(30, ge=5, le=480, description="Minutes between candidate slot starts"),
+    include_weekends: bool = Query(True, description="Offer slots on Saturdays and Sundays"),
+    tz: str = Query("UTC", description="IANA timezone of the working hours and days"),
+    db: Session = Depends(get_db)
+):
+    """Find free appointment slots for one or more clients in a date range (working hours in tz, slots in UTC)"""
+    try:
+        zone = resolve_timezone(tz)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    date_from = ensure_utc(date_from)
+    date_to = ensure_utc(date_to)
+    if date_to <= date_from:
+        raise HTTPException(status_code=400, detail="date_to must be after date_from")
+    if date_to - date_from > timedelta(days=92):
+        raise HTTPException(status_code=400, detail="Date range cannot exceed 92 days")
+    if work_end <= work_start:
+        raise HTTPException(status_code=400, detail="work_end must be after work_start")
+    
+    # One sorted range query, then merge every client's bookings into shared busy intervals
+    busy_times = fetch_busy_times(db, client_id, date_from, date_to)
+    busy = merge_intervals(list(heapq.merge(*busy_times.values())))
+    
+    slots = find_free_slots(
+        busy,
+        date_from,
+        date_to,
+        timedelta(minutes=duration),
+        work_start,
+        work_end,
+        timedelta(minutes=slot_interval),
+        include_weekends,
+        zone
+    )
+    
+    return {
+        "client_ids": client_id,
+        "period": {
+            "date_from": date_from.isoformat(),
+            "date_to": date_to.isoformat()
+        },
+        "duration": duration,
+        "timezone": tz,
+        "total_slots": len(slots),
+        "slots": [{"start": start, "end": end} for start, end in slots]
+    }
+
+@router.get("/analytics", response_model=AppointmentAnalytics, dependencies=[Depends(RateLimit(COST_ANALYTICS))])
 async def get_appointment_analytics(
     date_from: Optional[datetime] = Query(None, description="Start date for analytics"),
     date_to: Optional[datetime] = Query(None, description="End date for analytics"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """Get appointment analytics"""
     query = db.query(Appointment)
@@ -149,7 +303,7 @@ async def get_appointment_analytics(
     cancelled_appointments = len([apt for apt in appointments if apt.status == "cancelled"])
     no_show_appointments = len([apt for apt in appointments if apt.status == "no-show"])
     
-    current_time = datetime.now()
+    current_time = utc_now()
     upcoming_appointments = len([apt for apt in appointments if apt.status == "scheduled" and apt.time > current_time])
     
     completion_rate = (completed_appointments / total_appointments * 100) if total_appointments > 0 else 0
@@ -166,53 +320,65 @@ async def get_appointment_analytics(
         cancellation_rate=cancellation_rate
     )
 
-@router.get("/trends")
+@router.get("/trends", dependencies=[Depends(RateLimit(COST_ANALYTICS))])
 async def get_appointment_trends(
-    days: int = Query(30, description="Number of days to analyze"),
-    db: Session = Depends(get_db)
+    days: int = Query(30, ge=1, description="Number of days to analyze"),
+    granularity: str = Query("day", description="Bucket size: hour, day, week or month"),
+    tz: str = Query("UTC", description="IANA timezone used for bucketing"),
+    db: Session = Depends(get_read_db)
 ):
-    """Get appointment trends over time"""
-    end_date = datetime.now()
+    """Get appointment trends over time, bucketed in SQL with empty buckets filled"""
+    end_date = utc_now()
     start_date = end_date - timedelta(days=days)
     
-    # Get appointments in the date range
-    appointments = db.query(Appointment).filter(
-        Appointment.time >= start_date,
-        Appointment.time <= end_date
-    ).all()
+    def count_status(status):
+        return func.sum(case((Appointment.status == status, 1), else_=0))
     
-    # Group by date
-    daily_stats = {}
-    for apt in appointments:
-        date_key = apt.time.date().isoformat()
-        if date_key not in daily_stats:
-            daily_stats[date_key] = {
-                "total": 0,
-                "completed": 0,
-                "cancelled": 0,
-                "no_show": 0
-            }
-        
-        daily_stats[date_key]["total"] += 1
-        if apt.status == "completed":
-            daily_stats[date_key]["completed"] += 1
-        elif apt.status == "cancelled":
-            daily_stats[date_key]["cancelled"] += 1
-        elif apt.status == "no-show":
-            daily_stats[date_key]["no_show"] += 1
+    try:
+        zone = resolve_timezone(tz)
+        series = bucketed_counts(
+            db, Appointment.time, start_date, end_date, granularity, zone,
+            [func.count(Appointment.id), count_status("completed"), count_status("cancelled"), count_status("no-show")]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    buckets = [
+        {
+            "bucket": bucket.replace(tzinfo=zone).isoformat(),
+            "total": total,
+            "completed": completed,
+            "cancelled": cancelled,
+            "no_show": no_show
+        }
+        for bucket, (total, completed, cancelled, no_show) in series
+    ]
+    total_appointments = sum(bucket["total"] for bucket in buckets)
     
-    return {
+    response = {
         "period": {
             "start_date": start_date.isoformat(),
             "end_date": end_date.isoformat(),
-            "days": days
+            "days": days,
+            "granularity": granularity,
+            "timezone": tz
         },
-        "daily_stats": daily_stats,
+        "buckets": buckets,
         "summary": {
-            "total_appointments": len(appointments),
-            "avg_daily_appointments": len(appointments) / days if days > 0 else 0
+            "total_appointments": total_appointments,
+            "avg_daily_appointments": total_appointments / days,
+            "avg_appointments_per_bucket": total_appointments / len(buckets) if buckets else 0
         }
     }
+    
+    # Keep the date-keyed map existing dashboards read
+    if granularity == "day":
+        response["daily_stats"] = {
+            bucket["bucket"][:10]: {key: value for key, value in bucket.items() if key != "bucket"}
+            for bucket in buckets
+        }
+    
+    return response
 
 @router.post("/", response_model=AppointmentSchema)
 async def create_appointment(appointment_data: AppointmentCreate, db: Session = Depends(get_db)):
@@ -249,6 +415,7 @@ async def create_appointment(appointment_data: AppointmentCreate, db: Session =
     )
     
     db.add(appointment)
+    refresh_client_stats(db, [appointment_data.client_id])
     db.commit()
     db.refresh(appointment)
     return appointment
@@ -270,20 +437,21 @@ async def create_recurring_appointments(
     if count <= 0 or count > 52:  # Limit to 52 appointments max
         raise HTTPException(status_code=400, detail="Invalid appointment count")
     
+    if frequency not in ("daily", "weekly", "monthly"):
+        raise HTTPException(status_code=400, detail="Invalid recurring frequency")
+    
+    step = {"daily": timedelta(days=1), "weekly": timedelta(weeks=1), "monthly": timedelta(days=30)}[frequency]
+    series_end = base_appointment.time + step * (count - 1) + timedelta(minutes=60)
+    
+    # Load existing bookings for the whole series once instead of querying per occurrence
+    index = IntervalIndex.build(db, [base_appointment.client_id], base_appointment.time, series_end)
+    
     created_appointments = []
     current_time = base_appointment.time
     
     for i in range(count):
         # Check for conflicts
-        conflicts = _check_appointment_conflicts_internal(
-            base_appointment.client_id,
-            current_time,
-            60,
-            None,
-            db
-        )
-        
-        if not conflicts["has_conflicts"]:
+        if not index.overlapping(base_appointment.client_id, current_time, current_time + timedelta(minutes=60)):
             appointment_id = str(uuid.uuid4())
             appointment = Appointment(
                 id=appointment_id,
@@ -298,15 +466,10 @@ async def create_recurring_appointments(
             db.add(appointment)
             created_appointments.append(appointment)
         
-        # Calculate next appointment time
-        if frequency == "daily":
-            current_time += timedelta(days=1)
-        elif frequency == "weekly":
-            current_time += timedelta(weeks=1)
-        elif frequency == "monthly":
-            # Simple monthly increment (30 days)
-            current_time += timedelta(days=30)
+        # Calculate next appointment time (monthly is a simple 30-day increment)
+        current_time += step
     
+    refresh_client_stats(db, [base_appointment.client_id])
     db.commit()
     return {
         "message": f"Created {len(created_appointments)} recurring appointments",
@@ -314,57 +477,84 @@ async def create_recurring_appointments(
     }
 
 @router.get("/{appointment_id}", response_model=AppointmentWithClient)
-async def get_appointment(appointment_id: str, db: Session = Depends(get_db)):
+async def get_appointment(
+    appointment_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     """Get a specific appointment"""
+    versions = db.query(Appointment.version, Client.version).outerjoin(
+        Appointment.client
+    ).filter(Appointment.id == appointment_id).first()
+    if not versions:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    etag = make_etag(appointment_id, tuple(versions))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
     appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
+    response.headers.update(validator_headers(etag))
     return appointment
 
 @router.put("/{appointment_id}", response_model=AppointmentSchema)
 async def update_appointment(appointment_id: str, appointment_data: AppointmentUpdate, db: Session = Depends(get_db)):
-    """Update an appointment"""
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-    if not appointment:
-        raise HTTPException(status_code=404, detail="Appointment not found")
+    """Update an appointment in one UPDATE ... RETURNING; send version to reject concurrent edits with a 409"""
+    update_data = appointment_data.dict(exclude_unset=True)
+    expected_version = update_data.pop("version", None)
+    
+    # A new time must not overlap the client's other appointments; checked inside the UPDATE
+    criteria = []
+    if update_data.get("time") is not None:
+        other = aliased(Appointment)
+        criteria.append(or_(
+            Appointment.time == update_data["time"],
+            ~exists().where(
+                other.id != Appointment.id,
+                other.is_active == true(),
+                *_conflict_criteria(other, Appointment.client_id, update_data["time"], 60)
+            )
+        ))
     
-    # Check for conflicts if time is being changed
-    if appointment_data.time and appointment_data.time != appointment.time:
-        conflicts = _check_appointment_conflicts_internal(
-            appointment.client_id,
-            appointment_data.time,
-            60,
-            appointment_id,
-            db
-        )
-        
-        if conflicts["has_conflicts"]:
-            raise HTTPException(status_code=400, detail="Appointment conflicts with existing appointments")
+    # Moving an appointment to another client changes both clients' stats
+    previous_client_id = None
+    if "client_id" in update_data:
+        previous_client_id = db.query(Appointment.client_id).filter(Appointment.id == appointment_id).scalar()
     
-    # Update appointment fields
-    update_data = appointment_data.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(appointment, field, value)
+    appointment = versioned_update(db, Appointment, appointment_id, update_data, expected_version, *criteria)
+    if appointment is None:
+        if not check_version(db, Appointment, appointment_id, expected_version):
+            raise HTTPException(status_code=404, detail="Appointment not found")
+        raise HTTPException(status_code=400, detail="Appointment conflicts with existing appointments")
     
+    if update_data.keys() & {"client_id", "time", "status"}:
+        refresh_client_stats(db, [appointment["client_id"]] + ([previous_client_id] if previous_client_id else []))
     db.commit()
-    db.refresh(appointment)
     return appointment
 
 @router.delete("/{appointment_id}")
 async def delete_appointment(appointment_id: str, db: Session = Depends(get_db)):
-    """Delete an appointment"""
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-    if not appointment:
+    """Soft-delete an appointment"""
+    client_id = db.execute(
+        update(Appointment)
+        .where(Appointment.id == appointment_id, Appointment.is_active == True)
+        .values(is_active=False, deleted_at=utc_now())
+        .returning(Appointment.client_id),
+        execution_options={"synchronize_session": False}
+    ).scalar()
+    if client_id is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
-    db.delete(appointment)
+    refresh_client_stats(db, [client_id])
     db.commit()
     return {"message": "Appointment deleted successfully"}
 
 @router.get("/reminders/pending")
 async def get_pending_reminders(db: Session = Depends(get_db)):
     """Get appointments that need reminders sent"""
-    current_time = datetime.now()
+    current_time = utc_now()
     
     # Find appointments that need reminders (within next 24 hours, not sent yet)
     reminder_cutoff = current_time + timedelta(hours=24)
@@ -390,11 +580,8 @@ async def get_pending_reminders(db: Session = Depends(get_db)):
 @router.post("/{appointment_id}/send-reminder")
 async def send_appointment_reminder(appointment_id: str, db: Session = Depends(get_db)):
     """Mark appointment reminder as sent"""
-    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-    if not appointment:
+    if versioned_update(db, Appointment, appointment_id, {"reminder_sent": True}) is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
-    
-    appointment.reminder_sent = True
     db.commit()
     
     return {"message": "Reminder marked as sent"}
\ No newline at end of file
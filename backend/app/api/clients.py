@@ -1,33 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Response # type: ignore
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response # type: ignore
+from fastapi.responses import StreamingResponse # type: ignore
 from sqlalchemy.orm import Session # type: ignore
 from typing import List, Optional
 from datetime import datetime, timezone, timedelta
 import uuid
-import csv
-import io
 
-from ..db.database import get_db
-from ..models.models import Client, Appointment, Analytics
+from ..db.database import get_db, get_read_db
+from ..db.versioning import check_version, fingerprint_columns, versioned_update
+from ..core.etag import etag_matches, make_etag, not_modified, validator_headers
+from ..core.rate_limit import COST_ANALYTICS, COST_EXPORT, RateLimit
+from ..core.serialization import rows_response, schema_columns, select_fields
+from ..core.timeutils import utc_now
+from ..services.client_stats_service import get_client_stats, refresh_client_stats
+from ..models.models import Client, Appointment, Analytics, ClientStats
 from ..models.schemas import (
     Client as ClientSchema, 
     ClientWithAppointments, 
     ClientCreate, 
     ClientUpdate,
-    ClientAnalytics
+    ClientAnalytics,
+    Appointment as AppointmentSchema
 )
 
 router = APIRouter()
 
+# List endpoints select just these columns (or the fields= subset) and serialize the row tuples directly
+CLIENT_COLUMNS = schema_columns(Client, ClientSchema)
+APPOINTMENT_COLUMNS = schema_columns(Appointment, AppointmentSchema)
+
+# Rows fetched and written per chunk of the streamed CSV export
+EXPORT_BATCH_SIZE = 1000
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return (id is always included); defaults to all"
+
+def _select_columns(fields: Optional[str], columns):
+    """Keys and columns for a fields= parameter, as a 400 if it names unknown fields"""
+    try:
+        keys, _ = select_fields(fields, columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return keys, [columns[key] for key in keys]
+
 @router.get("/", response_model=List[ClientSchema])
 async def get_clients(
     search: Optional[str] = Query(None, description="Search clients by name or email"),
     status: Optional[str] = Query(None, description="Filter by client status"),
     created_after: Optional[datetime] = Query(None, description="Filter clients created after this date"),
     created_before: Optional[datetime] = Query(None, description="Filter clients created before this date"),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
     """Get all clients with advanced filtering"""
-    query = db.query(Client)
+    keys, columns = _select_columns(fields, CLIENT_COLUMNS)
+    query = db.query(*columns)
     
     if search:
         query = query.filter(
@@ -45,55 +71,72 @@ async def get_clients(
     if created_before is not None:
         query = query.filter(Client.created_at <= created_before)
     
+    # Answer revalidations from aggregates before loading any rows
+    fingerprint = tuple(query.with_entities(*fingerprint_columns(Client)).one())
+    etag = make_etag(fingerprint, keys, search, status, created_after, created_before)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
     clients = query.order_by(Client.created_at.desc()).all()
-    return clients
+    return rows_response(clients, keys, headers=validator_headers(etag))
 
-@router.get("/export/csv")
+@router.get("/export/csv", dependencies=[Depends(RateLimit(COST_EXPORT))])
 async def export_clients_csv(
     status: Optional[str] = Query(None, description="Filter by client status"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    """Export clients to CSV format"""
-    query = db.query(Client)
+    """Export clients to CSV format, streamed in batches"""
+    # Only exports need the csv machinery
+    import csv
+    import io
+    
+    query = db.query(
+        Client.id, Client.name, Client.email, Client.phone, Client.status,
+        Client.notes, Client.created_at, Client.updated_at
+    )
     
     if status:
         query = query.filter(Client.status == status)
     
-    clients = query.all()
-    
-    # Create CSV content
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        'ID', 'Name', 'Email', 'Phone', 'Status', 
-        'Notes', 'Created At', 'Updated At'
-    ])
-    
-    # Write data
-    for client in clients:
+    def generate_rows():
+        output = io.StringIO()
+        writer = csv.writer(output)
+        
+        # Write header
         writer.writerow([
-            client.id,
-            client.name,
-            client.email,
-            client.phone or '',
-            client.status,
-            client.notes or '',
-            client.created_at.isoformat() if client.created_at else '',
-            client.updated_at.isoformat() if client.updated_at else ''
+            'ID', 'Name', 'Email', 'Phone', 'Status', 
+            'Notes', 'Created At', 'Updated At'
         ])
+        
+        # Write data, one chunk per batch of rows
+        result = db.execute(query.statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            for client_id, name, email, phone, client_status, notes, created_at, updated_at in rows:
+                writer.writerow([
+                    client_id,
+                    name,
+                    email,
+                    phone or '',
+                    client_status,
+                    notes or '',
+                    created_at.isoformat() if created_at else '',
+                    updated_at.isoformat() if updated_at else ''
+                ])
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+        
+        if output.tell():
+            yield output.getvalue()
     
-    output.seek(0)
-    
-    return Response(
-        content=output.getvalue(),
+    return StreamingResponse(
+        generate_rows(),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=clients_export.csv"}
     )
 
-@router.get("/analytics", response_model=ClientAnalytics)
-async def get_client_analytics(db: Session = Depends(get_db)):
+@router.get("/analytics", response_model=ClientAnalytics, dependencies=[Depends(RateLimit(COST_ANALYTICS))])
+async def get_client_analytics(db: Session = Depends(get_read_db)):
     """Get client analytics and statistics"""
     # Total clients
     total_clients = db.query(Client).count()
@@ -105,7 +148,7 @@ async def get_client_analytics(db: Session = Depends(get_db)):
     inactive_clients = db.query(Client).filter(Client.status == "inactive").count()
     
     # New clients this month
-    start_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start_of_month = utc_now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     new_clients_this_month = db.query(Client).filter(Client.created_at >= start_of_month).count()
     
     # Client growth rate (comparing to last month)
@@ -130,12 +173,7 @@ async def get_client_analytics(db: Session = Depends(get_db)):
 
 @router.post("/", response_model=ClientSchema)
 async def create_client(client_data: ClientCreate, db: Session = Depends(get_db)):
-    """Create a new client"""
-    # Check if client with same email already exists
-    existing_client = db.query(Client).filter(Client.email == client_data.email).first()
-    if existing_client:
-        raise HTTPException(status_code=400, detail="Client with this email already exists")
-    
+    """Create a new client; a duplicate email fails on the unique index and is reported as a 400"""
     # Generate unique ID
     client_id = str(uuid.uuid4())
     
@@ -148,102 +186,115 @@ async def create_client(client_data: ClientCreate, db: Session = Depends(get_db)
         notes=client_data.notes
     )
     db.add(client)
+    # Appointment writes lock this row while refreshing it, so every client starts with one
+    db.add(ClientStats(client_id=client_id))
     db.commit()
     db.refresh(client)
     return client
 
 @router.get("/{client_id}", response_model=ClientWithAppointments)
-async def get_client(client_id: str, db: Session = Depends(get_db)):
+async def get_client(
+    client_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
     """Get a specific client with their appointments"""
+    fingerprint = db.query(Client.version, *fingerprint_columns(Appointment)).outerjoin(
+        Client.appointments
+    ).filter(Client.id == client_id).group_by(Client.id).first()
+    if not fingerprint:
+        raise HTTPException(status_code=404, detail="Client not found")
+    etag = make_etag(client_id, tuple(fingerprint))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
     client = db.query(Client).filter(Client.id == client_id).first()
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
+    response.headers.update(validator_headers(etag))
     return client
 
 @router.put("/{client_id}", response_model=ClientSchema)
 async def update_client(client_id: str, client_data: ClientUpdate, db: Session = Depends(get_db)):
-    """Update a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    # Check if email is being changed and if it conflicts with another client
-    if client_data.email and client_data.email != client.email:
-        existing_client = db.query(Client).filter(
-            Client.email == client_data.email,
-            Client.id != client_id
-        ).first()
-        if existing_client:
-            raise HTTPException(status_code=400, detail="Client with this email already exists")
-    
-    # Update client fields
+    """Update a client in one UPDATE ... RETURNING; send version to reject concurrent edits with a 409"""
     update_data = client_data.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(client, field, value)
+    expected_version = update_data.pop("version", None)
+    
+    # A duplicate email fails on the unique index and is reported as a 400
+    client = versioned_update(db, Client, client_id, update_data, expected_version)
+    if client is None:
+        check_version(db, Client, client_id, expected_version)
+        raise HTTPException(status_code=404, detail="Client not found")
     
     db.commit()
-    db.refresh(client)
     return client
 
 @router.delete("/{client_id}")
 async def delete_client(client_id: str, db: Session = Depends(get_db)):
-    """Delete a client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
+    """Soft-delete a client together with their appointments"""
+    deleted_at = utc_now()
+    deleted = db.query(Client).filter(
+        Client.id == client_id,
+        Client.is_active == True
+    ).update({"is_active": False, "deleted_at": deleted_at}, synchronize_session=False)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    # Check if client has appointments
-    appointments = db.query(Appointment).filter(Appointment.client_id == client_id).count()
-    if appointments > 0:
-        raise HTTPException(status_code=400, detail="Cannot delete client with existing appointments")
-    
-    db.delete(client)
+    # Appointment history is kept until the retention job archives it
+    db.query(Appointment).filter(
+        Appointment.client_id == client_id,
+        Appointment.is_active == True
+    ).update({"is_active": False, "deleted_at": deleted_at}, synchronize_session=False)
+    refresh_client_stats(db, [client_id])
     db.commit()
     return {"message": "Client deleted successfully"}
 
-@router.get("/{client_id}/appointments")
-async def get_client_appointments(client_id: str, db: Session = Depends(get_db)):
+@router.get("/{client_id}/appointments", response_model=List[AppointmentSchema])
+async def get_client_appointments(
+    client_id: str,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
+):
     """Get appointments for a specific client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
+    keys, columns = _select_columns(fields, APPOINTMENT_COLUMNS)
+    client = db.query(Client.id).filter(Client.id == client_id).first()
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    appointments = db.query(Appointment).filter(
-        Appointment.client_id == client_id
-    ).order_by(Appointment.time).all()
+    query = db.query(*columns).filter(Appointment.client_id == client_id)
+    fingerprint = tuple(query.with_entities(*fingerprint_columns(Appointment)).one())
+    etag = make_etag(client_id, fingerprint, keys)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
     
-    return appointments
+    appointments = query.order_by(Appointment.time).all()
+    return rows_response(appointments, keys, headers=validator_headers(etag))
 
 @router.get("/{client_id}/analytics")
 async def get_single_client_analytics(client_id: str, db: Session = Depends(get_db)):
-    """Get analytics for a specific client"""
-    client = db.query(Client).filter(Client.id == client_id).first()
-    if not client:
+    """Get analytics for a specific client from its client_stats row"""
+    row = get_client_stats(db, client_id)
+    if row is None:
         raise HTTPException(status_code=404, detail="Client not found")
+    name, created_at, stats = row
     
-    # Get client's appointments
-    appointments = db.query(Appointment).filter(Appointment.client_id == client_id).all()
-    
-    # Calculate statistics
-    total_appointments = len(appointments)
-    completed_appointments = len([apt for apt in appointments if apt.status == "completed"])
-    cancelled_appointments = len([apt for apt in appointments if apt.status == "cancelled"])
-    no_show_appointments = len([apt for apt in appointments if apt.status == "no-show"])
-    current_time = datetime.now()
-    upcoming_appointments = len([apt for apt in appointments if apt.status == "scheduled" and apt.time > current_time])
-    
-    completion_rate = (completed_appointments / total_appointments * 100) if total_appointments > 0 else 0
-    cancellation_rate = (cancelled_appointments / total_appointments * 100) if total_appointments > 0 else 0
+    total_appointments = stats.total_appointments
+    completion_rate = (stats.completed_appointments / total_appointments * 100) if total_appointments > 0 else 0
+    cancellation_rate = (stats.cancelled_appointments / total_appointments * 100) if total_appointments > 0 else 0
     
     return {
         "client_id": client_id,
-        "client_name": client.name,
+        "client_name": name,
         "total_appointments": total_appointments,
-        "completed_appointments": completed_appointments,
-        "cancelled_appointments": cancelled_appointments,
-        "no_show_appointments": no_show_appointments,
-        "upcoming_appointments": upcoming_appointments,
+        "completed_appointments": stats.completed_appointments,
+        "cancelled_appointments": stats.cancelled_appointments,
+        "no_show_appointments": stats.no_show_appointments,
+        "upcoming_appointments": stats.upcoming_appointments,
         "completion_rate": completion_rate,
         "cancellation_rate": cancellation_rate,
-        "client_since": client.created_at.isoformat() if client.created_at is not None else None
-    }
\ No newline at end of file
+        "last_appointment_time": stats.last_appointment_time,
+        "next_appointment_time": stats.next_appointment_time,
+        "client_since": created_at.isoformat() if created_at is not None else None
+    }
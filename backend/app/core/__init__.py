@@ -1,5 +1,17 @@
 from .config import settings, Settings
-from .security import MockAPIClient
-from .logging import setup_logging
 
-__all__ = ["settings", "Settings", "MockAPIClient", "setup_logging"]
\ No newline at end of file
+__all__ = ["settings", "Settings", "MockAPIClient", "setup_logging"]
+
+# MockAPIClient pulls in httpx; load it (and setup_logging) only when asked for
+_LAZY_ATTRIBUTES = {
+    "MockAPIClient": ".security",
+    "setup_logging": ".logging",
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        import importlib
+
+        module = importlib.import_module(_LAZY_ATTRIBUTES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
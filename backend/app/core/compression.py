@@ -0,0 +1,196 @@
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import brotli # type: ignore
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Media types worth compressing; images, archives and the like are already compressed
+DEFAULT_CONTENT_TYPES = (
+    "application/json",
+    "text/csv",
+    "text/plain",
+    "text/html",
+    "text/css",
+    "application/javascript",
+)
+
+def parse_accept_encoding(header: str) -> dict:
+    """Accept-Encoding as {coding: q}"""
+    codings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+def choose_encoding(header: str, brotli_available: bool = brotli is not None) -> Optional[str]:
+    """br when the client accepts it and brotli is installed, else gzip, else None"""
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+    candidates = (["br"] if brotli_available else []) + ["gzip"]
+    accepted = [(codings.get(coding, wildcard), coding) for coding in candidates]
+    accepted = [(q, coding) for q, coding in accepted if q > 0]
+    if not accepted:
+        return None
+    # Highest q wins; ties keep the server's preference order
+    best = max(q for q, _ in accepted)
+    return next(coding for q, coding in accepted if q == best)
+
+class _Compressor:
+    """Incremental gzip or brotli encoder"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress data and flush it so the chunk can be sent on its own"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip
+
+    Only allow-listed content types are compressed, and only when the body
+    reaches minimum_size. Streaming responses are buffered until they cross
+    the threshold and then compressed and flushed chunk by chunk, so clients
+    keep receiving data as it is produced.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        content_types: Sequence[str] = DEFAULT_CONTENT_TYPES
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.content_types = tuple(content_types)
+
+    def _accept_encoding(self, scope) -> str:
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                return value.decode("latin-1")
+        return ""
+
+    def _compressible(self, scope, message) -> bool:
+        # HEAD, 204 and 304 carry no body; their Content-Length must stay as the app set it
+        if scope["method"] == "HEAD" or message["status"] in (204, 304):
+            return False
+        content_type = b""
+        for name, value in message.get("headers", []):
+            name = name.lower()
+            if name in (b"content-encoding", b"content-range"):
+                return False
+            if name == b"content-type":
+                content_type = value
+        media_type = content_type.split(b";", 1)[0].strip().decode("latin-1").lower()
+        return media_type in self.content_types
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(self._accept_encoding(scope))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        buffered: List[bytes] = []
+        buffered_size = 0
+        passthrough = False
+
+        async def send_start(headers: List[Tuple[bytes, bytes]]):
+            start_message["headers"] = headers
+            await send(start_message)
+
+        def compressed_headers(content_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+            headers = [
+                (name, value) for name, value in start_message.get("headers", [])
+                if name.lower() not in (b"content-length", b"vary")
+            ]
+            vary = [value for name, value in start_message.get("headers", []) if name.lower() == b"vary"]
+            headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+            if compressor is not None:
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+            if content_length is not None:
+                headers.append((b"content-length", str(content_length).encode("latin-1")))
+            return headers
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, buffered_size, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                passthrough = not self._compressible(scope, message)
+                if passthrough:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                buffered.append(body)
+                buffered_size += len(body)
+                if buffered_size < self.minimum_size:
+                    if more_body:
+                        return
+                    # Finished below the threshold: send as is
+                    content = b"".join(buffered)
+                    await send_start(compressed_headers(len(content)))
+                    await send({"type": "http.response.body", "body": content})
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                content = b"".join(buffered)
+                buffered.clear()
+                if not more_body:
+                    compressed = compressor.finish(content)
+                    await send_start(compressed_headers(len(compressed)))
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send_start(compressed_headers(None))
+                await send({"type": "http.response.body", "body": compressor.compress(content), "more_body": True})
+                return
+
+            if more_body:
+                chunk = compressor.compress(body)
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.finish(body)})
+
+        await self.app(scope, receive, send_wrapper)
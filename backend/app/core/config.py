@@ -15,6 +15,13 @@ class Settings(BaseSettings):
         "sqlite:///./app.db"  # Default to SQLite for development
     )
     
+    # Server Startup
+    seed_demo_data: bool = os.getenv("SEED_DEMO_DATA", "true").lower() == "true"
+    db_pool_warm_connections: int = int(os.getenv("DB_POOL_WARM_CONNECTIONS", "5"))
+    
+    # Server Shutdown (seconds to let in-flight requests finish on SIGTERM)
+    shutdown_drain_seconds: float = float(os.getenv("SHUTDOWN_DRAIN_SECONDS", "25"))
+    
     # Mock API Configuration
     mock_api_url: str = os.getenv("MOCK_API_URL", "https://your-mock-server-url.com")
     mock_api_key: str = os.getenv("MOCK_API_KEY", "safe-api-key-placeholder")
@@ -26,11 +33,69 @@ class Settings(BaseSettings):
     
     # Logging Configuration
     log_level: str = os.getenv("LOG_LEVEL", "INFO")
-    log_file: str = os.getenv("LOG_FILE", "app.log")
+    log_file: str = os.getenv("LOG_FILE", "app.log")  # empty logs to stdout only
+    log_format: str = os.getenv("LOG_FORMAT", "json")  # json or text
+    log_max_bytes: int = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # rotate the file at this size
+    log_backup_count: int = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    log_sample_rates: str = os.getenv("LOG_SAMPLE_RATES", "")  # fraction of DEBUG records kept per logger, e.g. "app.db.diagnostics=0.1"
+    
+    # Tracing (spans per route, SQL statement and external API call; see core/tracing.py)
+    tracing_enabled: bool = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))  # fraction of requests traced
+    trace_exporter: str = os.getenv("TRACE_EXPORTER", "file")  # file (JSON lines) or otlp (OTLP/HTTP JSON)
+    trace_file: str = os.getenv("TRACE_FILE", "traces.jsonl")
+    trace_otlp_endpoint: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    trace_service_name: str = os.getenv("TRACE_SERVICE_NAME", "wellness-api")
+    
+    # Read Replicas (comma-separated URLs; empty sends all reads to the primary)
+    database_replica_urls: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    replica_sticky_seconds: float = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+    replica_health_check_seconds: float = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "5"))
+    replica_retry_seconds: float = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+    
+    # Query Diagnostics (opt-in slow-query log and N+1 detection)
+    query_diagnostics: bool = os.getenv("QUERY_DIAGNOSTICS", "false").lower() == "true"
+    slow_query_threshold_ms: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+    repeated_query_threshold: int = int(os.getenv("REPEATED_QUERY_THRESHOLD", "5"))
+    query_explain: bool = os.getenv("QUERY_EXPLAIN", "false").lower() == "true"
+    
+    # Soft Delete Retention (deactivated rows are archived after this many days)
+    soft_delete_purge_enabled: bool = os.getenv("SOFT_DELETE_PURGE_ENABLED", "true").lower() == "true"
+    soft_delete_retention_days: int = int(os.getenv("SOFT_DELETE_RETENTION_DAYS", "90"))
+    soft_delete_purge_interval_hours: float = float(os.getenv("SOFT_DELETE_PURGE_INTERVAL_HOURS", "24"))
     
-    # Redis Configuration (for future use)
+    # Appointment Partitioning (Postgres; monthly partitions on appointments.time)
+    appointment_partition_months_ahead: int = int(os.getenv("APPOINTMENT_PARTITION_MONTHS_AHEAD", "13"))
+    appointment_archive_after_months: int = int(os.getenv("APPOINTMENT_ARCHIVE_AFTER_MONTHS", "0"))  # 0 keeps every month attached
+    appointment_archive_tablespace: Optional[str] = os.getenv("APPOINTMENT_ARCHIVE_TABLESPACE")
+    partition_maintenance_interval_hours: float = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL_HOURS", "24"))
+    
+    # Response Compression (brotli is used when installed, gzip otherwise)
+    compression_enabled: bool = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    compression_minimum_size: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))  # bytes
+    compression_gzip_level: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    compression_brotli_quality: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+    
+    # Rate Limiting (token bucket per client; expensive routes cost more tokens, see core/rate_limit.py)
+    rate_limit_enabled: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    rate_limit_capacity: float = float(os.getenv("RATE_LIMIT_CAPACITY", "100"))  # burst size in tokens
+    rate_limit_refill_per_second: float = float(os.getenv("RATE_LIMIT_REFILL_PER_SECOND", "2"))
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory (per worker) or redis (shared through REDIS_URL)
+    trusted_proxy_hops: int = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))  # proxies in front of the app (railway.json sets 1 for Railway's edge)
+    
+    # Idempotency Keys (POST /api/clients/ and /api/appointments/ replay the stored response for a repeated key)
+    idempotency_key_ttl_hours: float = float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+    idempotency_claim_lease_seconds: float = float(os.getenv("IDEMPOTENCY_CLAIM_LEASE_SECONDS", "60"))  # unfinished claims are retryable after this
+    idempotency_purge_interval_hours: float = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_HOURS", "1"))
+    
+    # Redis Configuration (rate limiting backend)
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     
+    @property
+    def replica_urls(self) -> List[str]:
+        """Read replica database URLs"""
+        return [url.strip() for url in self.database_replica_urls.split(",") if url.strip()]
+    
     @property
     def allowed_origins(self) -> List[str]:
         """Get all allowed origins including environment variable origins"""
@@ -1,13 +1,17 @@
 import logging
+import math
+import re
 import traceback
 from typing import Dict, Any, Optional
 from fastapi import HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError, OperationalError
 from pydantic import ValidationError
-import httpx
 from datetime import datetime
 
+from .logging import get_request_id
+from .tracing import current_span, current_trace_ids
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -53,16 +57,26 @@ class AuthorizationError(BaseCustomException):
 
 class RateLimitError(BaseCustomException):
     """Rate limiting errors"""
-    pass
+    def __init__(
+        self,
+        message: str,
+        error_code: Optional[str] = None,
+        details: Optional[Dict[str, Any]] = None,
+        retry_after: Optional[float] = None
+    ):
+        # Whole seconds, as sent in the Retry-After header
+        self.retry_after = math.ceil(retry_after) if retry_after is not None else None
+        if self.retry_after is not None:
+            details = {**(details or {}), "retry_after": self.retry_after}
+        super().__init__(message, error_code, details)
 
 class CircuitBreakerError(BaseCustomException):
     """Circuit breaker errors"""
     pass
 
 def log_error(error: Exception, request: Optional[Request] = None, context: Optional[Dict[str, Any]] = None):
-    """Log error with detailed context"""
+    """Log error with detailed context (the record carries the request ID)"""
     error_context = {
-        "timestamp": datetime.utcnow().isoformat(),
         "error_type": type(error).__name__,
         "error_message": str(error),
         "traceback": traceback.format_exc(),
@@ -76,17 +90,23 @@ def log_error(error: Exception, request: Optional[Request] = None, context: Opti
             "user_agent": request.headers.get("user-agent"),
         })
     
+    trace_id, span_id = current_trace_ids()
+    if trace_id:
+        error_context.update({"trace_id": trace_id, "span_id": span_id})
+    
     if context:
         error_context.update(context)
     
-    logger.error(f"Error occurred: {error_context}", extra=error_context)
+    # The context goes into structured fields rather than the message
+    logger.error(f"Error occurred: {error_context['error_type']}: {error_context['error_message']}", extra=error_context)
 
 def create_error_response(
     status_code: int,
     message: str,
     error_code: str = None,
     details: Dict[str, Any] = None,
-    request_id: str = None
+    request_id: str = None,
+    headers: Dict[str, str] = None
 ) -> JSONResponse:
     """Create standardized error response"""
     error_response = {
@@ -103,26 +123,51 @@ def create_error_response(
     if details:
         error_response["error"]["details"] = details
     
+    request_id = request_id or get_request_id()
     if request_id:
         error_response["error"]["request_id"] = request_id
     
     return JSONResponse(
         status_code=status_code,
-        content=error_response
+        content=error_response,
+        headers=headers
     )
 
+# Expression indexes are reported by name on SQLite, so map them to the field they guard
+UNIQUE_INDEX_FIELDS = {
+    "ix_clients_email_lower_live": "email",
+}
+
+def unique_violation_field(exc: IntegrityError) -> Optional[str]:
+    """Column named by a unique constraint violation ("unknown" if not reported), or None for other errors"""
+    message = str(exc.orig)
+    # SQLite: "UNIQUE constraint failed: clients.email" or "...: index 'ix_clients_email_lower_live'"
+    if "UNIQUE constraint failed" in message:
+        match = re.search(r"UNIQUE constraint failed: \w+\.(\w+)", message)
+        if match:
+            return match.group(1)
+        match = re.search(r"index '(\w+)'", message)
+        return UNIQUE_INDEX_FIELDS.get(match.group(1), "unknown") if match else "unknown"
+    # Postgres: SQLSTATE 23505, "DETAIL:  Key (email)=(...) already exists."
+    if getattr(exc.orig, "pgcode", None) == "23505" or "duplicate key value violates unique constraint" in message:
+        match = re.search(r"Key \((?:lower\()?(\w+)", message)
+        return match.group(1) if match else "unknown"
+    return None
+
 async def database_error_handler(request: Request, exc: SQLAlchemyError) -> JSONResponse:
     """Handle database errors"""
     log_error(exc, request, {"error_category": "database"})
     
     if isinstance(exc, IntegrityError):
         # Handle unique constraint violations, foreign key violations, etc.
-        if "UNIQUE constraint failed" in str(exc):
+        field = unique_violation_field(exc)
+        if field is not None:
+            # Writes rely on the unique indexes instead of checking first
             return create_error_response(
-                status_code=status.HTTP_409_CONFLICT,
-                message="Resource already exists",
+                status_code=status.HTTP_400_BAD_REQUEST,
+                message=f"A record with this {field} already exists" if field != "unknown" else "Resource already exists",
                 error_code="DUPLICATE_RESOURCE",
-                details={"field": "unknown", "value": "duplicate"}
+                details={"field": field, "value": "duplicate"}
             )
         elif "FOREIGN KEY constraint failed" in str(exc):
             return create_error_response(
@@ -195,11 +240,16 @@ async def custom_exception_handler(request: Request, exc: BaseCustomException) -
     
     status_code = status_mapping.get(type(exc), status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    headers = None
+    if isinstance(exc, RateLimitError) and exc.retry_after is not None:
+        headers = {"Retry-After": str(exc.retry_after)}
+    
     return create_error_response(
         status_code=status_code,
         message=exc.message,
         error_code=exc.error_code,
-        details=exc.details
+        details=exc.details,
+        headers=headers
     )
 
 async def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
@@ -232,25 +282,44 @@ class CircuitBreaker:
         self.state = "CLOSED"  # CLOSED, OPEN, HALF_OPEN
     
     def call(self, func, *args, **kwargs):
+        self._before_call()
+        
+        try:
+            result = func(*args, **kwargs)
+            self._on_success()
+            return result
+        except Exception as e:
+            self._on_failure()
+            raise e
+    
+    async def call_async(self, func, *args, **kwargs):
+        """Like call, for coroutine functions: the outcome is only known once awaited"""
+        self._before_call()
+        
+        try:
+            result = await func(*args, **kwargs)
+            self._on_success()
+            return result
+        except Exception as e:
+            self._on_failure()
+            raise e
+    
+    def _before_call(self):
         if self.state == "OPEN":
             if self._should_attempt_reset():
                 self.state = "HALF_OPEN"
+                current_span().add_event("circuit_breaker.half_open", {"failure_count": self.failure_count})
             else:
+                current_span().add_event("circuit_breaker.rejected", {"failure_count": self.failure_count})
                 raise CircuitBreakerError(
                     "Service temporarily unavailable",
                     error_code="CIRCUIT_BREAKER_OPEN",
                     details={"retry_after": self.recovery_timeout}
                 )
-        
-        try:
-            result = func(*args, **kwargs)
-            self._on_success()
-            return result
-        except Exception as e:
-            self._on_failure()
-            raise e
     
     def _on_success(self):
+        if self.state != "CLOSED":
+            current_span().add_event("circuit_breaker.closed")
         self.failure_count = 0
         self.state = "CLOSED"
     
@@ -259,6 +328,8 @@ class CircuitBreaker:
         self.last_failure_time = datetime.utcnow()
         
         if self.failure_count >= self.failure_threshold:
+            if self.state != "OPEN":
+                current_span().add_event("circuit_breaker.opened", {"failure_count": self.failure_count})
             self.state = "OPEN"
     
     def _should_attempt_reset(self):
@@ -291,6 +362,7 @@ class RetryHandler:
                 delay = min(self.base_delay * (2 ** attempt), self.max_delay)
                 
                 logger.warning(f"Attempt {attempt + 1} failed, retrying in {delay}s: {str(e)}")
+                current_span().add_event("retry", {"attempt": attempt + 1, "delay_seconds": delay, "error": str(e)})
                 
                 import asyncio
                 await asyncio.sleep(delay)
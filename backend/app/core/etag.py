@@ -0,0 +1,37 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Response # type: ignore
+
+# Browsers revalidate on every use instead of reusing the body heuristically
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    """Weak ETag over parts (versions, fingerprints, query parameters)
+
+    Weak, because the same representation may be sent gzip, brotli or
+    uncompressed.
+    """
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def validator_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag))
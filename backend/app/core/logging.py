@@ -1,25 +1,228 @@
+import atexit
+import copy
 import logging
+import os
+import queue
+import random
+import re
 import sys
+import traceback
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Dict, Optional
+
+import orjson # type: ignore
+
+from .config import settings
+
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+# ID of the request currently being served (None outside of requests)
+_current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+def get_request_id() -> Optional[str]:
+    return _current_request_id.get()
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, object]:
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES}
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, request_id and any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        for key, value in _extra_fields(record).items():
+            entry.setdefault(key, value)
+        return orjson.dumps(entry, default=str).decode()
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development; extra= fields are appended"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        line = super().format(record)
+        extra = _extra_fields(record)
+        return f"{line} | {extra}" if extra else line
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of DEBUG records from the configured loggers (and their children)"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first, so "app.db.diagnostics" wins over "app.db"
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + "."):
+                return random.random() < rate
+        return True
+
+class ContextQueueHandler(QueueHandler):
+    """Enqueue records with the request ID and message resolved in the calling thread
+
+    The listener thread has neither the caller's context variables nor a
+    guarantee that args are still unchanged, so both are fixed here.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.request_id = _current_request_id.get()
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """"app.db.diagnostics=0.1,app.services=0.5" -> {"app.db.diagnostics": 0.1, "app.services": 0.5}"""
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+def setup_logging(
+    level: Optional[str] = None,
+    log_file: Optional[str] = None,
+    log_format: Optional[str] = None
+) -> QueueListener:
+    """Route all logging through a queue to a background thread writing stdout and a rotating file
+
+    Loggers only enqueue records, so request handlers never wait on log I/O.
+    Calling it again returns the listener that is already running.
+    """
+    global _queue_handler
+    if _listener is not None:
+        return _listener
+
+    level = (level or settings.log_level).upper()
+    log_file = settings.log_file if log_file is None else log_file
+    formatter = JSONFormatter() if (log_format or settings.log_format) == "json" else TextFormatter()
+
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(RotatingFileHandler(
+            log_file,
+            maxBytes=settings.log_max_bytes,
+            backupCount=settings.log_backup_count,
+            encoding="utf-8"
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = ContextQueueHandler(queue.SimpleQueue())
+    sample_rates = parse_sample_rates(settings.log_sample_rates)
+    if sample_rates:
+        # Drop sampled-out records before they are enqueued
+        _queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
 
-def setup_logging():
-    """Setup logging configuration"""
-    # Create logs directory if it doesn't exist
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_dir / "app.log"),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
-    
     # Set specific log levels for different modules
     logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
-    
-    return logging.getLogger(__name__)
\ No newline at end of file
+
+    return _start_listener(handlers)
+
+def _start_listener(handlers) -> QueueListener:
+    global _listener
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def _restart_listener_after_fork():
+    """The listener thread does not survive fork(), so each child (e.g. a gunicorn worker) starts its own
+
+    Records the parent had queued but not yet written are left to the parent.
+    """
+    if _listener is not None:
+        _start_listener(_listener.handlers)
+
+def stop_logging():
+    """Write out what is queued and stop the listener; later records go straight to the handlers"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    for handler in listener.handlers:
+        for record_filter in _queue_handler.filters:
+            handler.addFilter(record_filter)
+        root.addHandler(handler)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+# Flush what is still queued when the process exits
+atexit.register(stop_logging)
+
+class RequestIDMiddleware:
+    """ASGI middleware giving each request an ID for its log records and error responses
+
+    A valid incoming X-Request-ID header is kept so IDs can be followed
+    across services; otherwise a new one is generated. Either way it is
+    echoed in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1").strip()
+                break
+        if request_id is None or not _VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, request_id.encode("latin-1"))]
+            await send(message)
+
+        token = _current_request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request_id.reset(token)
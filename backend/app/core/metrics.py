@@ -0,0 +1,224 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event # type: ignore
+from starlette.routing import Match # type: ignore
+
+# Latency histogram buckets in seconds (Prometheus defaults)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+class RequestStats:
+    """Database statistics collected while serving a single request"""
+    __slots__ = ("db_queries", "db_time")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+
+class RouteStats:
+    """Aggregated statistics for a single (method, route) pair"""
+    __slots__ = ("bucket_counts", "count", "latency_sum", "db_queries", "db_time", "response_bytes", "status_counts")
+
+    def __init__(self, bucket_count: int):
+        self.bucket_counts = [0] * bucket_count
+        self.count = 0
+        self.latency_sum = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.response_bytes = 0
+        self.status_counts: Dict[int, int] = {}
+
+# Stats of the request currently being served (None outside of requests)
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+class MetricsRegistry:
+    """In-process registry of per-route request and database metrics"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.started_at = time.time()
+        self.in_progress = 0
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+        self._lock = threading.Lock()
+        self._engines = []
+
+    def observe_request(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        duration: float,
+        response_bytes: int,
+        request_stats: RequestStats
+    ):
+        """Record a finished request"""
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None:
+                stats = self._routes[(method, route)] = RouteStats(len(self.buckets))
+
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    stats.bucket_counts[i] += 1
+                    break
+            stats.count += 1
+            stats.latency_sum += duration
+            stats.db_queries += request_stats.db_queries
+            stats.db_time += request_stats.db_time
+            stats.response_bytes += response_bytes
+            stats.status_counts[status_code] = stats.status_counts.get(status_code, 0) + 1
+
+    def bind_engine(self, engine):
+        """Attach SQLAlchemy event hooks that count queries and DB time per request (once per engine)"""
+        self._engines.append(engine)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            start_times = conn.info.get("metrics_query_start")
+            if not start_times:
+                return
+            elapsed = time.perf_counter() - start_times.pop()
+            request_stats = _current_request.get()
+            if request_stats is not None:
+                request_stats.db_queries += 1
+                request_stats.db_time += elapsed
+
+    def db_connections_in_use(self) -> Optional[int]:
+        """Number of pooled connections currently checked out, if the pool reports it"""
+        counts = [
+            engine.pool.checkedout()
+            for engine in self._engines
+            if hasattr(engine.pool, "checkedout")
+        ]
+        return sum(counts) if counts else None
+
+    def summary(self) -> Dict[str, float]:
+        """Aggregate figures across all routes for dashboard display"""
+        with self._lock:
+            total_requests = sum(stats.count for stats in self._routes.values())
+            total_latency = sum(stats.latency_sum for stats in self._routes.values())
+            total_queries = sum(stats.db_queries for stats in self._routes.values())
+            total_db_time = sum(stats.db_time for stats in self._routes.values())
+
+        return {
+            "total_requests": total_requests,
+            "avg_response_time": round(total_latency / total_requests * 1000, 2) if total_requests else 0,
+            "avg_db_queries_per_request": round(total_queries / total_requests, 2) if total_requests else 0,
+            "avg_db_time": round(total_db_time / total_requests * 1000, 2) if total_requests else 0,
+            "active_sessions": self.in_progress,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+        }
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            lines.append("# HELP http_request_duration_seconds Request latency by route")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (method, route), stats in routes:
+                labels = _labels(method=method, route=route)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, stats.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats.count}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {stats.latency_sum}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {stats.count}")
+
+            lines.append("# HELP http_requests_total Requests by route and status code")
+            lines.append("# TYPE http_requests_total counter")
+            for (method, route), stats in routes:
+                for status_code, count in sorted(stats.status_counts.items()):
+                    labels = _labels(method=method, route=route, status=str(status_code))
+                    lines.append(f"http_requests_total{{{labels}}} {count}")
+
+            counters = (
+                ("http_request_db_queries_total", "Database queries issued by route", "db_queries"),
+                ("http_request_db_duration_seconds_total", "Time spent in database queries by route", "db_time"),
+                ("http_response_size_bytes_total", "Response body bytes sent by route", "response_bytes"),
+            )
+            for name, help_text, attribute in counters:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (method, route), stats in routes:
+                    lines.append(f"{name}{{{_labels(method=method, route=route)}}} {getattr(stats, attribute)}")
+
+        lines.append("# HELP http_requests_in_progress Requests currently being served")
+        lines.append("# TYPE http_requests_in_progress gauge")
+        lines.append(f"http_requests_in_progress {self.in_progress}")
+
+        connections = self.db_connections_in_use()
+        if connections is not None:
+            lines.append("# HELP db_pool_connections_in_use Database connections checked out of the pool")
+            lines.append("# TYPE db_pool_connections_in_use gauge")
+            lines.append(f"db_pool_connections_in_use {connections}")
+
+        return "\n".join(lines) + "\n"
+
+def _labels(**labels: str) -> str:
+    """Format Prometheus labels, escaping quotes and backslashes"""
+    return ",".join(
+        '{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+
+def route_template(scope) -> str:
+    """Resolve the route path template (e.g. /api/clients/{client_id}) for a request"""
+    app = scope.get("app")
+    router = getattr(app, "router", None)
+    for route in getattr(router, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, DB usage and response size per route"""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(scope)
+        request_stats = RequestStats()
+        token = _current_request.set(request_stats)
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.in_progress += 1
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start_time
+            self.registry.in_progress -= 1
+            _current_request.reset(token)
+            self.registry.observe_request(
+                scope["method"], route, status_code, duration, response_bytes, request_stats
+            )
+
+# Process-wide registry shared by the middleware, /metrics and the dashboard
+metrics = MetricsRegistry()
@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from typing import Dict, Tuple
+
+from fastapi import Request # type: ignore
+
+from .config import settings
+from .error_handlers import RateLimitError
+
+logger = logging.getLogger(__name__)
+
+# Token costs of the expensive routes; each client's bucket holds
+# settings.rate_limit_capacity tokens and refills at rate_limit_refill_per_second
+COST_ANALYTICS = 5
+COST_REPORT = 10
+COST_EXPORT = 20
+COST_SYNC = 50
+
+class MemoryTokenBucket:
+    """Per-process token buckets keyed by client
+
+    With several workers each keeps its own buckets, so the effective limit
+    is multiplied by the worker count; use the Redis backend to share them.
+    """
+
+    def __init__(self, capacity: float, refill_rate: float, max_keys: int = 100000):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _evict_full(self, now: float):
+        """Forget buckets that have refilled completely; they behave like new ones"""
+        full_after = self.capacity / self.refill_rate
+        self._buckets = {
+            key: (tokens, updated) for key, (tokens, updated) in self._buckets.items()
+            if now - updated < full_after
+        }
+
+    async def acquire(self, key: str, cost: float) -> float:
+        """Take cost tokens; returns 0 on success or the seconds until they are available"""
+        cost = min(cost, self.capacity)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                if len(self._buckets) > self.max_keys:
+                    self._evict_full(now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / self.refill_rate
+
+# Refill and take atomically on the Redis server; returns the wait in milliseconds
+_REDIS_TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = math.ceil((cost - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return wait
+"""
+
+class RedisTokenBucket:
+    """Token buckets in Redis, shared by every worker and instance
+
+    Fails open: when Redis is unreachable
+    requests are let through and a warning is logged.
+    """
+
+    def __init__(self, url: str, capacity: float, refill_rate: float, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis # type: ignore
+
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET)
+
+    async def acquire(self, key: str, cost: float) -> float:
+        cost = min(cost, self.capacity)
+        try:
+            wait_ms = await self._script(keys=[self.prefix + key], args=[self.capacity, self.refill_rate, cost])
+        except Exception as e:
+            logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+            return 0.0
+        return int(wait_ms) / 1000
+
+    async def aclose(self):
+        await self._client.aclose()
+
+def create_rate_limiter():
+    """The backend selected by settings, or None when rate limiting is disabled"""
+    if not settings.rate_limit_enabled:
+        return None
+    if settings.rate_limit_backend == "redis":
+        return RedisTokenBucket(settings.redis_url, settings.rate_limit_capacity, settings.rate_limit_refill_per_second)
+    return MemoryTokenBucket(settings.rate_limit_capacity, settings.rate_limit_refill_per_second)
+
+rate_limiter = create_rate_limiter()
+
+def client_key(request: Request) -> str:
+    """Bucket key for the caller
+
+    Behind settings.trusted_proxy_hops proxies this is the X-Forwarded-For
+    entry appended by the outermost one; entries further left come from the
+    caller and are ignored. Without proxies it is the connecting address.
+    """
+    hops = settings.trusted_proxy_hops
+    if hops > 0:
+        forwarded = [
+            host.strip()
+            for header in request.headers.getlist("x-forwarded-for")
+            for host in header.split(",")
+            if host.strip()
+        ]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client else "unknown"
+
+class RateLimit:
+    """Route dependency charging cost tokens from the caller's bucket
+
+        @router.get("/export/csv", dependencies=[Depends(RateLimit(COST_EXPORT))])
+    """
+
+    def __init__(self, cost: float = 1):
+        self.cost = cost
+
+    async def __call__(self, request: Request):
+        if rate_limiter is None:
+            return
+        retry_after = await rate_limiter.acquire(client_key(request), self.cost)
+        if retry_after > 0:
+            raise RateLimitError(
+                "Too many requests, please retry later",
+                error_code="RATE_LIMITED",
+                retry_after=retry_after
+            )
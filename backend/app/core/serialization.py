@@ -0,0 +1,111 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson # type: ignore
+from fastapi import Response # type: ignore
+from fastapi.responses import ORJSONResponse # type: ignore
+
+from .tracing import tracer
+
+# Datetimes come back from UTCDateTime as aware UTC; Z matches Pydantic's JSON output
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+class APIJSONResponse(ORJSONResponse):
+    """Default response class: orjson instead of json.dumps"""
+
+    def render(self, content: Any) -> bytes:
+        with tracer.span("serialize") as span:
+            body = orjson.dumps(content, option=ORJSON_OPTIONS)
+            span.set_attribute("response.bytes", len(body))
+        return body
+
+def schema_columns(model, schema, exclude: Sequence[str] = ()) -> Dict[str, Any]:
+    """Model columns keyed by the fields of schema, in the schema's field order"""
+    return {name: getattr(model, name) for name in schema.model_fields if name not in exclude}
+
+def select_fields(
+    fields: Optional[str],
+    columns: Dict[str, Any],
+    nested: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Tuple[List[str], Dict[str, List[str]]]:
+    """Parse a sparse fieldset such as "time,status,client.name"
+
+    Returns the selected keys and, for each requested nested object, its
+    selected keys (a bare name like "client" selects all of them). Keys keep
+    the schema's order and id is always included. No fields selects
+    everything. Raises ValueError for unknown fields.
+    """
+    nested = nested or {}
+    if not fields or not fields.strip():
+        return list(columns), {name: list(nested_columns) for name, nested_columns in nested.items()}
+
+    selected = {"id"}
+    selected_nested: Dict[str, set] = {}
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            continue
+        name, _, sub_field = field.partition(".")
+        if name in nested:
+            chosen = selected_nested.setdefault(name, {"id"})
+            if not sub_field:
+                chosen.update(nested[name])
+            elif sub_field in nested[name]:
+                chosen.add(sub_field)
+            else:
+                raise ValueError(f"Unknown field: {field}")
+        elif not sub_field and name in columns:
+            selected.add(name)
+        else:
+            raise ValueError(f"Unknown field: {field}")
+
+    keys = [key for key in columns if key in selected]
+    nested_keys = {
+        name: [key for key in nested[name] if key in chosen]
+        for name, chosen in selected_nested.items()
+    }
+    return keys, nested_keys
+
+def rows_to_dicts(
+    rows: Iterable[Sequence],
+    keys: Sequence[str],
+    nested: Optional[Dict[str, Sequence[str]]] = None
+) -> List[Dict[str, Any]]:
+    """Turn row tuples into dicts keyed by keys
+
+    nested maps a key to the names of columns that follow keys in each row;
+    they become a sub-object, or None when they are all NULL (outer join miss).
+    """
+    if not nested:
+        return [dict(zip(keys, row)) for row in rows]
+
+    width = len(keys)
+    spans = []
+    for name, nested_keys in nested.items():
+        spans.append((name, nested_keys, width, width + len(nested_keys)))
+        width += len(nested_keys)
+
+    items = []
+    for row in rows:
+        item = dict(zip(keys, row))
+        for name, nested_keys, start, end in spans:
+            values = row[start:end]
+            item[name] = dict(zip(nested_keys, values)) if any(value is not None for value in values) else None
+        items.append(item)
+    return items
+
+def rows_response(
+    rows: Iterable[Sequence],
+    keys: Sequence[str],
+    nested: Optional[Dict[str, Sequence[str]]] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """JSON response built straight from row tuples
+
+    Skips ORM instances, response-model validation and jsonable_encoder, so
+    list endpoints must select exactly the columns of their response model.
+    """
+    return Response(
+        content=orjson.dumps(rows_to_dicts(rows, keys, nested), option=ORJSON_OPTIONS),
+        media_type="application/json",
+        headers=headers
+    )
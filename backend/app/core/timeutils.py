@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+def utc_now() -> datetime:
+    """Current time as a timezone-aware UTC datetime"""
+    return datetime.now(timezone.utc)
+
+def ensure_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalize a datetime to aware UTC; naive values are taken to already be UTC"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
@@ -0,0 +1,416 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson # type: ignore
+from sqlalchemy import event # type: ignore
+
+from .config import settings
+from .logging import get_request_id
+from .metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT_HEADER = b"traceparent"
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP span kinds and status codes
+SPAN_KINDS = {"internal": 1, "server": 2, "client": 3}
+STATUS_ERROR = 2
+
+MAX_STATEMENT_LENGTH = 2000
+
+class Span:
+    """A timed operation within a trace, exported once ended"""
+    __slots__ = ("tracer", "name", "kind", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "events", "error")
+
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, kind: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.events.append((time.time_ns(), name, attributes or {}))
+
+    def record_exception(self, exc: BaseException):
+        self.error = f"{type(exc).__name__}: {exc}"
+        self.add_event("exception", {"exception.type": type(exc).__name__, "exception.message": str(exc)})
+
+    def set_error(self, message: str):
+        self.error = message
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer.processor.submit(self)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "events": [{"time_ns": at, "name": name, "attributes": attributes} for at, name, attributes in self.events],
+            "error": self.error,
+        }
+
+class NonRecordingSpan:
+    """Stands in for spans of unsampled traces: keeps the trace ID, records nothing"""
+    __slots__ = ("trace_id", "span_id")
+
+    recording = False
+
+    def __init__(self, trace_id: Optional[str] = None, span_id: Optional[str] = None):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+    def end(self):
+        pass
+
+    def traceparent(self) -> Optional[str]:
+        return f"00-{self.trace_id}-{self.span_id}-00" if self.trace_id and self.span_id else None
+
+NON_RECORDING_SPAN = NonRecordingSpan()
+
+# Span of the operation currently running (None outside of traces)
+_current_span: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+class FileSpanExporter:
+    """Append spans as JSON lines to a local file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        with open(self.path, "ab") as trace_file:
+            trace_file.write(b"".join(orjson.dumps(span.to_dict(), default=str) + b"\n" for span in spans))
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+class OTLPSpanExporter:
+    """POST spans to an OTLP/HTTP collector in its JSON encoding (e.g. http://collector:4318/v1/traces)"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 10.0):
+        import httpx
+
+        self.endpoint = endpoint
+        self.resource = {"attributes": _otlp_attributes({"service.name": service_name})}
+        self.client = httpx.Client(timeout=timeout)
+
+    def export(self, spans: List[Span]):
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": SPAN_KINDS[span.kind],
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": _otlp_attributes(span.attributes),
+                "events": [
+                    {"timeUnixNano": str(at), "name": name, "attributes": _otlp_attributes(attributes)}
+                    for at, name, attributes in span.events
+                ],
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            if span.error:
+                otlp_span["status"] = {"code": STATUS_ERROR, "message": span.error}
+            otlp_spans.append(otlp_span)
+
+        payload = {"resourceSpans": [{
+            "resource": self.resource,
+            "scopeSpans": [{"scope": {"name": "wellness-api"}, "spans": otlp_spans}],
+        }]}
+        response = self.client.post(
+            self.endpoint, content=orjson.dumps(payload), headers={"Content-Type": "application/json"}
+        )
+        response.raise_for_status()
+
+class BatchSpanProcessor:
+    """Hand ended spans to a background thread that exports them in batches
+
+    Spans are dropped rather than queued without bound when the exporter
+    falls behind, so tracing can never slow requests down or exhaust memory.
+    """
+
+    def __init__(self, exporter, max_queue_size: int = 4096, batch_size: int = 512, interval: float = 2.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(max_queue_size)
+        self._flushed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def reset_after_fork(self):
+        """The exporter thread does not survive fork(); the child starts its own on its first span"""
+        self._queue = queue.Queue(self._queue.maxsize)
+        self._flushed = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, span: Span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(timeout=max(deadline - time.monotonic(), 0.01))
+                except queue.Empty:
+                    break
+                if span is None:
+                    self._export(batch)
+                    self._flushed.set()
+                    return
+                batch.append(span)
+            self._export(batch)
+
+    def _export(self, batch: List[Span]):
+        if not batch:
+            return
+        try:
+            self.exporter.export(batch)
+        except Exception as e:
+            logger.warning(f"Exporting {len(batch)} spans failed: {e}")
+
+    def shutdown(self, timeout: float = 5.0):
+        """Export what is queued and stop the thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._flushed.wait(timeout)
+
+class Tracer:
+    """Creates spans for sampled traces and passes them to the processor when they end
+
+    Sampling is decided once per trace at its root (or taken from an incoming
+    traceparent header); spans of unsampled traces cost one context lookup.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, processor: Optional[BatchSpanProcessor] = None):
+        self.sample_rate = sample_rate if processor is not None else 0.0
+        self.processor = processor
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def start_span(self, name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+                   parent: Optional[Any] = None, root: bool = True):
+        """Start a child of parent (default: the current span), or of nothing as a sampled-or-not root
+
+        With root=False no new trace is started, which keeps e.g. SQL run
+        outside any traced operation from producing single-span traces.
+        """
+        if parent is None:
+            parent = _current_span.get()
+        if parent is not None:
+            if not parent.recording:
+                return parent
+            return Span(self, name, kind, parent.trace_id, parent.span_id, attributes)
+        if not root or not self.enabled or random.random() >= self.sample_rate:
+            return NON_RECORDING_SPAN
+        return Span(self, name, kind, os.urandom(16).hex(), None, attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+             parent: Optional[Any] = None):
+        """Run the block as the current span, recording an exception raised from it"""
+        if not self.enabled:
+            yield NON_RECORDING_SPAN
+            return
+        span = self.start_span(name, kind, attributes, parent)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def bind_engine(self, engine):
+        """Record a client span per SQL statement run within a traced operation"""
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            span = self.start_span(statement.split(None, 1)[0].upper() if statement else "SQL", "client", root=False)
+            if span.recording:
+                span.attributes.update({
+                    "db.system": engine.dialect.name,
+                    "db.statement": statement[:MAX_STATEMENT_LENGTH],
+                    "db.executemany": executemany,
+                })
+            conn.info.setdefault("trace_spans", []).append(span)
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            spans = conn.info.get("trace_spans")
+            if spans:
+                span = spans.pop()
+                if span.recording and cursor.rowcount is not None and cursor.rowcount >= 0:
+                    span.set_attribute("db.rowcount", cursor.rowcount)
+                span.end()
+
+        @event.listens_for(engine, "handle_error")
+        def _handle_error(exception_context):
+            connection = exception_context.connection
+            spans = connection.info.get("trace_spans") if connection is not None else None
+            if spans:
+                span = spans.pop()
+                span.record_exception(exception_context.original_exception)
+                span.end()
+
+def current_span():
+    """The current span, or a non-recording one outside of traces"""
+    return _current_span.get() or NON_RECORDING_SPAN
+
+def current_trace_ids() -> Tuple[Optional[str], Optional[str]]:
+    """(trace_id, span_id) of the current span, for correlating logs with traces"""
+    span = _current_span.get()
+    return (span.trace_id, span.span_id) if span is not None else (None, None)
+
+def parse_traceparent(value: str) -> Optional[Any]:
+    """The remote parent described by a W3C traceparent header, or None if it is invalid"""
+    match = _TRACEPARENT.match(value.strip().lower())
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    trace_id, span_id, flags = match.groups()
+    if int(flags, 16) & 1:
+        return _RemoteParent(trace_id, span_id)
+    return NonRecordingSpan(trace_id, span_id)
+
+class _RemoteParent(NonRecordingSpan):
+    """A sampled parent span from another service"""
+    recording = True
+
+class TracingMiddleware:
+    """ASGI middleware running each request in a server span named after its route"""
+
+    def __init__(self, app, tracer: "Tracer"):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for name, value in scope.get("headers", []):
+            if name == TRACEPARENT_HEADER:
+                parent = parse_traceparent(value.decode("latin-1"))
+                break
+
+        route = route_template(scope)
+        attributes = {
+            "http.method": scope["method"],
+            "http.route": route,
+            "http.target": scope["path"],
+            "request_id": get_request_id(),
+        }
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with self.tracer.span(f"{scope['method']} {route}", "server", attributes, parent) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                span.set_attribute("http.status_code", status_code)
+                if status_code >= 500:
+                    span.set_error(f"HTTP {status_code}")
+
+def _create_processor() -> Optional[BatchSpanProcessor]:
+    if not settings.tracing_enabled:
+        return None
+    if settings.trace_exporter == "otlp":
+        exporter = OTLPSpanExporter(settings.trace_otlp_endpoint, settings.trace_service_name)
+    else:
+        exporter = FileSpanExporter(settings.trace_file)
+    processor = BatchSpanProcessor(exporter)
+    # Export what is still queued when the process exits
+    atexit.register(processor.shutdown)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=processor.reset_after_fork)
+    return processor
+
+# Process-wide tracer shared by the middleware, engines and the external API client
+tracer = Tracer(settings.trace_sample_rate, _create_processor())
@@ -1,3 +1,3 @@
-from .database import engine, SessionLocal, Base, get_db
+from .database import engine, SessionLocal, ReadSessionLocal, Base, get_db, get_read_db
 
-__all__ = ["engine", "SessionLocal", "Base", "get_db"] 
\ No newline at end of file
+__all__ = ["engine", "SessionLocal", "ReadSessionLocal", "Base", "get_db", "get_read_db"] 
\ No newline at end of file
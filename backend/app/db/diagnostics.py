@@ -0,0 +1,119 @@
+import logging
+import os
+import sys
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DB_DIR = os.path.join(_APP_DIR, "db")
+
+class RequestQueryLog:
+    """Statements executed while serving a single request"""
+    __slots__ = ("path", "statements", "call_sites")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.statements: Dict[str, int] = {}
+        self.call_sites: Dict[str, str] = {}
+
+# Query log of the request currently being served (None outside of requests)
+_current_log: ContextVar[Optional[RequestQueryLog]] = ContextVar("current_query_log", default=None)
+
+def _call_site() -> str:
+    """Return file:line of the innermost application frame that issued the query"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and not filename.startswith(_DB_DIR):
+            return f"{os.path.relpath(filename, _APP_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+def _explain(conn, statement: str, parameters: Any) -> Optional[List[Tuple]]:
+    """Fetch the query plan through the raw DBAPI cursor so no events are re-triggered"""
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+    except Exception as e:
+        logger.debug(f"EXPLAIN failed: {e}")
+        return None
+
+def enable_query_diagnostics(
+    engine,
+    slow_query_threshold_ms: float = 100.0,
+    repeated_query_threshold: int = 5,
+    explain: bool = False
+):
+    """Attach slow-query logging and repeated-statement tracking to an engine"""
+    threshold = slow_query_threshold_ms / 1000.0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("diagnostics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start_times = conn.info.get("diagnostics_query_start")
+        if not start_times:
+            return
+        elapsed = time.perf_counter() - start_times.pop()
+
+        query_log = _current_log.get()
+        if query_log is not None:
+            count = query_log.statements.get(statement, 0) + 1
+            query_log.statements[statement] = count
+            if count == repeated_query_threshold:
+                query_log.call_sites[statement] = _call_site()
+
+        if elapsed >= threshold:
+            plan = None
+            if explain and not executemany and statement.lstrip().upper().startswith("SELECT"):
+                plan = _explain(conn, statement, parameters)
+            logger.warning(
+                f"Slow query ({elapsed * 1000:.1f}ms) at {_call_site()}: {statement} "
+                f"params={parameters!r}" + (f" plan={plan!r}" if plan is not None else "")
+            )
+
+    logger.info(
+        f"Query diagnostics enabled (slow threshold {slow_query_threshold_ms}ms, "
+        f"repeat threshold {repeated_query_threshold}, explain={explain})"
+    )
+
+def report_repeated_queries(query_log: RequestQueryLog, repeated_query_threshold: int):
+    """Log statements executed repeatedly within one request (likely N+1 patterns)"""
+    for statement, count in query_log.statements.items():
+        if count >= repeated_query_threshold:
+            logger.warning(
+                f"Possible N+1 in {query_log.path}: statement executed {count} times, "
+                f"issued from {query_log.call_sites.get(statement, 'unknown')}: {statement}"
+            )
+
+class QueryDiagnosticsMiddleware:
+    """ASGI middleware scoping repeated-statement detection to a single request"""
+
+    def __init__(self, app, repeated_query_threshold: int = 5):
+        self.app = app
+        self.repeated_query_threshold = repeated_query_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        query_log = RequestQueryLog(f"{scope['method']} {scope['path']}")
+        token = _current_log.set(query_log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_log.reset(token)
+            report_repeated_queries(query_log, self.repeated_query_threshold)
@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
+
+from fastapi.responses import Response # type: ignore
+from sqlalchemy import and_, or_ # type: ignore
+from sqlalchemy.exc import IntegrityError # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+
+from ..core.error_handlers import create_error_response
+from ..core.timeutils import utc_now
+from ..models.models import IdempotencyRecord
+from .database import SessionLocal
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# (request_hash, status_code, content_type, response_body) of a stored key
+StoredResponse = Tuple[str, Optional[int], Optional[str], Optional[bytes]]
+
+def request_hash(method: str, path: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}\n".encode("latin-1"))
+    digest.update(body)
+    return digest.hexdigest()
+
+def reserve(
+    key: str,
+    fingerprint: str,
+    ttl: timedelta,
+    lease: timedelta
+) -> Tuple[Optional[datetime], Optional[StoredResponse]]:
+    """Claim key for a new request
+
+    Returns (claimed_at, None) when claimed, where claimed_at identifies the
+    claim in complete and release, else (None, what is stored under it).
+    The primary key makes the claim atomic, so of two concurrent requests
+    with the same key only one runs. Expired keys are taken over, and so are
+    claims still unfinished after lease (their worker died before storing
+    a response).
+    """
+    db = SessionLocal()
+    try:
+        for _ in range(3):
+            now = utc_now()
+            db.add(IdempotencyRecord(key=key, request_hash=fingerprint, created_at=now, expires_at=now + ttl))
+            try:
+                db.commit()
+                return now, None
+            except IntegrityError:
+                db.rollback()
+
+            taken_over = db.query(IdempotencyRecord).filter(
+                IdempotencyRecord.key == key,
+                or_(
+                    IdempotencyRecord.expires_at <= now,
+                    and_(IdempotencyRecord.status_code.is_(None), IdempotencyRecord.created_at <= now - lease)
+                )
+            ).update({
+                "request_hash": fingerprint,
+                "status_code": None,
+                "content_type": None,
+                "response_body": None,
+                "created_at": now,
+                "expires_at": now + ttl,
+            }, synchronize_session=False)
+            db.commit()
+            if taken_over:
+                return now, None
+
+            record = db.get(IdempotencyRecord, key)
+            if record is not None:
+                return None, (record.request_hash, record.status_code, record.content_type, record.response_body)
+            # Released by a failed request in the meantime; try to claim it again
+        raise RuntimeError(f"Could not claim idempotency key {key!r}")
+    finally:
+        db.close()
+
+def complete(key: str, claimed_at: datetime, status_code: int, content_type: Optional[str], body: bytes):
+    """Store the response of the request holding key (unless its claim was taken over)"""
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyRecord).filter(
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.created_at == claimed_at
+        ).update({
+            "status_code": status_code,
+            "content_type": content_type,
+            "response_body": body,
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def release(key: str, claimed_at: datetime):
+    """Drop an unfinished claim so the client can retry with the same key"""
+    db = SessionLocal()
+    try:
+        db.query(IdempotencyRecord).filter(
+            IdempotencyRecord.key == key,
+            IdempotencyRecord.created_at == claimed_at,
+            IdempotencyRecord.status_code.is_(None)
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def purge_expired_idempotency_keys(db: Session) -> int:
+    deleted = db.query(IdempotencyRecord).filter(
+        IdempotencyRecord.expires_at < utc_now()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+class IdempotencyMiddleware:
+    """ASGI middleware making POSTs to paths safe to retry with an Idempotency-Key header
+
+    The first request with a key runs and its response (anything but a 5xx)
+    is stored before it is sent. Retries with the same key and body get the
+    stored response without reaching the endpoint; a different body is a
+    422, and a retry while the first request is still running a 409. A claim
+    left unfinished for lease_seconds (the worker died) can be retried.
+    """
+
+    def __init__(self, app, paths: Iterable[str], ttl_seconds: float = 86400, lease_seconds: float = 60):
+        self.app = app
+        self.paths = {path.rstrip("/") for path in paths}
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.lease = timedelta(seconds=lease_seconds)
+
+    def _idempotency_key(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == IDEMPOTENCY_HEADER:
+                return value.decode("latin-1").strip()
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"].rstrip("/") not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = self._idempotency_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            response = create_error_response(
+                status_code=400,
+                message=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters",
+                error_code="INVALID_IDEMPOTENCY_KEY"
+            )
+            await response(scope, receive, send)
+            return
+
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        fingerprint = request_hash(scope["method"], scope["path"], body)
+
+        claimed_at, stored = await asyncio.to_thread(reserve, key, fingerprint, self.ttl, self.lease)
+        if stored is not None:
+            await self._replay(stored, fingerprint, scope, receive, send)
+            return
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        start_message = None
+        content_type = None
+        response_chunks = []
+        finished = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, content_type, finished
+            if message["type"] == "http.response.start":
+                start_message = message
+                for name, value in message.get("headers", []):
+                    if name.lower() == b"content-type":
+                        content_type = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    finished = True
+                    # Store before the client sees the response, so a retry can never miss it
+                    if start_message["status"] < 500:
+                        await asyncio.to_thread(
+                            complete, key, claimed_at, start_message["status"], content_type, b"".join(response_chunks)
+                        )
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        finally:
+            if not finished or start_message["status"] >= 500:
+                await asyncio.to_thread(release, key, claimed_at)
+
+    async def _replay(self, stored: StoredResponse, fingerprint: str, scope, receive, send):
+        stored_hash, status_code, content_type, response_body = stored
+        if stored_hash != fingerprint:
+            response = create_error_response(
+                status_code=422,
+                message="Idempotency-Key was already used with a different request",
+                error_code="IDEMPOTENCY_KEY_REUSED"
+            )
+        elif status_code is None:
+            response = create_error_response(
+                status_code=409,
+                message="A request with this Idempotency-Key is still in progress",
+                error_code="IDEMPOTENCY_KEY_IN_PROGRESS",
+                headers={"Retry-After": "1"}
+            )
+        else:
+            response = Response(
+                content=response_body,
+                status_code=status_code,
+                media_type=content_type,
+                headers={REPLAYED_HEADER: "true"}
+            )
+        await response(scope, receive, send)
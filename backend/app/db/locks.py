@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+
+from sqlalchemy import text # type: ignore
+
+@contextmanager
+def job_lock(engine, name: str):
+    """Hold a database-wide lock while a background job runs, yielding whether it was acquired
+
+    Every worker process starts the same background jobs; on Postgres an
+    advisory lock makes sure only one of them does the work per run.
+    Other databases are single-host here and always acquire.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(hashtext(:name))"), {"name": name}).scalar()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(hashtext(:name))"), {"name": name})
@@ -0,0 +1,192 @@
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from http.cookies import SimpleCookie
+from typing import List, Optional
+
+from sqlalchemy import event, text # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from sqlalchemy.sql import Select # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Cookie telling later requests from the same browser to read from the primary
+STICKY_COOKIE = "db_primary_until"
+
+# The same as a header, for cross-site clients whose fetch calls don't send cookies:
+# the response to a write carries it and the client echoes the latest value back
+STICKY_HEADER = b"x-db-primary-until"
+
+class RequestRouting:
+    """Per-request routing state shared between the middleware and sessions"""
+    __slots__ = ("sticky", "wrote")
+
+    def __init__(self, sticky: bool = False):
+        self.sticky = sticky
+        self.wrote = False
+
+_current_routing: ContextVar[Optional[RequestRouting]] = ContextVar("current_db_routing", default=None)
+
+class ReplicaSet:
+    """Round-robin over replica engines, skipping replicas that recently failed
+
+    A replica is probed with SELECT 1 at most once per check_interval; after a
+    failure it is skipped for retry_after seconds.
+    """
+
+    def __init__(self, engines: List, check_interval: float = 5.0, retry_after: float = 30.0):
+        self.engines = engines
+        self.check_interval = check_interval
+        self.retry_after = retry_after
+        self._cycle = itertools.cycle(range(len(engines))) if engines else None
+        self._last_ok = [0.0] * len(engines)
+        self._down_until = [0.0] * len(engines)
+        self._lock = threading.Lock()
+
+        for index, engine in enumerate(engines):
+            event.listen(engine, "handle_error", self._error_listener(index))
+
+    def _error_listener(self, index: int):
+        def _on_error(context):
+            if context.is_disconnect:
+                self.mark_down(index)
+        return _on_error
+
+    def mark_down(self, index: int):
+        self._down_until[index] = time.monotonic() + self.retry_after
+        logger.warning(f"Read replica {self.engines[index].url.render_as_string(hide_password=True)} marked unhealthy")
+
+    def _is_healthy(self, index: int) -> bool:
+        now = time.monotonic()
+        if now < self._down_until[index]:
+            return False
+        if now - self._last_ok[index] < self.check_interval:
+            return True
+        try:
+            with self.engines[index].connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except Exception:
+            self.mark_down(index)
+            return False
+        self._last_ok[index] = now
+        return True
+
+    def pick(self):
+        """Next healthy replica engine, or None when every replica is down"""
+        if not self._cycle:
+            return None
+        for _ in range(len(self.engines)):
+            with self._lock:
+                index = next(self._cycle)
+            if self._is_healthy(index):
+                return self.engines[index]
+        return None
+
+class RoutingSession(Session):
+    """Session that reads from a replica until it writes, then stays on the primary
+
+    Flushes, UPDATE/DELETE statements and anything that is not a SELECT go to
+    the primary. Sessions created while the request is sticky (it recently
+    wrote) use the primary throughout.
+    """
+
+    def __init__(self, *args, primary=None, replicas: ReplicaSet = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.primary = primary
+        self.replicas = replicas
+        routing = _current_routing.get()
+        self.use_primary = replicas is None or (routing is not None and routing.sticky)
+        self._replica = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.use_primary or self._flushing or not isinstance(clause, Select):
+            return self.primary
+        if self._replica is None:
+            self._replica = self.replicas.pick() or self.primary
+        return self._replica
+
+def _mark_written(session):
+    session.info["wrote"] = True
+    if isinstance(session, RoutingSession):
+        session.use_primary = True
+
+@event.listens_for(Session, "after_flush")
+def _flag_write(session, flush_context):
+    _mark_written(session)
+
+@event.listens_for(Session, "after_bulk_update")
+def _flag_bulk_update(update_context):
+    _mark_written(update_context.session)
+
+@event.listens_for(Session, "after_bulk_delete")
+def _flag_bulk_delete(delete_context):
+    _mark_written(delete_context.session)
+
+@event.listens_for(Session, "after_commit")
+def _record_write(session):
+    """Mark the current request as having written so the middleware can make it sticky"""
+    routing = _current_routing.get()
+    if routing is not None and session.info.pop("wrote", False):
+        routing.wrote = True
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware keeping a client on the primary for sticky_seconds after it writes
+
+    Stickiness travels in a cookie and an X-DB-Primary-Until header (the SPA
+    is on another site, so it echoes the header), so it holds across workers
+    and processes. Values further ahead than sticky_seconds are ignored, so
+    a client cannot pin itself to the primary.
+    """
+
+    def __init__(self, app, sticky_seconds: float = 5.0):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    def _is_sticky(self, scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == STICKY_HEADER:
+                if self._within_window(value.decode("latin-1")):
+                    return True
+            elif name == b"cookie":
+                cookie = SimpleCookie()
+                try:
+                    cookie.load(value.decode("latin-1"))
+                except Exception:
+                    continue
+                morsel = cookie.get(STICKY_COOKIE)
+                if morsel is not None and self._within_window(morsel.value):
+                    return True
+        return False
+
+    def _within_window(self, value: str) -> bool:
+        try:
+            until = float(value)
+        except ValueError:
+            return False
+        now = time.time()
+        return now < until <= now + self.sticky_seconds + 1
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        routing = RequestRouting(sticky=self._is_sticky(scope))
+        token = _current_routing.set(routing)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and routing.wrote:
+                until = time.time() + self.sticky_seconds
+                cookie = f"{STICKY_COOKIE}={until:.3f}; Max-Age={int(self.sticky_seconds) + 1}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"set-cookie", cookie.encode("latin-1")),
+                    (STICKY_HEADER, f"{until:.3f}".encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_routing.reset(token)
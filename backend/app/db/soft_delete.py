@@ -0,0 +1,34 @@
+from sqlalchemy import Boolean, Column, event, true # type: ignore
+from sqlalchemy.orm import Session, with_loader_criteria # type: ignore
+
+from .types import UTCDateTime
+
+# Execution option that disables the live-row filter, e.g.
+# db.query(Client).execution_options(include_inactive=True)
+INCLUDE_INACTIVE = "include_inactive"
+
+class SoftDeleteMixin:
+    """Rows are deactivated (is_active = false) instead of deleted and hidden from ORM queries"""
+    is_active = Column(Boolean, default=True, server_default=true(), nullable=False)
+    deleted_at = Column(UTCDateTime)
+
+@event.listens_for(Session, "do_orm_execute")
+def _filter_inactive_rows(execute_state):
+    """Add is_active = true for every soft-deletable entity in ORM SELECTs and relationship loads
+
+    The criteria attach to the entities a statement selects, so a select of
+    expressions only (e.g. case() or extract() over a column) needs its own
+    is_active filter.
+    """
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.execution_options.get(INCLUDE_INACTIVE, False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                SoftDeleteMixin,
+                lambda cls: cls.is_active == true(),
+                include_aliases=True
+            )
+        )
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Optional, Tuple
+
+from sqlalchemy import inspect, text # type: ignore
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_REVISION = re.compile(r"^(down_revision|revision)\s*=\s*['\"]?([\w]+)['\"]?", re.MULTILINE)
+
+def alembic_head() -> Optional[str]:
+    """Head revision of the migration scripts shipped with the app
+
+    Reads the revision identifiers from the script files instead of loading
+    them through Alembic, which would import every migration at boot.
+    """
+    revisions, parents = set(), set()
+    versions_dir = os.path.join(BACKEND_DIR, "alembic", "versions")
+    for filename in os.listdir(versions_dir):
+        if not filename.endswith(".py"):
+            continue
+        with open(os.path.join(versions_dir, filename)) as f:
+            for key, value in _REVISION.findall(f.read()):
+                if key == "revision":
+                    revisions.add(value)
+                elif value != "None":
+                    parents.add(value)
+    heads = revisions - parents
+    return heads.pop() if len(heads) == 1 else None
+
+def schema_revision(engine) -> Tuple[Optional[str], Optional[str]]:
+    """(current, head) Alembic revisions; current is None when the database is not migration-managed"""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table("alembic_version"):
+            return None, None
+        current = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    return current, alembic_head()
+
+def prepare_schema(engine, metadata):
+    """Create tables with create_all only for databases that Alembic does not manage
+
+    A migrated database at head needs nothing; one behind head is left to
+    alembic upgrade, since create_all would create tables the pending
+    migrations then fail to add.
+    """
+    current, head = schema_revision(engine)
+    if current is None:
+        metadata.create_all(bind=engine)
+        logger.info("Database tables created successfully")
+    elif current == head:
+        logger.info(f"Database schema at Alembic head {head}; skipping create_all")
+    else:
+        logger.warning(f"Database schema at revision {current}, head is {head}; run 'alembic upgrade head'")
+
+async def warm_pool(engine, connections: int) -> int:
+    """Open up to connections pooled connections concurrently so early requests skip connecting"""
+    def _connect():
+        conn = engine.connect()
+        conn.execute(text("SELECT 1"))
+        return conn
+
+    results = await asyncio.gather(
+        *(asyncio.to_thread(_connect) for _ in range(connections)),
+        return_exceptions=True
+    )
+    opened = [conn for conn in results if not isinstance(conn, BaseException)]
+    for conn in opened:
+        conn.close()
+    if len(opened) < connections:
+        errors = [str(result) for result in results if isinstance(result, BaseException)]
+        logger.warning(f"Warmed {len(opened)}/{connections} connections: {errors[0]}")
+    return len(opened)
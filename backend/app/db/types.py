@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy import DateTime # type: ignore
+from sqlalchemy.types import TypeDecorator # type: ignore
+
+from ..core.timeutils import ensure_utc
+
+class UTCDateTime(TypeDecorator):
+    """Timezone-aware DateTime that always stores and returns UTC
+
+    Postgres stores TIMESTAMP WITH TIME ZONE. SQLite has no zone support, so
+    values are stored as naive UTC (keeping string comparisons ordered) and
+    UTC is re-attached on load. Naive input values are taken to be UTC.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        value = ensure_utc(value)
+        if value is not None and dialect.name == "sqlite":
+            return value.replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        return ensure_utc(value)
+
+    def coerce_compared_value(self, op, value):
+        # Keep UTC handling for datetimes but let intervals (time + timedelta) use the impl's types
+        if isinstance(value, datetime):
+            return self
+        return self.impl.coerce_compared_value(op, value)
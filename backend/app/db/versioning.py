@@ -0,0 +1,63 @@
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Column, Integer, event, func, true, update # type: ignore
+from sqlalchemy.orm import Session, object_session # type: ignore
+
+from ..core.error_handlers import ConflictError
+
+class VersionedMixin:
+    """Rows carry a version that every ORM update increments, used as a cache validator"""
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+
+@event.listens_for(VersionedMixin, "before_update", propagate=True)
+def _bump_version(mapper, connection, target):
+    """Increment version in the UPDATE itself, so concurrent updates never share a version"""
+    session = object_session(target)
+    if session is not None and session.is_modified(target, include_collections=False):
+        target.version = type(target).version + 1
+
+def fingerprint_columns(model):
+    """Aggregates that change whenever a row of model in the selection is added, updated or removed"""
+    return [
+        func.count(model.id),
+        func.sum(model.version),
+        func.max(model.created_at),
+        func.max(model.updated_at),
+    ]
+
+def versioned_update(
+    db: Session,
+    model,
+    row_id: str,
+    values: Dict[str, Any],
+    expected_version: Optional[int] = None,
+    *criteria
+) -> Optional[Dict[str, Any]]:
+    """Apply values to a live row with one UPDATE ... RETURNING, incrementing its version
+
+    With expected_version the row only changes if nobody updated it since it
+    was read. Returns the updated columns, or None when no row matched (see
+    check_version). Unique violations surface as IntegrityError on execute.
+    """
+    statement = update(model).where(model.id == row_id, model.is_active == true(), *criteria)
+    if expected_version is not None:
+        statement = statement.where(model.version == expected_version)
+    statement = statement.values(**values, version=model.version + 1).returning(*model.__table__.columns)
+    row = db.execute(statement, execution_options={"synchronize_session": False}).first()
+    return dict(row._mapping) if row is not None else None
+
+def check_version(db: Session, model, row_id: str, expected_version: Optional[int]) -> bool:
+    """After versioned_update matched nothing: whether the live row exists
+
+    Raises ConflictError (409) when it does but expected_version is out of date.
+    """
+    current = db.query(model.version).filter(model.id == row_id).scalar()
+    if current is None:
+        return False
+    if expected_version is not None and current != expected_version:
+        raise ConflictError(
+            f"{model.__name__} was modified by another request",
+            error_code="VERSION_CONFLICT",
+            details={"expected_version": expected_version, "current_version": current}
+        )
+    return True
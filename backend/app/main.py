@@ -1,20 +1,37 @@
 from fastapi import FastAPI, HTTPException, Depends, Request # type: ignore
 from fastapi.middleware.cors import CORSMiddleware # type: ignore
 from fastapi.exceptions import RequestValidationError
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session, configure_mappers
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import ValidationError as PydanticValidationError
 from typing import List
-import uvicorn
+from contextlib import asynccontextmanager
 import asyncio
 import logging
 import os
+import time
+import traceback
 
-from .db.database import engine, get_db, DATABASE_URL
+from .db.database import engine, replica_engines, get_db, DATABASE_URL
+from .db.diagnostics import QueryDiagnosticsMiddleware
+from .db.idempotency import IdempotencyMiddleware
+from .db.routing import ReadYourWritesMiddleware
+from .db.startup import prepare_schema, warm_pool
 from .models import models
 from .api import clients, appointments, analytics
 from .services.mock_api_service import MockAPIService
+from .services.retention_service import run_idempotency_purge_job, run_purge_job
+from .services.partition_service import run_partition_job
 from .core.config import settings
+from .core.compression import CompressionMiddleware
+from .core.logging import RequestIDMiddleware, setup_logging, stop_logging
+from .core.tracing import TracingMiddleware, tracer
+from .core.metrics import metrics, MetricsMiddleware
+from .core.rate_limit import COST_SYNC, RateLimit, rate_limiter
+from .core.serialization import APIJSONResponse
+from .core.timeutils import utc_now
 from .core.error_handlers import (
     database_error_handler,
     validation_error_handler,
@@ -25,27 +42,109 @@ from .core.error_handlers import (
     HTTPException
 )
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Log through a background thread as JSON (see core/logging.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+async def _drain_requests(timeout: float):
+    """Wait for in-flight requests to finish, up to timeout seconds"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while metrics.in_progress > 0 and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.05)
+    if metrics.in_progress > 0:
+        logger.warning(f"Shutting down with {metrics.in_progress} requests still in flight")
+
+async def _seed_demo_data():
+    """Load the demo clients and appointments once the server is already serving"""
+    logger.info("Starting periodic data sync...")
+    try:
+        await mock_api_service.sync_all_data()
+        logger.info("Initial data sync completed")
+    except Exception as e:
+        logger.error(f"Error during initial data sync: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup work before the first request, graceful cleanup on SIGTERM"""
+    started = time.perf_counter()
+    # No-op unless a previous shutdown stopped the log listener in this process
+    setup_logging()
+    
+    # Schema check, pool and cache warm-up are independent, so run them together
+    results = await asyncio.gather(
+        asyncio.to_thread(prepare_schema, engine, models.Base.metadata),
+        *(warm_pool(pooled_engine, settings.db_pool_warm_connections) for pooled_engine in [engine, *replica_engines]),
+        asyncio.to_thread(configure_mappers),
+        mock_api_service.check_health(),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            # Don't raise the exception to allow the app to start
+            logger.error(f"Startup step failed: {result}")
+    logger.info(f"Startup completed in {(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    background_tasks = []
+    
+    # Seeding is not needed to serve requests, so it runs after startup
+    if settings.seed_demo_data:
+        background_tasks.append(asyncio.create_task(_seed_demo_data()))
+    
+    # Archive soft-deleted rows once they pass the retention period
+    if settings.soft_delete_purge_enabled:
+        background_tasks.append(asyncio.create_task(run_purge_job(
+            settings.soft_delete_retention_days,
+            settings.soft_delete_purge_interval_hours * 3600
+        )))
+    
+    # Expired idempotency keys are removed whether or not soft-deleted rows are purged
+    background_tasks.append(asyncio.create_task(run_idempotency_purge_job(
+        settings.idempotency_purge_interval_hours * 3600
+    )))
+    
+    # Keep monthly appointment partitions created ahead of bookings (no-op unless partitioned)
+    if engine.dialect.name == "postgresql":
+        background_tasks.append(asyncio.create_task(run_partition_job(
+            engine,
+            settings.appointment_partition_months_ahead,
+            settings.appointment_archive_after_months,
+            settings.appointment_archive_tablespace,
+            settings.partition_maintenance_interval_hours * 3600
+        )))
+    
+    yield
+    
+    # The server has stopped accepting connections; finish what is in flight first
+    logger.info("Shutting down: draining requests")
+    await _drain_requests(settings.shutdown_drain_seconds)
+    
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    
+    await mock_api_service.aclose()
+    if hasattr(rate_limiter, "aclose"):
+        await rate_limiter.aclose()
+    for pooled_engine in [engine, *replica_engines]:
+        pooled_engine.dispose()
+    logger.info("Shutdown complete")
+    stop_logging()
+
 app = FastAPI(
     title="Ruh Virtual Wellness Platform API",
     description="A comprehensive API for managing virtual wellness appointments and client data",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=APIJSONResponse,
+    lifespan=lifespan
 )
 
-# Startup event to create tables
-@app.on_event("startup")
-async def startup_event():
-    try:
-        # Create tables
-        models.Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
-    except Exception as e:
-        logger.error(f"Failed to create database tables: {e}")
-        # Don't raise the exception to allow the app to start
-        # Tables might already exist
+# Replay creations retried with the same Idempotency-Key (inside CORS so replays get its headers)
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=["/api/clients/", "/api/appointments/"],
+    ttl_seconds=settings.idempotency_key_ttl_hours * 3600,
+    lease_seconds=settings.idempotency_claim_lease_seconds
+)
 
 # Configure CORS
 app.add_middleware(
@@ -54,8 +153,41 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Read by the frontend: X-DB-Primary-Until is echoed back for read-your-writes
+    expose_headers=["X-DB-Primary-Until"],
 )
 
+# Record per-route latency, query count, DB time and response size
+metrics.bind_engine(engine)
+for replica_engine in replica_engines:
+    metrics.bind_engine(replica_engine)
+app.add_middleware(MetricsMiddleware, registry=metrics)
+
+# Keep clients on the primary for a few seconds after they write
+if replica_engines:
+    app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=settings.replica_sticky_seconds)
+
+# Flag statements repeated within one request when query diagnostics are on
+if settings.query_diagnostics:
+    app.add_middleware(QueryDiagnosticsMiddleware, repeated_query_threshold=settings.repeated_query_threshold)
+
+# Compress JSON and CSV bodies outside the metrics (which still count uncompressed bytes)
+# and inside tracing and the request ID
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality
+    )
+
+# Trace sampled requests (TRACING_ENABLED=true) from just inside the request ID, which the span records
+if tracer.enabled:
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
+# Tag log records and error responses with the request ID, outermost so every response carries it
+app.add_middleware(RequestIDMiddleware)
+
 # Register error handlers
 app.add_exception_handler(SQLAlchemyError, database_error_handler)
 app.add_exception_handler(PydanticValidationError, validation_error_handler)
@@ -71,16 +203,6 @@ app.include_router(analytics.router, prefix="/api/analytics", tags=["analytics"]
 # Initialize mock API service with external API disabled
 mock_api_service = MockAPIService(enable_external_api=False)
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize data on startup"""
-    logger.info("Starting periodic data sync...")
-    try:
-        await mock_api_service.sync_all_data()
-        logger.info("Initial data sync completed")
-    except Exception as e:
-        logger.error(f"Error during initial data sync: {e}")
-
 @app.get("/")
 async def root():
     return {
@@ -93,15 +215,17 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Expose request and database metrics in Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health/detailed")
 async def detailed_health_check():
     """Detailed health check with database connectivity"""
-    from datetime import datetime
-    import traceback
-    
     health_status = {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "timestamp": utc_now().isoformat(),
         "environment": os.getenv("ENVIRONMENT", "development"),
         "database": {"status": "unknown"},
         "services": {}
@@ -109,10 +233,8 @@ async def detailed_health_check():
     
     # Test database connection
     try:
-        db = next(get_db())
-        from sqlalchemy import text
-        db.execute(text("SELECT 1"))
-        db.close()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
         
         health_status["database"] = {
             "status": "healthy",
@@ -130,7 +252,7 @@ async def detailed_health_check():
     
     return health_status
 
-@app.post("/sync")
+@app.post("/sync", dependencies=[Depends(RateLimit(COST_SYNC))])
 async def manual_sync(db: Session = Depends(get_db)):
     """Manual data sync endpoint"""
     try:
@@ -141,4 +263,6 @@ async def manual_sync(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
+    import uvicorn
+    
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
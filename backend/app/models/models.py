@@ -1,50 +1,109 @@
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Text, Integer, JSON # type: ignore
+from sqlalchemy import Column, String, Boolean, ForeignKey, Text, Integer, JSON, Index, LargeBinary, func, true # type: ignore
 from sqlalchemy.orm import relationship # type: ignore
-from datetime import datetime
 
 from ..db.database import Base
+from ..db.soft_delete import SoftDeleteMixin
+from ..db.versioning import VersionedMixin
+from ..db.types import UTCDateTime
+from ..core.timeutils import utc_now
 
-class Client(Base):
+class Client(VersionedMixin, SoftDeleteMixin, Base):
     __tablename__ = "clients"
     
     id = Column(String, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
-    email = Column(String(100), unique=True, nullable=False)
+    email = Column(String(100), nullable=False)  # stored lowercased; unique among live rows, see ix_clients_email_lower_live
     phone = Column(String(20))
     status = Column(String(20), default="active")  # active, inactive, pending
     notes = Column(Text)  # Additional client notes
-    created_at = Column(DateTime, default=lambda: datetime.now())
-    updated_at = Column(DateTime, onupdate=lambda: datetime.now())
-    is_active = Column(Boolean, default=True)
+    created_at = Column(UTCDateTime, default=utc_now)
+    updated_at = Column(UTCDateTime, onupdate=utc_now)
     
     # Relationship with appointments
     appointments = relationship("Appointment", back_populates="client")
 
-class Appointment(Base):
+class Appointment(VersionedMixin, SoftDeleteMixin, Base):
     __tablename__ = "appointments"
     
     id = Column(String, primary_key=True, index=True)
     client_id = Column(String, ForeignKey("clients.id"), nullable=False)
-    time = Column(DateTime, nullable=False)
+    time = Column(UTCDateTime, nullable=False)
     status = Column(String(20), default="scheduled")  # scheduled, completed, cancelled, no-show
     notes = Column(Text)  # Appointment notes/comments
     is_recurring = Column(Boolean, default=False)
     recurring_pattern = Column(JSON)  # Store recurring pattern (weekly, monthly, etc.)
     reminder_sent = Column(Boolean, default=False)
-    reminder_time = Column(DateTime)  # When reminder should be sent
-    created_at = Column(DateTime, default=lambda: datetime.now())
-    updated_at = Column(DateTime, onupdate=lambda: datetime.now())
-    is_active = Column(Boolean, default=True)
+    reminder_time = Column(UTCDateTime)  # When reminder should be sent
+    created_at = Column(UTCDateTime, default=utc_now)
+    updated_at = Column(UTCDateTime, onupdate=utc_now)
     
     # Relationship with client
     client = relationship("Client", back_populates="appointments")
 
+# Partial indexes covering live rows only; the predicate matches the soft-delete filter
+# so both Postgres and SQLite can use them for ORM queries
+_live_client = Client.is_active == true()
+_live_appointment = Appointment.is_active == true()
+
+# Case-insensitive, so John@x.com and john@x.com cannot both be live; inserts rely on it instead of checking first
+Index("ix_clients_email_lower_live", func.lower(Client.email), unique=True,
+      postgresql_where=_live_client, sqlite_where=_live_client)
+Index("ix_clients_created_at_live", Client.created_at,
+      postgresql_where=_live_client, sqlite_where=_live_client)
+Index("ix_appointments_client_time_live", Appointment.client_id, Appointment.time,
+      postgresql_where=_live_appointment, sqlite_where=_live_appointment)
+Index("ix_appointments_time_live", Appointment.time,
+      postgresql_where=_live_appointment, sqlite_where=_live_appointment)
+Index("ix_appointments_deleted_at", Appointment.deleted_at,
+      postgresql_where=Appointment.deleted_at.isnot(None), sqlite_where=Appointment.deleted_at.isnot(None))
+
+class ClientStats(Base):
+    """Appointment counts per client, refreshed in the same transaction as every appointment write
+
+    See services/client_stats_service.py; live appointments only.
+    """
+    __tablename__ = "client_stats"
+    
+    client_id = Column(String, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    total_appointments = Column(Integer, default=0, nullable=False)
+    scheduled_appointments = Column(Integer, default=0, nullable=False)
+    completed_appointments = Column(Integer, default=0, nullable=False)
+    cancelled_appointments = Column(Integer, default=0, nullable=False)
+    no_show_appointments = Column(Integer, default=0, nullable=False)
+    upcoming_appointments = Column(Integer, default=0, nullable=False)  # scheduled after refreshed_at
+    last_appointment_time = Column(UTCDateTime)
+    next_appointment_time = Column(UTCDateTime)  # first upcoming one; once it passes the row is refreshed on read
+    refreshed_at = Column(UTCDateTime, default=utc_now, nullable=False)
+
+class ArchivedRecord(Base):
+    """Compact JSON copy of a purged soft-deleted row"""
+    __tablename__ = "archived_records"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(50), nullable=False)
+    record_id = Column(String, nullable=False)
+    data = Column(JSON, nullable=False)
+    deleted_at = Column(UTCDateTime)
+    archived_at = Column(UTCDateTime, default=utc_now, nullable=False)
+
+class IdempotencyRecord(Base):
+    """Stored outcome of a POST sent with an Idempotency-Key, replayed to retries until it expires"""
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # sha256 of method, path and body
+    status_code = Column(Integer)  # NULL while the first request is still running
+    content_type = Column(String(100))
+    response_body = Column(LargeBinary)
+    created_at = Column(UTCDateTime, default=utc_now, nullable=False)
+    expires_at = Column(UTCDateTime, nullable=False, index=True)
+
 class Analytics(Base):
     __tablename__ = "analytics"
     
     id = Column(String, primary_key=True, index=True)
-    date = Column(DateTime, nullable=False)
+    date = Column(UTCDateTime, nullable=False)
     metric_type = Column(String(50), nullable=False)  # appointment_count, client_count, etc.
     metric_value = Column(Integer, nullable=False)
     analytics_metadata = Column(JSON)  # Additional analytics data
-    created_at = Column(DateTime, default=lambda: datetime.now()) 
\ No newline at end of file
+    created_at = Column(UTCDateTime, default=utc_now) 
\ No newline at end of file
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, EmailStr # type: ignore
+from pydantic import BaseModel, EmailStr, Field, field_validator # type: ignore
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+from ..core.timeutils import ensure_utc
+
 # Client schemas
 class ClientBase(BaseModel):
     name: str
@@ -10,6 +12,11 @@ class ClientBase(BaseModel):
     status: Optional[str] = "active"
     notes: Optional[str] = None
 
+    @field_validator("email")
+    @classmethod
+    def normalize_email(cls, value: str) -> str:
+        return value.strip().lower()
+
 class ClientCreate(ClientBase):
     pass
 
@@ -19,12 +26,19 @@ class ClientUpdate(BaseModel):
     phone: Optional[str] = None
     status: Optional[str] = None
     notes: Optional[str] = None
+    version: Optional[int] = None  # version last read; a stale one makes the update fail with 409
+
+    @field_validator("email")
+    @classmethod
+    def normalize_email(cls, value: Optional[str]) -> Optional[str]:
+        return value.strip().lower() if value is not None else None
 
 class Client(ClientBase):
     id: str
     created_at: datetime
     updated_at: Optional[datetime] = None
     is_active: bool = True
+    version: int = 1
 
     class Config:
         from_attributes = True
@@ -39,6 +53,11 @@ class AppointmentBase(BaseModel):
     recurring_pattern: Optional[Dict[str, Any]] = None
     reminder_time: Optional[datetime] = None
 
+    @field_validator("time", "reminder_time")
+    @classmethod
+    def normalize_times(cls, value: Optional[datetime]) -> Optional[datetime]:
+        return ensure_utc(value)
+
 class AppointmentCreate(AppointmentBase):
     pass
 
@@ -50,16 +69,39 @@ class AppointmentUpdate(BaseModel):
     is_recurring: Optional[bool] = None
     recurring_pattern: Optional[Dict[str, Any]] = None
     reminder_time: Optional[datetime] = None
+    version: Optional[int] = None  # version last read; a stale one makes the update fail with 409
+
+    @field_validator("time", "reminder_time")
+    @classmethod
+    def normalize_times(cls, value: Optional[datetime]) -> Optional[datetime]:
+        return ensure_utc(value)
 
 class Appointment(AppointmentBase):
     id: str
     reminder_sent: Optional[bool] = False
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int = 1
 
     class Config:
         from_attributes = True
 
+# Batch conflict check schemas
+class ConflictCheckCandidate(BaseModel):
+    client_id: str
+    time: datetime
+    duration: int = Field(60, ge=1, le=1440)
+    exclude_appointment_id: Optional[str] = None
+
+    @field_validator("time")
+    @classmethod
+    def normalize_time(cls, value: datetime) -> datetime:
+        return ensure_utc(value)
+
+class BatchConflictCheck(BaseModel):
+    candidates: List[ConflictCheckCandidate] = Field(..., max_length=10000)
+    check_within_batch: bool = True
+
 # Analytics schemas
 class AnalyticsBase(BaseModel):
     date: datetime
@@ -0,0 +1,5 @@
+from uvicorn.workers import UvicornWorker as BaseUvicornWorker # type: ignore
+
+class UvicornWorker(BaseUvicornWorker):
+    """Gunicorn worker running the app on uvloop and httptools with lifespan events"""
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
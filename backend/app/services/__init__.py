@@ -1,2 +1,9 @@
-from .mock_api_service import MockAPIService
-__all__ = ["MockAPIService"]
\ No newline at end of file
+__all__ = ["MockAPIService"]
+
+# The external API client pulls in httpx; load it only when asked for
+def __getattr__(name):
+    if name == "MockAPIService":
+        from .mock_api_service import MockAPIService
+
+        return MockAPIService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np # type: ignore
+from sqlalchemy import Integer, case, cast, extract, func, select, true # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+
+from ..models.models import Appointment
+
+# Status codes used for the columnar fetch; anything else maps to OTHER_STATUS
+STATUS_CODES = {"scheduled": 0, "completed": 1, "cancelled": 2, "no-show": 3}
+OTHER_STATUS = len(STATUS_CODES)
+
+# Hour-of-day windows as [start, end) hours
+TIME_WINDOWS = {"morning": (6, 12), "afternoon": (12, 18), "evening": (18, 22)}
+
+def fetch_status_hour_columns(
+    db: Session,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+):
+    """Fetch only (status code, hour) for matching appointments as two int16 arrays"""
+    # Hours are UTC; Postgres would otherwise extract them in the session time zone
+    time_column = Appointment.time
+    if db.get_bind().dialect.name == "postgresql":
+        time_column = func.timezone("UTC", Appointment.time)
+
+    stmt = select(
+        case(STATUS_CODES, value=Appointment.status, else_=OTHER_STATUS),
+        cast(extract("hour", time_column), Integer)
+    ).where(Appointment.is_active == true())  # no entity column selected, so the soft-delete hook does not apply
+    if date_from is not None:
+        stmt = stmt.where(Appointment.time >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(Appointment.time <= date_to)
+
+    rows = db.execute(stmt).all()
+    if not rows:
+        return np.empty(0, dtype=np.int16), np.empty(0, dtype=np.int16)
+
+    status_column, hour_column = zip(*rows)
+    statuses = np.fromiter(status_column, dtype=np.int16, count=len(rows))
+    hours = np.fromiter(hour_column, dtype=np.int16, count=len(rows))
+    return statuses, hours
+
+def compute_performance(statuses, hours) -> Dict[str, Dict[str, float]]:
+    """Status counts, rates and time-of-day distribution from columnar arrays"""
+    total = int(statuses.size)
+    status_counts = np.bincount(statuses, minlength=OTHER_STATUS + 1)
+    hour_histogram = np.bincount(hours, minlength=24)
+
+    completed = int(status_counts[STATUS_CODES["completed"]])
+    cancelled = int(status_counts[STATUS_CODES["cancelled"]])
+    no_show = int(status_counts[STATUS_CODES["no-show"]])
+    scheduled = int(status_counts[STATUS_CODES["scheduled"]])
+
+    return {
+        "totals": {
+            "total_appointments": total,
+            "completed": completed,
+            "cancelled": cancelled,
+            "no_show": no_show,
+            "scheduled": scheduled,
+        },
+        "rates": {
+            "completion_rate": (completed / total * 100) if total > 0 else 0,
+            "cancellation_rate": (cancelled / total * 100) if total > 0 else 0,
+            "no_show_rate": (no_show / total * 100) if total > 0 else 0,
+        },
+        "time_distribution": {
+            name: int(hour_histogram[start:end].sum())
+            for name, (start, end) in TIME_WINDOWS.items()
+        },
+    }
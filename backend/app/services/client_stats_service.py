@@ -0,0 +1,174 @@
+import argparse
+import logging
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import and_, case, func, insert, literal, select, true, update # type: ignore
+from sqlalchemy.engine import Connection # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+from sqlalchemy.sql import Select # type: ignore
+
+from ..db.database import SessionLocal
+from ..db.types import UTCDateTime
+from ..models.models import Appointment, Client, ClientStats
+from ..core.timeutils import utc_now
+
+logger = logging.getLogger(__name__)
+
+STATS_TABLE = ClientStats.__table__
+
+# Insert order of the columns produced by _stats_select
+STATS_COLUMNS = [
+    "client_id",
+    "total_appointments",
+    "scheduled_appointments",
+    "completed_appointments",
+    "cancelled_appointments",
+    "no_show_appointments",
+    "upcoming_appointments",
+    "last_appointment_time",
+    "next_appointment_time",
+    "refreshed_at",
+]
+
+# Only valid until next_appointment_time passes, so verify skips them on rows past it
+TIME_DEPENDENT_COLUMNS = ("upcoming_appointments", "next_appointment_time")
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def _stats_select(now: datetime, *criteria) -> Select:
+    """One row of STATS_COLUMNS per client matching criteria, aggregated from its live appointments"""
+    upcoming = and_(Appointment.status == "scheduled", Appointment.time > now)
+    values = [
+        Client.id,
+        func.count(Appointment.id),
+        _count_where(Appointment.status == "scheduled"),
+        _count_where(Appointment.status == "completed"),
+        _count_where(Appointment.status == "cancelled"),
+        _count_where(Appointment.status == "no-show"),
+        _count_where(upcoming),
+        func.max(Appointment.time),
+        func.min(case((upcoming, Appointment.time))),
+        literal(now, UTCDateTime),
+    ]
+    return select(
+        *(value.label(name) for value, name in zip(values, STATS_COLUMNS))
+    ).select_from(Client).outerjoin(
+        Appointment,
+        and_(Appointment.client_id == Client.id, Appointment.is_active == true())
+    ).where(*criteria).group_by(Client.id)
+
+def _update_stats(db: Union[Session, Connection], *criteria):
+    """Overwrite the existing stats rows of clients matching criteria with one UPDATE ... FROM the aggregate"""
+    fresh = _stats_select(utc_now(), *criteria).subquery()
+    db.execute(
+        update(STATS_TABLE)
+        .where(STATS_TABLE.c.client_id == fresh.c.client_id)
+        .values({name: fresh.c[name] for name in STATS_COLUMNS[1:]})
+    )
+
+def _insert_stats(db: Union[Session, Connection], *criteria):
+    db.execute(insert(STATS_TABLE).from_select(STATS_COLUMNS, _stats_select(utc_now(), *criteria)))
+
+def refresh_client_stats(db: Union[Session, Connection], client_ids: Iterable[str]):
+    """Bring the stats of client_ids up to date in the caller's transaction
+
+    Call after every write that adds, removes or changes the status, time
+    or client of an appointment; pending ORM changes are flushed first.
+    Plain UPDATE and INSERT statements are used rather than an upsert,
+    which SQLAlchemy would recompile on every call.
+    """
+    client_ids = sorted(set(client_ids))
+    if not client_ids:
+        return
+    if isinstance(db, Session):
+        db.flush()
+
+    # Lock the rows first: a concurrent refresh of the same client then waits for this
+    # transaction and, under READ COMMITTED, aggregates a snapshot that includes its writes
+    client_id = STATS_TABLE.c.client_id
+    existing = set(db.execute(
+        select(client_id).where(client_id.in_(client_ids)).order_by(client_id).with_for_update()
+    ).scalars())
+    if existing:
+        _update_stats(db, Client.id.in_(sorted(existing)))
+
+    # Clients get their row on creation, so this only covers rows created outside the API
+    missing = [value for value in client_ids if value not in existing]
+    if missing:
+        _insert_stats(db, Client.id.in_(missing))
+
+def rebuild_client_stats(db: Union[Session, Connection]) -> int:
+    """Recompute every client's stats and drop rows of clients that no longer exist"""
+    client_id = STATS_TABLE.c.client_id
+    _update_stats(db, true())
+    _insert_stats(db, Client.id.not_in(select(client_id)))
+    db.execute(STATS_TABLE.delete().where(client_id.not_in(select(Client.id))))
+    return db.execute(select(func.count()).select_from(STATS_TABLE)).scalar()
+
+def verify_client_stats(db: Session) -> List[Dict[str, Any]]:
+    """Compare the stored stats with a fresh aggregate; returns the clients that differ"""
+    now = utc_now()
+    stored = {row.client_id: row._mapping for row in db.execute(select(STATS_TABLE))}
+    mismatches = []
+    for row in db.execute(_stats_select(now, true())):
+        expected = dict(zip(STATS_COLUMNS, row))
+        current = stored.get(expected["client_id"])
+        if current is None:
+            # Clients without appointments may not have a row yet
+            if expected["total_appointments"]:
+                mismatches.append({"client_id": expected["client_id"], "stored": None, "expected": expected})
+            continue
+
+        next_passed = current["next_appointment_time"] is not None and current["next_appointment_time"] <= now
+        differing = {
+            name: {"stored": current[name], "expected": expected[name]}
+            for name in STATS_COLUMNS[1:-1]
+            if current[name] != expected[name] and not (next_passed and name in TIME_DEPENDENT_COLUMNS)
+        }
+        if differing:
+            mismatches.append({"client_id": expected["client_id"], "columns": differing})
+    return mismatches
+
+def get_client_stats(db: Session, client_id: str) -> Optional[Any]:
+    """(name, created_at, ClientStats) for a live client by primary key, or None if there is no such client
+
+    The stats row is refreshed (and committed) first when it is missing or
+    its next appointment has passed, which changes the upcoming count.
+    """
+    query = db.query(Client.name, Client.created_at, ClientStats).outerjoin(
+        ClientStats, ClientStats.client_id == Client.id
+    ).filter(Client.id == client_id)
+
+    row = query.first()
+    if row is None:
+        return None
+    stats = row[2]
+    if stats is None or (stats.next_appointment_time is not None and stats.next_appointment_time <= utc_now()):
+        refresh_client_stats(db, [client_id])
+        db.commit()
+        row = query.populate_existing().first()
+    return row
+
+if __name__ == "__main__":
+    # Rebuild after restoring data or bulk edits outside the API, e.g. python -m app.services.client_stats_service --verify
+    parser = argparse.ArgumentParser(description="Rebuild or verify the client_stats table")
+    parser.add_argument("--verify", action="store_true", help="report clients whose stats differ instead of rebuilding")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        if args.verify:
+            mismatches = verify_client_stats(db)
+            for mismatch in mismatches:
+                print(mismatch)
+            print(f"{len(mismatches)} clients with stale stats")
+            sys.exit(1 if mismatches else 0)
+        rows = rebuild_client_stats(db)
+        db.commit()
+        print(f"Rebuilt stats for {rows} clients")
+    finally:
+        db.close()
@@ -1,12 +1,16 @@
-import httpx
 import asyncio
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, Dict, Any, Optional
 from datetime import datetime, timezone
 import logging
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert # type: ignore
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert # type: ignore
 from sqlalchemy.orm import Session # type: ignore
 
 from ..db.database import SessionLocal
 from ..models.models import Client, Appointment
+from ..core.timeutils import utc_now
+from ..core.tracing import tracer
+from .client_stats_service import refresh_client_stats
 from ..core.error_handlers import (
     ExternalAPIError,
     CircuitBreaker,
@@ -14,6 +18,9 @@ from ..core.error_handlers import (
     log_error
 )
 
+if TYPE_CHECKING:
+    import httpx
+
 logger = logging.getLogger(__name__)
 
 class MockAPIService:
@@ -31,6 +38,23 @@ class MockAPIService:
         self._health_cache = None
         self._health_cache_time = None
         self._cache_duration = 300  # 5 minutes
+        
+        # Pooled HTTP client, created on first use and closed on shutdown
+        self._client: Optional["httpx.AsyncClient"] = None
+    
+    def _get_client(self) -> "httpx.AsyncClient":
+        # httpx is only needed once the external API is enabled, so import it on first use
+        import httpx
+        
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        return self._client
+    
+    async def aclose(self):
+        """Close pooled connections to the external API"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     async def _make_request(self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None) -> Any:
         """Make HTTP request with error handling and retry logic"""
@@ -38,29 +62,49 @@ class MockAPIService:
             # Return mock data when external API is disabled
             return self._get_mock_response(method, endpoint, data)
         
+        import httpx
+        
         url = f"{self.base_url}{endpoint}"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
+        attempts = 0
+        
         async def _request():
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
+            nonlocal attempts
+            attempts += 1
+            with tracer.span(f"HTTP {method.upper()}", "client", {
+                "http.method": method.upper(),
+                "http.url": url,
+                "http.attempt": attempts,
+            }) as span:
+                # Continue the trace in the external service
+                traceparent = span.traceparent()
+                request_headers = {**headers, "traceparent": traceparent} if traceparent else headers
+                client = self._get_client()
                 try:
                     if method.upper() == "GET":
-                        response = await client.get(url, headers=headers)
+                        response = await client.get(url, headers=request_headers)
                     elif method.upper() == "POST":
-                        response = await client.post(url, headers=headers, json=data)
+                        response = await client.post(url, headers=request_headers, json=data)
                     elif method.upper() == "PUT":
-                        response = await client.put(url, headers=headers, json=data)
+                        response = await client.put(url, headers=request_headers, json=data)
                     elif method.upper() == "DELETE":
-                        response = await client.delete(url, headers=headers)
+                        response = await client.delete(url, headers=request_headers)
                     else:
                         raise ExternalAPIError(f"Unsupported HTTP method: {method}")
-                    
+                
+                    span.set_attribute("http.status_code", response.status_code)
+                    # Hot path: %-style so nothing is formatted when DEBUG is off or sampled out
+                    logger.debug(
+                        "Mock API %s %s -> %s in %.1f ms",
+                        method.upper(), endpoint, response.status_code, response.elapsed.total_seconds() * 1000
+                    )
                     response.raise_for_status()
                     return response.json()
-                    
+                
                 except httpx.TimeoutException:
                     raise ExternalAPIError(
                         "Request timeout",
@@ -93,15 +137,18 @@ class MockAPIService:
                         details={"error": str(e)}
                     )
         
-        # Use circuit breaker and retry logic
-        try:
-            return await self.retry_handler.retry_async(
-                lambda: self.circuit_breaker.call(_request)
-            )
-        except Exception as e:
-            log_error(e, context={"service": "mock_api", "endpoint": endpoint})
-            # Return mock data on error
-            return self._get_mock_response(method, endpoint, data)
+        # Use circuit breaker and retry logic; retries and breaker decisions are events on this span
+        with tracer.span(f"mock_api {method.upper()} {endpoint}", attributes={"endpoint": endpoint}) as span:
+            try:
+                return await self.retry_handler.retry_async(
+                    lambda: self.circuit_breaker.call_async(_request)
+                )
+            except Exception as e:
+                span.record_exception(e)
+                span.set_attribute("fallback", True)
+                log_error(e, context={"service": "mock_api", "endpoint": endpoint})
+                # Return mock data on error
+                return self._get_mock_response(method, endpoint, data)
     
     def _get_mock_response(self, method: str, endpoint: str, data: Optional[Dict[str, Any]] = None) -> Any:
         """Return mock responses when external API is not available"""
@@ -162,39 +209,41 @@ class MockAPIService:
     async def sync_all_data(self):
         """Sync all clients and appointments from mock API with enhanced error handling"""
         db = SessionLocal()
-        try:
-            # Always use fallback data for demo purposes
-            await self._create_fallback_data(db)
-            db.commit()
-            logger.info("Successfully created fallback data for demo")
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Error creating fallback data: {e}")
-            raise
-        finally:
-            db.close()
+        # Background and manual syncs start their own trace
+        with tracer.span("sync_all_data"):
+            try:
+                # Always use fallback data for demo purposes
+                await self._create_fallback_data(db)
+                db.commit()
+                logger.info("Successfully created fallback data for demo")
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error creating fallback data: {e}")
+                raise
+            finally:
+                db.close()
     
     async def sync_clients(self, db: Session):
         """Sync clients from mock API with error handling"""
         try:
             clients_data = await self._make_request("GET", "/clients")
             
-            for client_data in clients_data:
-                existing_client = db.query(Client).filter(Client.id == client_data["id"]).first()
-                
-                if existing_client:
-                    existing_client.name = client_data["name"]
-                    existing_client.email = client_data["email"]
-                    existing_client.phone = client_data.get("phone")
-                    existing_client.updated_at = datetime.now(timezone.utc)
-                else:
-                    new_client = Client(
-                        id=client_data["id"],
-                        name=client_data["name"],
-                        email=client_data["email"],
-                        phone=client_data.get("phone")
-                    )
-                    db.add(new_client)
+            if clients_data:
+                # A savepoint, so a failure (e.g. an email taken by another client) leaves
+                # the transaction usable for the fallback; Postgres aborts it otherwise
+                with db.begin_nested():
+                    statement = self._insert_clients(db, clients_data)
+                    db.execute(statement.on_conflict_do_update(
+                        index_elements=[Client.id],
+                        set_={
+                            "name": statement.excluded.name,
+                            "email": statement.excluded.email,
+                            "phone": statement.excluded.phone,
+                            "updated_at": utc_now(),
+                            "version": Client.version + 1,
+                        }
+                    ))
+                    refresh_client_stats(db, [client_data["id"] for client_data in clients_data])
             
             logger.info(f"Synced {len(clients_data)} clients")
             
@@ -202,32 +251,55 @@ class MockAPIService:
             logger.error(f"Error syncing clients: {e}")
             await self._create_fallback_clients(db)
     
+    def _insert_clients(self, db: Session, clients_data):
+        """One multi-row INSERT for clients_data, for the caller to add its ON CONFLICT clause
+
+        Emails are stored lowercased to match the case-insensitive unique index.
+        """
+        insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        return insert(Client).values([
+            {
+                "id": client_data["id"],
+                "name": client_data["name"],
+                "email": client_data["email"].strip().lower(),
+                "phone": client_data.get("phone"),
+            }
+            for client_data in clients_data
+        ])
+    
     async def sync_appointments(self, db: Session):
         """Sync appointments from mock API with error handling"""
         try:
             appointments_data = await self._make_request("GET", "/appointments")
             
-            for appointment_data in appointments_data:
-                existing_appointment = db.query(Appointment).filter(
-                    Appointment.id == appointment_data["id"]
-                ).first()
+            # Both the old and the new client of a moved appointment need fresh stats
+            touched_client_ids = set()
+            # A savepoint, so the fallback can still use the session after a failure
+            with db.begin_nested():
+                for appointment_data in appointments_data:
+                    touched_client_ids.add(appointment_data["client_id"])
+                    existing_appointment = db.query(Appointment).execution_options(include_inactive=True).filter(
+                        Appointment.id == appointment_data["id"]
+                    ).first()
                 
-                if existing_appointment:
-                    existing_appointment.client_id = appointment_data["client_id"]
-                    existing_appointment.time = datetime.fromisoformat(
-                        appointment_data["time"].replace('Z', '+00:00')
-                    )
-                    existing_appointment.updated_at = datetime.now(timezone.utc)
-                else:
-                    new_appointment = Appointment(
-                        id=appointment_data["id"],
-                        client_id=appointment_data["client_id"],
-                        time=datetime.fromisoformat(
+                    if existing_appointment:
+                        touched_client_ids.add(existing_appointment.client_id)
+                        existing_appointment.client_id = appointment_data["client_id"]
+                        existing_appointment.time = datetime.fromisoformat(
                             appointment_data["time"].replace('Z', '+00:00')
                         )
-                    )
-                    db.add(new_appointment)
+                        existing_appointment.updated_at = utc_now()
+                    else:
+                        new_appointment = Appointment(
+                            id=appointment_data["id"],
+                            client_id=appointment_data["client_id"],
+                            time=datetime.fromisoformat(
+                                appointment_data["time"].replace('Z', '+00:00')
+                            )
+                        )
+                        db.add(new_appointment)
             
+                refresh_client_stats(db, touched_client_ids)
             logger.info(f"Synced {len(appointments_data)} appointments")
             
         except Exception as e:
@@ -348,16 +420,9 @@ class MockAPIService:
             {"id": "5", "name": "Omar Khan", "email": "omar@example.com", "phone": "3333333333"},
         ]
         
-        for client_data in fallback_clients:
-            existing_client = db.query(Client).filter(Client.id == client_data["id"]).first()
-            if not existing_client:
-                new_client = Client(
-                    id=client_data["id"],
-                    name=client_data["name"],
-                    email=client_data["email"],
-                    phone=client_data["phone"]
-                )
-                db.add(new_client)
+        # Skip clients whose id or email is already taken
+        db.execute(self._insert_clients(db, fallback_clients).on_conflict_do_nothing())
+        refresh_client_stats(db, [client_data["id"] for client_data in fallback_clients])
         
         logger.info("Created fallback clients for demo")
     
@@ -372,7 +437,7 @@ class MockAPIService:
         ]
         
         for appointment_data in fallback_appointments:
-            existing_appointment = db.query(Appointment).filter(
+            existing_appointment = db.query(Appointment).execution_options(include_inactive=True).filter(
                 Appointment.id == appointment_data["id"]
             ).first()
             if not existing_appointment:
@@ -385,6 +450,7 @@ class MockAPIService:
                 )
                 db.add(new_appointment)
         
+        refresh_client_stats(db, [appointment_data["client_id"] for appointment_data in fallback_appointments])
         logger.info("Created fallback appointments for demo")
     
     def get_circuit_breaker_status(self) -> Dict[str, Any]:
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import re
+from datetime import datetime, timezone
+from typing import List
+
+from sqlalchemy import text # type: ignore
+
+from ..core.timeutils import utc_now
+from ..db.locks import job_lock
+from .client_stats_service import rebuild_client_stats
+
+logger = logging.getLogger(__name__)
+
+# appointments is range-partitioned by month on time (Postgres only, see migration 005)
+PARENT_TABLE = "appointments"
+DEFAULT_PARTITION = "appointments_default"
+ARCHIVE_SCHEMA = "archive"
+
+_PARTITION_NAME = re.compile(r"^appointments_p(\d{4})(\d{2})$")
+
+def month_start(moment: datetime) -> datetime:
+    """First instant (UTC) of the month containing moment"""
+    return datetime(moment.year, moment.month, 1, tzinfo=timezone.utc)
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT_TABLE}_p{month.year:04d}{month.month:02d}"
+
+def is_partitioned(conn) -> bool:
+    """True when appointments is a partitioned table on this connection's database"""
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": PARENT_TABLE}
+    ).scalar())
+
+def existing_partitions(conn) -> List[str]:
+    """Names of the monthly partitions currently attached to appointments"""
+    rows = conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table)"
+    ), {"table": PARENT_TABLE}).scalars().all()
+    return sorted(name for name in rows if _PARTITION_NAME.match(name))
+
+def create_month_partition(conn, month: datetime) -> str:
+    """Create and attach the partition for month, moving any of its rows out of the default partition
+
+    The partition is built detached and attached afterwards, because Postgres
+    refuses CREATE ... PARTITION OF while the default partition holds rows in
+    the new range (e.g. recurring bookings made far ahead).
+    """
+    name = partition_name(month)
+    bounds = {"lower": month, "upper": add_months(month, 1)}
+    conn.execute(text(
+        f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE time >= :lower AND time < :upper RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds)
+    lower = bounds["lower"].isoformat()
+    upper = bounds["upper"].isoformat()
+    conn.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    ))
+    return name
+
+def ensure_partitions(conn, months_ahead: int, first_month: datetime = None) -> List[str]:
+    """Create missing monthly partitions from first_month (default: this month) to months_ahead ahead"""
+    if not is_partitioned(conn):
+        return []
+
+    existing = set(existing_partitions(conn))
+    month = month_start(first_month or utc_now())
+    last = add_months(month_start(utc_now()), months_ahead)
+    created = []
+    while month <= last:
+        if partition_name(month) not in existing:
+            created.append(create_month_partition(conn, month))
+        month = add_months(month, 1)
+    return created
+
+def archive_partitions_before(conn, cutoff: datetime, tablespace: str = None) -> List[str]:
+    """Detach partitions that end on or before cutoff and move them to the archive schema
+
+    Archived months drop out of every query on appointments but remain
+    queryable as archive.appointments_pYYYYMM.
+    """
+    if not is_partitioned(conn):
+        return []
+
+    archived = []
+    for name in existing_partitions(conn):
+        year, month = (int(part) for part in _PARTITION_NAME.match(name).groups())
+        if add_months(datetime(year, month, 1, tzinfo=timezone.utc), 1) > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        if tablespace:
+            conn.execute(text(f"ALTER TABLE {ARCHIVE_SCHEMA}.{name} SET TABLESPACE {tablespace}"))
+        archived.append(name)
+    return archived
+
+def maintain_partitions(engine, months_ahead: int, archive_after_months: int = 0, tablespace: str = None):
+    """Create upcoming partitions and, if archive_after_months is set, archive old ones"""
+    with job_lock(engine, "maintain_partitions") as acquired, engine.begin() as conn:
+        if not acquired:
+            return [], []
+        created = ensure_partitions(conn, months_ahead)
+        archived = []
+        if archive_after_months > 0:
+            cutoff = add_months(month_start(utc_now()), -archive_after_months)
+            archived = archive_partitions_before(conn, cutoff, tablespace)
+            if archived:
+                # Archived appointments no longer count towards client_stats
+                rebuild_client_stats(conn)
+    return created, archived
+
+async def run_partition_job(engine, months_ahead: int, archive_after_months: int, tablespace: str, interval_seconds: float):
+    """Periodically keep the appointments partitions ahead of the calendar until cancelled"""
+    while True:
+        try:
+            created, archived = await asyncio.to_thread(
+                maintain_partitions, engine, months_ahead, archive_after_months, tablespace
+            )
+            if created:
+                logger.info(f"Created appointment partitions: {', '.join(created)}")
+            if archived:
+                logger.info(f"Archived appointment partitions: {', '.join(archived)}")
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(interval_seconds)
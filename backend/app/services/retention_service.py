@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from typing import Any, Dict
+
+from sqlalchemy import exists # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+
+from ..db.database import SessionLocal, engine
+from ..db.idempotency import purge_expired_idempotency_keys
+from ..db.locks import job_lock
+from ..models.models import Client, Appointment, ArchivedRecord
+from ..core.timeutils import utc_now
+
+logger = logging.getLogger(__name__)
+
+def _row_to_json(row) -> Dict[str, Any]:
+    """Column values of an ORM row as a JSON-serializable dict"""
+    data = {}
+    for column in row.__table__.columns:
+        value = getattr(row, column.key)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        data[column.name] = value
+    return data
+
+def _archive_batch(db: Session, model, cutoff: datetime, batch_size: int, *criteria) -> int:
+    """Copy one batch of expired soft-deleted rows into archived_records and delete them"""
+    rows = db.query(model).execution_options(include_inactive=True).filter(
+        model.is_active == False,
+        model.deleted_at < cutoff,
+        *criteria
+    ).limit(batch_size).all()
+    if not rows:
+        return 0
+
+    db.bulk_insert_mappings(ArchivedRecord, [
+        {
+            "table_name": model.__tablename__,
+            "record_id": row.id,
+            "data": _row_to_json(row),
+            "deleted_at": row.deleted_at,
+        }
+        for row in rows
+    ])
+    db.query(model).filter(model.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+    db.commit()
+    db.expunge_all()
+    return len(rows)
+
+def purge_soft_deleted(db: Session, retention_days: int, batch_size: int = 1000) -> Dict[str, int]:
+    """Archive and remove rows soft-deleted more than retention_days ago
+
+    Appointments go first so their clients can follow. Clients that still own
+    rows in appointments (live or within retention) are kept.
+    """
+    cutoff = utc_now() - timedelta(days=retention_days)
+    purged = {"appointments": 0, "clients": 0}
+
+    while True:
+        count = _archive_batch(db, Appointment, cutoff, batch_size)
+        purged["appointments"] += count
+        if count < batch_size:
+            break
+
+    has_appointments = exists().where(Appointment.client_id == Client.id)
+    while True:
+        count = _archive_batch(db, Client, cutoff, batch_size, ~has_appointments)
+        purged["clients"] += count
+        if count < batch_size:
+            break
+
+    return purged
+
+def _purge_once(retention_days: int) -> Dict[str, int]:
+    with job_lock(engine, "purge_soft_deleted") as acquired:
+        if not acquired:
+            return {"appointments": 0, "clients": 0}
+        db = SessionLocal()
+        try:
+            return purge_soft_deleted(db, retention_days)
+        finally:
+            db.close()
+
+def _purge_idempotency_keys_once() -> int:
+    with job_lock(engine, "purge_idempotency_keys") as acquired:
+        if not acquired:
+            return 0
+        db = SessionLocal()
+        try:
+            return purge_expired_idempotency_keys(db)
+        finally:
+            db.close()
+
+async def run_purge_job(retention_days: int, interval_seconds: float):
+    """Periodically archive expired soft-deleted rows until cancelled"""
+    while True:
+        try:
+            purged = await asyncio.to_thread(_purge_once, retention_days)
+            if purged["appointments"] or purged["clients"]:
+                logger.info(
+                    f"Archived {purged['appointments']} appointments and {purged['clients']} clients "
+                    f"soft-deleted more than {retention_days} days ago"
+                )
+        except Exception as e:
+            logger.error(f"Soft-delete purge failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+async def run_idempotency_purge_job(interval_seconds: float):
+    """Periodically delete expired idempotency keys until cancelled (independent of the soft-delete purge)"""
+    while True:
+        try:
+            purged = await asyncio.to_thread(_purge_idempotency_keys_once)
+            if purged:
+                logger.info(f"Removed {purged} expired idempotency keys")
+        except Exception as e:
+            logger.error(f"Idempotency key purge failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+if __name__ == "__main__":
+    # One-off run, e.g. from cron: python -m app.services.retention_service
+    from ..core.config import settings
+
+    logging.basicConfig(level=logging.INFO)
+    print({**_purge_once(settings.soft_delete_retention_days), "idempotency_keys": _purge_idempotency_keys_once()})
@@ -0,0 +1,157 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, time
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+from sqlalchemy.orm import Session # type: ignore
+
+from ..models.models import Appointment
+
+# Existing appointments are assumed to last 60 minutes (same as the conflict checks)
+APPOINTMENT_DURATION = timedelta(minutes=60)
+
+# Statuses that occupy a client's time
+BLOCKING_STATUSES = ["scheduled", "completed"]
+
+Interval = Tuple[datetime, datetime]
+
+def _blocking_appointments(db: Session, client_ids: List[str], range_start: datetime, range_end: datetime, *columns):
+    """Sorted range query for blocking appointments overlapping [range_start, range_end)"""
+    return db.query(*columns).filter(
+        Appointment.client_id.in_(client_ids),
+        Appointment.status.in_(BLOCKING_STATUSES),
+        Appointment.time < range_end,
+        Appointment.time > range_start - APPOINTMENT_DURATION
+    ).order_by(Appointment.time).all()
+
+def fetch_busy_times(
+    db: Session,
+    client_ids: List[str],
+    range_start: datetime,
+    range_end: datetime
+) -> Dict[str, List[datetime]]:
+    """Load the sorted start times of blocking appointments per client with one range query"""
+    rows = _blocking_appointments(db, client_ids, range_start, range_end, Appointment.client_id, Appointment.time)
+
+    busy_times: Dict[str, List[datetime]] = {client_id: [] for client_id in client_ids}
+    for client_id, start in rows:
+        busy_times[client_id].append(start)
+    return busy_times
+
+def merge_intervals(starts: List[datetime], duration: timedelta = APPOINTMENT_DURATION) -> List[Interval]:
+    """Merge sorted appointment start times into disjoint busy intervals"""
+    merged: List[Interval] = []
+    for start in starts:
+        end = start + duration
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def find_free_slots(
+    busy: List[Interval],
+    range_start: datetime,
+    range_end: datetime,
+    duration: timedelta,
+    work_start: time,
+    work_end: time,
+    step: timedelta,
+    include_weekends: bool = True,
+    zone: ZoneInfo = ZoneInfo("UTC")
+) -> List[Interval]:
+    """Sweep merged busy intervals against daily working windows and emit free slots
+
+    Days, weekends and working hours are those of zone; the range, busy
+    intervals and slots are UTC datetimes. Slots start on multiples of step
+    from the opening of each working window. busy must be sorted and
+    non-overlapping (see merge_intervals).
+    """
+    slots: List[Interval] = []
+    busy_index = 0
+    utc = range_start.tzinfo
+    day = range_start.astimezone(zone).date()
+
+    while datetime.combine(day, time(0), tzinfo=zone) < range_end:
+        if include_weekends or day.weekday() < 5:
+            window_open = datetime.combine(day, work_start, tzinfo=zone).astimezone(utc)
+            window_start = max(window_open, range_start)
+            window_end = min(datetime.combine(day, work_end, tzinfo=zone).astimezone(utc), range_end)
+
+            # Skip busy intervals that end before this window
+            while busy_index < len(busy) and busy[busy_index][1] <= window_start:
+                busy_index += 1
+
+            cursor = window_start
+            index = busy_index
+            while cursor < window_end:
+                gap_end = window_end
+                if index < len(busy) and busy[index][0] < window_end:
+                    gap_end = min(busy[index][0], window_end)
+
+                # Align the first slot of the gap to the step grid of the window
+                offset = (cursor - window_open) % step
+                slot_start = cursor if not offset else cursor + (step - offset)
+                while slot_start + duration <= gap_end:
+                    slots.append((slot_start, slot_start + duration))
+                    slot_start += step
+
+                if gap_end >= window_end:
+                    break
+                cursor = busy[index][1]
+                index += 1
+
+        day += timedelta(days=1)
+
+    return slots
+
+class IntervalIndex:
+    """Per-client sorted start times answering overlap queries with bisect
+
+    Every indexed appointment lasts APPOINTMENT_DURATION, so an appointment
+    starting at t overlaps [start, end) exactly when start - duration < t < end,
+    which is a contiguous run of the sorted start times.
+    """
+
+    def __init__(self):
+        self._starts: Dict[str, List[datetime]] = {}
+        self._appointments: Dict[str, List[Tuple[str, datetime, str]]] = {}
+
+    @classmethod
+    def build(cls, db: Session, client_ids: List[str], range_start: datetime, range_end: datetime) -> "IntervalIndex":
+        """Index all blocking appointments of client_ids overlapping the range with one query"""
+        index = cls()
+        rows = _blocking_appointments(
+            db, client_ids, range_start, range_end,
+            Appointment.client_id, Appointment.id, Appointment.time, Appointment.status
+        )
+        for client_id, appointment_id, start, status in rows:
+            index.add(client_id, appointment_id, start, status)
+        return index
+
+    def add(self, client_id: str, appointment_id: str, start: datetime, status: str = "scheduled"):
+        """Insert an appointment keeping the per-client lists sorted"""
+        starts = self._starts.setdefault(client_id, [])
+        appointments = self._appointments.setdefault(client_id, [])
+        position = bisect_right(starts, start)
+        starts.insert(position, start)
+        appointments.insert(position, (appointment_id, start, status))
+
+    def overlapping(
+        self,
+        client_id: str,
+        start: datetime,
+        end: datetime,
+        exclude_appointment_id: Optional[str] = None
+    ) -> List[Tuple[str, datetime, str]]:
+        """Return (id, time, status) of indexed appointments overlapping [start, end)"""
+        starts = self._starts.get(client_id)
+        if not starts:
+            return []
+        low = bisect_right(starts, start - APPOINTMENT_DURATION)
+        high = bisect_left(starts, end)
+        return [
+            appointment
+            for appointment in self._appointments[client_id][low:high]
+            if appointment[0] != exclude_appointment_id
+        ]
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import func, select # type: ignore
+from sqlalchemy.orm import Session # type: ignore
+
+from ..core.timeutils import ensure_utc
+
+GRANULARITIES = ("hour", "day", "week", "month")
+
+# Upper bound on buckets per response (a year of hourly buckets fits)
+MAX_BUCKETS = 10000
+
+def resolve_timezone(name: str) -> ZoneInfo:
+    """Return the ZoneInfo for an IANA name, raising ValueError if it is unknown"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+def truncate(moment: datetime, granularity: str) -> datetime:
+    """Truncate a naive local datetime to the start of its bucket (weeks start on Monday)"""
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def _next_bucket(bucket: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return bucket + timedelta(hours=1)
+    if granularity == "day":
+        return bucket + timedelta(days=1)
+    if granularity == "week":
+        return bucket + timedelta(weeks=1)
+    return (bucket + timedelta(days=32)).replace(day=1)
+
+def bucket_series(start: datetime, end: datetime, granularity: str) -> List[datetime]:
+    """Generate every bucket start between two naive local datetimes"""
+    buckets = []
+    bucket = truncate(start, granularity)
+    while bucket <= end:
+        buckets.append(bucket)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"Too many buckets; use a coarser granularity than '{granularity}'")
+        bucket = _next_bucket(bucket, granularity)
+    return buckets
+
+def _to_local(moment: datetime, zone: ZoneInfo) -> datetime:
+    """Convert a UTC datetime (naive values are taken as UTC) to naive wall-clock time in zone"""
+    return ensure_utc(moment).astimezone(zone).replace(tzinfo=None)
+
+def _sqlite_hour_shift(start: datetime, end: datetime, zone: ZoneInfo) -> int:
+    """Minutes past the UTC hour at which local hours start in zone between start and end
+
+    Shifting UTC by this many minutes before grouping by hour makes every
+    group fall inside one local hour, also for offsets like +5:30 and +5:45.
+    Raises ValueError when it changes within the range (e.g. Lord Howe's
+    30-minute DST), which SQLite's hourly grouping cannot represent.
+    """
+    shifts = set()
+    moment = ensure_utc(start)
+    while True:
+        shifts.add(-int(moment.astimezone(zone).utcoffset().total_seconds() // 60) % 60)
+        if moment >= ensure_utc(end):
+            break
+        # DST lasts months, so checking daily does not miss a period
+        moment = min(moment + timedelta(days=1), ensure_utc(end))
+    if len(shifts) > 1:
+        raise ValueError(f"Timezone {zone.key} changes its minute offset in this range, which is only supported on PostgreSQL")
+    return shifts.pop()
+
+def bucketed_counts(
+    db: Session,
+    column,
+    start: datetime,
+    end: datetime,
+    granularity: str,
+    zone: ZoneInfo,
+    aggregates: List
+) -> List[Tuple[datetime, List[int]]]:
+    """Group rows by time bucket in SQL and return a gap-free series of aggregate values
+
+    start and end are UTC datetimes; buckets are naive local times in zone.
+    Postgres buckets with date_trunc in the target zone. SQLite has no timezone
+    support, so rows are grouped in SQL by UTC hour shifted to the zone's
+    minute offset (one group per hour of data, up to 8,784 for a year) and
+    the groups are re-bucketed in local time here.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularity must be one of: {', '.join(GRANULARITIES)}")
+
+    series = bucket_series(_to_local(start, zone), _to_local(end, zone), granularity)
+    totals: Dict[datetime, List[int]] = {bucket: [0] * len(aggregates) for bucket in series}
+
+    if db.get_bind().dialect.name == "postgresql":
+        bucket_expression = func.date_trunc(granularity, func.timezone(zone.key, column))
+    else:
+        shift = _sqlite_hour_shift(start, end, zone)
+        bucket_expression = func.strftime("%Y-%m-%d %H:00:00", column, f"-{shift} minutes")
+
+    rows = db.execute(
+        select(bucket_expression, *aggregates)
+        .where(column >= start, column <= end)
+        .group_by(bucket_expression)
+    ).all()
+
+    for bucket, *values in rows:
+        if isinstance(bucket, str):
+            group_start = datetime.fromisoformat(bucket) + timedelta(minutes=shift)
+            bucket = truncate(_to_local(group_start, zone), granularity)
+        if bucket not in totals:
+            continue
+        current = totals[bucket]
+        for i, value in enumerate(values):
+            current[i] += int(value or 0)
+
+    return [(bucket, totals[bucket]) for bucket in series]
@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for the Virtual Wellness Platform backend.
+
+Run from the backend directory; see TESTING_GUIDE.md for the commands.
+"""
@@ -0,0 +1,96 @@
+"""
+Compare the columnar analytics path with the per-object loops it replaced.
+
+Loads N synthetic appointments (default 1M) into a SQLite file and times
+the appointment performance report computed both ways, end to end
+(fetch + compute) and compute-only.
+
+    python -m benchmarks.bench_analytics --rows 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+def legacy_performance(appointments):
+    """The original implementation: ORM objects and one pass per figure"""
+    total_appointments = len(appointments)
+    completed = len([apt for apt in appointments if apt.status == "completed"])
+    cancelled = len([apt for apt in appointments if apt.status == "cancelled"])
+    no_show = len([apt for apt in appointments if apt.status == "no-show"])
+    scheduled = len([apt for apt in appointments if apt.status == "scheduled"])
+    morning = len([apt for apt in appointments if 6 <= apt.time.hour < 12])
+    afternoon = len([apt for apt in appointments if 12 <= apt.time.hour < 18])
+    evening = len([apt for apt in appointments if 18 <= apt.time.hour < 22])
+    return {
+        "totals": {
+            "total_appointments": total_appointments,
+            "completed": completed,
+            "cancelled": cancelled,
+            "no_show": no_show,
+            "scheduled": scheduled,
+        },
+        "time_distribution": {"morning": morning, "afternoon": afternoon, "evening": evening},
+    }
+
+def _best_of(repeat, func):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark columnar vs per-object analytics")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--clients", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or "sqlite:///" + os.path.join(tempfile.gettempdir(), "wellness_bench_analytics.db")
+    os.environ["DATABASE_URL"] = database_url
+
+    from sqlalchemy import create_engine # type: ignore
+    from sqlalchemy.orm import sessionmaker # type: ignore
+    from app.models.models import Base, Appointment
+    from app.services.analytics_service import fetch_status_hour_columns, compute_performance
+    from .datagen import populate
+
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    print(f"Generating {args.rows} appointments...")
+    populate(engine, args.clients, args.rows)
+    db = sessionmaker(bind=engine)()
+
+    def legacy_end_to_end():
+        db.expunge_all()
+        return legacy_performance(db.query(Appointment).all())
+
+    def columnar_end_to_end():
+        return compute_performance(*fetch_status_hour_columns(db))
+
+    legacy_time, legacy_result = _best_of(args.repeat, legacy_end_to_end)
+    columnar_time, columnar_result = _best_of(args.repeat, columnar_end_to_end)
+    assert legacy_result["totals"] == columnar_result["totals"]
+    assert legacy_result["time_distribution"] == columnar_result["time_distribution"]
+
+    objects = db.query(Appointment).all()
+    columns = fetch_status_hour_columns(db)
+    legacy_compute, _ = _best_of(args.repeat, lambda: legacy_performance(objects))
+    columnar_compute, _ = _best_of(args.repeat, lambda: compute_performance(*columns))
+
+    print(f"\nAppointment performance report over {args.rows} rows (best of {args.repeat})")
+    print(f"{'':<22}{'per-object':>12}{'columnar':>12}{'speedup':>10}")
+    print(f"{'fetch + compute (s)':<22}{legacy_time:>12.3f}{columnar_time:>12.3f}{legacy_time / columnar_time:>9.1f}x")
+    print(f"{'compute only (s)':<22}{legacy_compute:>12.4f}{columnar_compute:>12.4f}{legacy_compute / columnar_compute:>9.1f}x")
+
+    db.close()
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
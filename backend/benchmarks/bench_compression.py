@@ -0,0 +1,91 @@
+"""
+Bytes on the wire and compression CPU cost per endpoint.
+
+Generates a benchmark database, requests each endpoint through the app
+(CompressionMiddleware included) with identity, gzip and, when brotli is
+installed, br, and reports the transferred bytes and the CPU time spent
+compressing each body.
+
+    python -m benchmarks.bench_compression --clients 2000 --appointments 20000
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+ENDPOINTS = [
+    "/api/clients/",
+    "/api/clients/export/csv",
+    "/api/appointments/",
+    "/api/appointments/?fields=time,status,client.name",
+    "/api/analytics/dashboard",
+    "/api/analytics/reports/client-activity",
+    "/api/analytics/reports/appointment-performance",
+]
+
+def _cpu_ms(compress, body: bytes, repeat: int) -> float:
+    """Median CPU time in ms to compress body"""
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        compress(body)
+        samples.append((time.process_time() - start) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure response compression per endpoint")
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--appointments", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    database_url = args.database_url or "sqlite:///" + os.path.join(tempfile.gettempdir(), "wellness_bench_compression.db")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SEED_DEMO_DATA", "false")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    from sqlalchemy import create_engine # type: ignore
+    from starlette.testclient import TestClient # type: ignore
+    from app.core.compression import _Compressor, brotli
+    from app.core.config import settings
+    from app.main import app
+    from app.models.models import Base
+    from .datagen import populate
+
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(bind=engine)
+    print(f"Generating {args.clients} clients and {args.appointments} appointments...")
+    populate(engine, args.clients, args.appointments)
+    engine.dispose()
+
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    if brotli is None:
+        print("brotli is not installed; reporting gzip only")
+
+    def compress_with(encoding):
+        return lambda body: _Compressor(
+            encoding, settings.compression_gzip_level, settings.compression_brotli_quality
+        ).finish(body)
+
+    header = f"{'endpoint':<52}{'identity':>12}"
+    for encoding in encodings:
+        header += f"{encoding + ' bytes':>14}{'ratio':>8}{'cpu ms':>9}"
+    print("\n" + header)
+
+    with TestClient(app) as client:
+        for endpoint in ENDPOINTS:
+            identity = client.get(endpoint, headers={"Accept-Encoding": "identity"})
+            line = f"{endpoint:<52}{identity.num_bytes_downloaded:>12,}"
+            for encoding in encodings:
+                response = client.get(endpoint, headers={"Accept-Encoding": encoding})
+                wire = response.num_bytes_downloaded
+                ratio = identity.num_bytes_downloaded / wire if wire else 0.0
+                cpu = _cpu_ms(compress_with(encoding), identity.content, args.repeat)
+                line += f"{wire:>14,}{ratio:>7.1f}x{cpu:>9.2f}"
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Sparse fieldsets on wide rows: GET /api/appointments/ with every field vs a
+table-view projection (fields=time,status,client.name).
+
+Each appointment and client gets a long notes value and appointments a
+large recurring_pattern for the duration of the run (rolled back
+afterwards). extra_info records the bytes of column data fetched from the
+database and the response payload size for each case.
+
+    pytest benchmarks/bench_fieldsets.py -o addopts="" --benchmark-columns=min,mean,rounds
+"""
+
+import os
+
+import pytest # type: ignore
+from sqlalchemy import update # type: ignore
+
+from app.api import appointments
+from app.core.serialization import select_fields
+from app.models.models import Appointment, Client
+
+NOTE_BYTES = int(os.getenv("BENCH_NOTE_BYTES", "1000"))
+TABLE_VIEW = "time,status,client.name"
+
+@pytest.fixture
+def wide_db(db):
+    db.execute(update(Client).values(notes="n" * NOTE_BYTES))
+    db.execute(update(Appointment).values(
+        notes="n" * NOTE_BYTES,
+        recurring_pattern={"frequency": "weekly", "exceptions": [f"2025-01-{day:02d}" for day in range(1, 29)]}
+    ))
+    return db
+
+def _fetched_bytes(db, fields) -> int:
+    """Size of the column values the endpoint's query reads for fields"""
+    keys, nested = select_fields(fields, appointments.APPOINTMENT_COLUMNS, {"client": appointments.CLIENT_COLUMNS})
+    columns = [appointments.APPOINTMENT_COLUMNS[key] for key in keys]
+    columns += [appointments.CLIENT_COLUMNS[key] for key in nested.get("client", [])]
+    query = db.query(*columns).select_from(Appointment)
+    if nested.get("client"):
+        query = query.outerjoin(Appointment.client)
+    return sum(len(str(value)) for row in query.all() for value in row if value is not None)
+
+def _list(run_async, db, fields):
+    return run_async(lambda: appointments.get_appointments(
+        client_id=None, status=None, date_from=None, date_to=None, is_recurring=None, fields=fields, if_none_match=None, db=db
+    ))
+
+@pytest.mark.parametrize("fields", [None, TABLE_VIEW], ids=["all_fields", "table_view"])
+def test_get_appointments_fields(benchmark, wide_db, run_async, fields):
+    response = benchmark(_list, run_async, wide_db, fields)
+    benchmark.extra_info["fetched_bytes"] = _fetched_bytes(wide_db, fields)
+    benchmark.extra_info["payload_bytes"] = len(response.body)
+    print(f"\n{fields or 'all fields'}: fetched {benchmark.extra_info['fetched_bytes']:,} B, "
+          f"payload {benchmark.extra_info['payload_bytes']:,} B")
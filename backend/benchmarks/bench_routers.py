@@ -0,0 +1,216 @@
+"""
+pytest-benchmark micro-benchmarks for every router function.
+
+Router functions are awaited directly with explicit arguments, so these
+numbers cover query and Python work but not HTTP or response-model
+serialization (see load_test.py for end-to-end latency).
+
+    pytest benchmarks/bench_routers.py -o addopts="" --benchmark-sort=mean
+"""
+
+import itertools
+import uuid
+from datetime import datetime, timedelta, time, timezone
+
+import pytest # type: ignore
+from fastapi import Response # type: ignore
+
+from app.api import analytics, appointments, clients
+from app.models.models import Appointment  # noqa: E402
+from app.models.schemas import (
+    ClientCreate, ClientUpdate, AppointmentCreate, AppointmentUpdate, BatchConflictCheck, ConflictCheckCandidate
+)
+
+# c0 is the busiest client in the skewed distribution
+HEAVY_CLIENT = "c0"
+
+_counter = itertools.count()
+
+@pytest.fixture
+def heavy_appointment_id(db):
+    return db.query(Appointment.id).filter(Appointment.client_id == HEAVY_CLIENT).first()[0]
+
+# Clients router
+
+def test_get_clients(benchmark, db, run_async):
+    benchmark(run_async, lambda: clients.get_clients(
+        search=None, status=None, created_after=None, created_before=None, fields=None, if_none_match=None, db=db
+    ))
+
+def test_get_clients_search(benchmark, db, run_async):
+    benchmark(run_async, lambda: clients.get_clients(
+        search="hassan", status="active", created_after=None, created_before=None, fields=None, if_none_match=None, db=db
+    ))
+
+def test_export_clients_csv(benchmark, db, run_async):
+    async def export():
+        response = await clients.export_clients_csv(status=None, db=db)
+        return [chunk async for chunk in response.body_iterator]
+    benchmark(run_async, export)
+
+def test_get_client_analytics(benchmark, db, run_async):
+    benchmark(run_async, lambda: clients.get_client_analytics(db=db))
+
+def test_create_client(benchmark, db, run_async):
+    def create():
+        n = next(_counter)
+        return clients.create_client(
+            ClientCreate(name="Bench Client", email=f"bench.{n}.{uuid.uuid4().hex[:8]}@example.com"), db=db
+        )
+    benchmark(run_async, create)
+
+def test_get_client(benchmark, db, run_async):
+    benchmark(run_async, lambda: clients.get_client(HEAVY_CLIENT, Response(), if_none_match=None, db=db))
+
+def test_update_client(benchmark, db, run_async):
+    benchmark(run_async, lambda: clients.update_client(
+        HEAVY_CLIENT, ClientUpdate(notes=f"updated {next(_counter)}"), db=db
+    ))
+
+def test_delete_client(benchmark, db, run_async):
+    def setup():
+        email = f"delete.{uuid.uuid4().hex}@example.com"
+        client = run_async(lambda: clients.create_client(ClientCreate(name="To Delete", email=email), db=db))
+        return (client.id,), {}
+
+    def delete(client_id):
+        return run_async(lambda: clients.delete_client(client_id, db=db))
+
+    benchmark.pedantic(delete, setup=setup, rounds=50)
+
+def test_get_client_appointments(benchmark, db, run_async):
+    benchmark(run_async, lambda: clients.get_client_appointments(HEAVY_CLIENT, fields=None, if_none_match=None, db=db))
+
+def test_get_single_client_analytics(benchmark, db, run_async):
+    benchmark(run_async, lambda: clients.get_single_client_analytics(HEAVY_CLIENT, db=db))
+
+# Appointments router
+
+def test_get_appointments(benchmark, db, run_async):
+    benchmark(run_async, lambda: appointments.get_appointments(
+        client_id=None, status=None, date_from=None, date_to=None, is_recurring=None, fields=None, if_none_match=None, db=db
+    ))
+
+def test_get_appointments_not_modified(benchmark, db, run_async):
+    def get(if_none_match):
+        return run_async(lambda: appointments.get_appointments(
+            client_id=None, status=None, date_from=None, date_to=None, is_recurring=None, fields=None,
+            if_none_match=if_none_match, db=db
+        ))
+    etag = get(None).headers["etag"]
+    response = benchmark(get, etag)
+    assert response.status_code == 304
+
+def test_get_appointments_week(benchmark, db, run_async):
+    now = datetime.now(timezone.utc)
+    benchmark(run_async, lambda: appointments.get_appointments(
+        client_id=None, status="scheduled", date_from=now, date_to=now + timedelta(days=7),
+        is_recurring=None, fields=None, if_none_match=None, db=db
+    ))
+
+def test_check_appointment_conflicts(benchmark, db, run_async):
+    benchmark(run_async, lambda: appointments.check_appointment_conflicts(
+        HEAVY_CLIENT, datetime.now(timezone.utc) + timedelta(days=3), appointment_duration=60,
+        exclude_appointment_id=None, db=db
+    ))
+
+def _batch_candidates(count=2000):
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return [
+        ConflictCheckCandidate(client_id=f"c{i % 50}", time=start + timedelta(hours=i % 500))
+        for i in range(count)
+    ]
+
+def test_check_batch_conflicts_2000(benchmark, db, run_async):
+    batch = BatchConflictCheck(candidates=_batch_candidates())
+    benchmark(run_async, lambda: appointments.check_batch_conflicts(batch, db=db))
+
+def test_check_conflicts_one_by_one_2000(benchmark, db):
+    # Baseline for the batch endpoint: one conflict query per candidate
+    candidates = _batch_candidates()
+
+    def check_all():
+        return [
+            appointments._check_appointment_conflicts_internal(c.client_id, c.time, 60, None, db)
+            for c in candidates
+        ]
+    benchmark.pedantic(check_all, rounds=3)
+
+def test_get_availability_week(benchmark, db, run_async):
+    now = datetime.now(timezone.utc)
+    benchmark(run_async, lambda: appointments.get_availability(
+        client_id=[HEAVY_CLIENT, "c1"], date_from=now, date_to=now + timedelta(days=7), duration=60,
+        work_start=time(9, 0), work_end=time(17, 0), slot_interval=30, include_weekends=True, tz="UTC", db=db
+    ))
+
+def test_get_appointment_analytics(benchmark, db, run_async):
+    benchmark(run_async, lambda: appointments.get_appointment_analytics(date_from=None, date_to=None, db=db))
+
+def test_get_appointment_trends(benchmark, db, run_async):
+    benchmark(run_async, lambda: appointments.get_appointment_trends(days=30, granularity="day", tz="UTC", db=db))
+
+def test_create_appointment(benchmark, db, run_async):
+    base_time = datetime.now(timezone.utc) + timedelta(days=400)
+
+    def create():
+        n = next(_counter)
+        return appointments.create_appointment(
+            AppointmentCreate(client_id=HEAVY_CLIENT, time=base_time + timedelta(hours=2 * n)), db=db
+        )
+    benchmark(run_async, create)
+
+def test_create_recurring_appointments(benchmark, db, run_async):
+    base_time = datetime.now(timezone.utc) + timedelta(days=800)
+
+    def create():
+        n = next(_counter)
+        return appointments.create_recurring_appointments(
+            AppointmentCreate(client_id=HEAVY_CLIENT, time=base_time + timedelta(hours=2 * n)),
+            {"frequency": "weekly", "count": 4}, db=db
+        )
+    benchmark(run_async, create)
+
+def test_get_appointment(benchmark, db, run_async, heavy_appointment_id):
+    benchmark(run_async, lambda: appointments.get_appointment(heavy_appointment_id, Response(), if_none_match=None, db=db))
+
+def test_update_appointment(benchmark, db, run_async, heavy_appointment_id):
+    benchmark(run_async, lambda: appointments.update_appointment(
+        heavy_appointment_id, AppointmentUpdate(notes=f"updated {next(_counter)}"), db=db
+    ))
+
+def test_delete_appointment(benchmark, db, run_async):
+    base_time = datetime.now(timezone.utc) + timedelta(days=1200)
+
+    def setup():
+        n = next(_counter)
+        appointment = run_async(lambda: appointments.create_appointment(
+            AppointmentCreate(client_id=HEAVY_CLIENT, time=base_time + timedelta(hours=2 * n)), db=db
+        ))
+        return (appointment.id,), {}
+
+    def delete(appointment_id):
+        return run_async(lambda: appointments.delete_appointment(appointment_id, db=db))
+
+    benchmark.pedantic(delete, setup=setup, rounds=50)
+
+def test_get_pending_reminders(benchmark, db, run_async):
+    benchmark(run_async, lambda: appointments.get_pending_reminders(db=db))
+
+def test_send_appointment_reminder(benchmark, db, run_async, heavy_appointment_id):
+    benchmark(run_async, lambda: appointments.send_appointment_reminder(heavy_appointment_id, db=db))
+
+# Analytics router
+
+def test_get_dashboard_analytics(benchmark, db, run_async):
+    benchmark(run_async, lambda: analytics.get_dashboard_analytics(db=db))
+
+def test_get_system_trends(benchmark, db, run_async):
+    benchmark(run_async, lambda: analytics.get_system_trends(days=30, granularity="day", tz="UTC", db=db))
+
+def test_get_client_activity_report(benchmark, db, run_async):
+    benchmark(run_async, lambda: analytics.get_client_activity_report(
+        client_id=None, date_from=None, date_to=None, db=db
+    ))
+
+def test_get_appointment_performance_report(benchmark, db, run_async):
+    benchmark(run_async, lambda: analytics.get_appointment_performance_report(date_from=None, date_to=None, db=db))
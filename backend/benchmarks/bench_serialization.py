@@ -0,0 +1,78 @@
+"""
+Serialization cost of the appointment list per 10k rows (appointments with
+their client nested, as GET /api/appointments/ returns them).
+
+- pydantic_json: ORM objects validated against AppointmentWithClient, dumped
+  to JSON-ready data and encoded with json.dumps (the former default path)
+- pydantic_orjson: the same with orjson (APIJSONResponse, the new default)
+- row_tuples: column tuples turned into dicts and encoded with orjson
+  (rows_response, the list endpoints' fast path)
+
+The serialize group times encoding only, from rows already in memory; the
+fetch_serialize group includes the query.
+
+    pytest benchmarks/bench_serialization.py -o addopts="" --benchmark-group-by=group
+"""
+
+import json
+import os
+from typing import List
+
+import orjson # type: ignore
+import pytest # type: ignore
+from pydantic import TypeAdapter # type: ignore
+from sqlalchemy.orm import joinedload # type: ignore
+
+from app.api.appointments import APPOINTMENT_COLUMNS, CLIENT_COLUMNS
+from app.core.serialization import ORJSON_OPTIONS, rows_to_dicts
+from app.models.models import Appointment
+from app.models.schemas import AppointmentWithClient
+
+ROWS = int(os.getenv("BENCH_SERIALIZE_ROWS", "10000"))
+
+APPOINTMENT_KEYS = list(APPOINTMENT_COLUMNS)
+CLIENT_KEYS = list(CLIENT_COLUMNS)
+
+_adapter = TypeAdapter(List[AppointmentWithClient])
+
+def _fetch_objects(db):
+    return db.query(Appointment).options(joinedload(Appointment.client)).order_by(Appointment.time).limit(ROWS).all()
+
+def _fetch_rows(db):
+    return db.query(*APPOINTMENT_COLUMNS.values(), *CLIENT_COLUMNS.values()).outerjoin(Appointment.client).order_by(Appointment.time).limit(ROWS).all()
+
+def _pydantic_json(objects) -> bytes:
+    return json.dumps(_adapter.dump_python(_adapter.validate_python(objects, from_attributes=True), mode="json")).encode()
+
+def _pydantic_orjson(objects) -> bytes:
+    return orjson.dumps(_adapter.dump_python(_adapter.validate_python(objects, from_attributes=True), mode="json"), option=ORJSON_OPTIONS)
+
+def _row_tuples(rows) -> bytes:
+    return orjson.dumps(rows_to_dicts(rows, APPOINTMENT_KEYS, {"client": CLIENT_KEYS}), option=ORJSON_OPTIONS)
+
+def test_paths_agree(db):
+    """The fast path must produce the same JSON as the response model"""
+    assert json.loads(_row_tuples(_fetch_rows(db))) == json.loads(_pydantic_json(_fetch_objects(db)))
+
+@pytest.mark.benchmark(group="serialize")
+def test_serialize_pydantic_json(benchmark, db):
+    benchmark(_pydantic_json, _fetch_objects(db))
+
+@pytest.mark.benchmark(group="serialize")
+def test_serialize_pydantic_orjson(benchmark, db):
+    benchmark(_pydantic_orjson, _fetch_objects(db))
+
+@pytest.mark.benchmark(group="serialize")
+def test_serialize_row_tuples(benchmark, db):
+    benchmark(_row_tuples, _fetch_rows(db))
+
+@pytest.mark.benchmark(group="fetch_serialize")
+def test_fetch_serialize_pydantic_json(benchmark, db):
+    def run():
+        db.expunge_all()
+        return _pydantic_json(_fetch_objects(db))
+    benchmark(run)
+
+@pytest.mark.benchmark(group="fetch_serialize")
+def test_fetch_serialize_row_tuples(benchmark, db):
+    benchmark(lambda: _row_tuples(_fetch_rows(db)))
@@ -0,0 +1,156 @@
+"""
+Cold-start time of the API: import cost of app.main (python -X importtime)
+and wall time from process launch until /health answers.
+
+    python -m benchmarks.bench_startup --database-url sqlite:///./bench.db --runs 5
+
+With --max-import-ms / --max-startup-ms the script exits non-zero when the
+median exceeds the budget, and it always fails if importing app.main loads
+one of LAZY_MODULES, so CI can catch startup regressions:
+
+    python -m benchmarks.bench_startup --import-only --max-import-ms 1500
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Optional subsystems that must load on first use, not when a worker boots
+LAZY_MODULES = (
+    "httpx",                            # external API client
+    "numpy",                            # performance report
+    "uvicorn",                          # only for python -m app.main
+    "app.services.analytics_service",
+    "app.core.security",
+)
+
+def _env(database_url: str) -> Dict[str, str]:
+    return dict(os.environ, DATABASE_URL=database_url, PYTHONPATH=BACKEND_DIR)
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) for each line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((module.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def import_profile(database_url: str, module: str = "app.main") -> List[Tuple[str, int, int]]:
+    """Import module in a fresh interpreter with -X importtime and return the parsed rows"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=_env(database_url),
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+def total_import_ms(rows: List[Tuple[str, int, int]], module: str = "app.main") -> float:
+    for name, _, cumulative_us in rows:
+        if name.strip() == module:
+            return cumulative_us / 1000
+    raise ValueError(f"{module} not found in importtime output")
+
+def eager_imports(rows: List[Tuple[str, int, int]], modules=LAZY_MODULES) -> List[str]:
+    """Which of modules were imported"""
+    imported = {name.strip() for name, _, _ in rows}
+    return [module for module in modules if module in imported]
+
+def _depth(name: str) -> int:
+    return (len(name) - len(name.lstrip(" ")) - 1) // 2
+
+def direct_imports(rows: List[Tuple[str, int, int]], limit: int, module: str = "app.main") -> List[Tuple[str, float]]:
+    """Most expensive imports made directly by module, by cumulative time
+
+    importtime lists modules in post-order, so a module's imports are the
+    deeper-indented lines right before it.
+    """
+    index = next(i for i, (name, _, _) in enumerate(rows) if name.strip() == module)
+    depth = _depth(rows[index][0])
+    children = []
+    for name, _, cumulative_us in reversed(rows[:index]):
+        if _depth(name) <= depth:
+            break
+        if _depth(name) == depth + 1:
+            children.append((name.strip(), cumulative_us / 1000))
+    return sorted(children, key=lambda row: row[1], reverse=True)[:limit]
+
+def time_to_ready(database_url: str, port: int, timeout: float = 60.0) -> float:
+    """Seconds from launching uvicorn until /health returns 200"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=_env(database_url),
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - start < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server exited during startup with code {process.returncode}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                        return time.perf_counter() - start
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError("Server did not become ready in time")
+    finally:
+        process.terminate()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API import and cold-start time")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--top", type=int, default=15, help="Number of imports to list")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import of app.main exceeds this")
+    parser.add_argument("--max-startup-ms", type=float, help="Fail if the median time to ready exceeds this")
+    parser.add_argument("--import-only", action="store_true", help="Skip launching the server")
+    args = parser.parse_args()
+
+    import_times = []
+    rows = []
+    for _ in range(args.runs):
+        rows = import_profile(args.database_url)
+        import_times.append(total_import_ms(rows))
+    import_median = statistics.median(import_times)
+    print(f"\nimport app.main: median {import_median:.0f} ms (min {min(import_times):.0f}, max {max(import_times):.0f})")
+
+    startup_median = None
+    if not args.import_only:
+        startup_times = [time_to_ready(args.database_url, args.port) * 1000 for _ in range(args.runs)]
+        startup_median = statistics.median(startup_times)
+        print(f"launch to ready: median {startup_median:.0f} ms (min {min(startup_times):.0f}, max {max(startup_times):.0f})")
+    print(f"\nSlowest imports made by app.main (last run)")
+    for name, cumulative_ms in direct_imports(rows, args.top):
+        print(f"{name:<50}{cumulative_ms:>9.1f} ms")
+
+    failures = []
+    eager = eager_imports(rows)
+    if eager:
+        failures.append(f"imported at startup instead of lazily: {', '.join(eager)}")
+    if args.max_import_ms is not None and import_median > args.max_import_ms:
+        failures.append(f"import {import_median:.0f} ms > budget {args.max_import_ms:.0f} ms")
+    if args.max_startup_ms is not None and startup_median is not None and startup_median > args.max_startup_ms:
+        failures.append(f"startup {startup_median:.0f} ms > budget {args.max_startup_ms:.0f} ms")
+    if failures:
+        print("\nBudget exceeded: " + "; ".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Throughput of the production launcher as the number of workers grows.
+
+Starts gunicorn (gunicorn.conf.py) once per worker count against the same
+database, drives the weighted load scenario from benchmarks.load_test and
+stops the server with SIGTERM, checking that it drains and exits cleanly.
+
+    python -m benchmarks.datagen --database-url sqlite:///./bench.db --clients 2000 --appointments 50000
+    python -m benchmarks.bench_workers --database-url sqlite:///./bench.db --workers 1 2 4 8
+
+Use Postgres for meaningful numbers above a couple of workers; SQLite
+serializes writers and the load is mostly reads, but it still shares one file.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from .load_test import OVERALL, run_load, _client_ids
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _start_server(workers: int, port: int, database_url: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        WEB_CONCURRENCY=str(workers),
+        PORT=str(port),
+        HOST="127.0.0.1",
+        ACCESS_LOG="",
+        LOG_LEVEL="warning",
+        RATE_LIMIT_ENABLED="false",  # one load generator would otherwise be throttled
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn.conf.py"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+def _wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready in time")
+
+def _stop_server(process: subprocess.Popen, timeout: float = 60.0) -> float:
+    """SIGTERM the server and return how long the graceful shutdown took"""
+    start = time.perf_counter()
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        raise RuntimeError("Server did not shut down within the graceful timeout")
+    if process.returncode != 0:
+        raise RuntimeError(f"Server exited with code {process.returncode} on SIGTERM")
+    return time.perf_counter() - start
+
+def run(workers_list: List[int], database_url: str, port: int, duration: float, concurrency: int) -> List[Dict[str, float]]:
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+    for workers in workers_list:
+        process = _start_server(workers, port, database_url)
+        try:
+            _wait_until_ready(base_url, process)
+            client_ids = asyncio.run(_client_ids(base_url))
+            report = asyncio.run(run_load(base_url, duration, concurrency, client_ids))
+        except Exception:
+            process.kill()
+            process.wait()
+            raise
+        shutdown_seconds = _stop_server(process)
+
+        overall = report[OVERALL]
+        results.append({
+            "workers": workers,
+            "rps": overall["rps"],
+            "p50_ms": overall["p50_ms"],
+            "p95_ms": overall["p95_ms"],
+            "errors": overall["errors"],
+            "shutdown_seconds": shutdown_seconds,
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure throughput against the number of gunicorn workers")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    workers_list = sorted(set(args.workers))
+    results = run(workers_list, args.database_url, args.port, args.duration, args.concurrency)
+
+    baseline = results[0]["rps"] or 1.0
+    print(f"\nWorker scaling ({os.cpu_count()} CPUs, concurrency {args.concurrency})")
+    print(f"{'workers':>8}{'rps':>10}{'speedup':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}{'shutdown s':>12}")
+    for row in results:
+        print(
+            f"{row['workers']:>8}{row['rps']:>10.1f}{row['rps'] / baseline:>9.2f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['errors']:>8}{row['shutdown_seconds']:>12.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
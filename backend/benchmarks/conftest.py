@@ -0,0 +1,49 @@
+import asyncio
+import os
+import tempfile
+
+import pytest # type: ignore
+
+# Point the app at the benchmark database before any app module is imported
+_default_url = "sqlite:///" + os.path.join(tempfile.gettempdir(), "wellness_bench.db")
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL", _default_url)
+os.environ["DATABASE_URL"] = BENCH_DATABASE_URL
+
+BENCH_CLIENTS = int(os.getenv("BENCH_CLIENTS", "2000"))
+BENCH_APPOINTMENTS = int(os.getenv("BENCH_APPOINTMENTS", "50000"))
+
+@pytest.fixture(scope="session")
+def bench_engine():
+    """Engine for a freshly generated benchmark database"""
+    from sqlalchemy import create_engine # type: ignore
+    from app.models.models import Base
+    from .datagen import populate
+
+    engine = create_engine(BENCH_DATABASE_URL)
+    Base.metadata.drop_all(bind=engine)
+    populate(engine, BENCH_CLIENTS, BENCH_APPOINTMENTS)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(bench_engine):
+    """Session bound to the benchmark database, rolled back after each benchmark"""
+    from sqlalchemy.orm import sessionmaker # type: ignore
+
+    session = sessionmaker(bind=bench_engine, autocommit=False, autoflush=False)()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+@pytest.fixture(scope="session")
+def run_async():
+    """Run a coroutine factory to completion on a shared event loop"""
+    loop = asyncio.new_event_loop()
+
+    def run(factory):
+        return loop.run_until_complete(factory())
+
+    yield run
+    loop.close()
@@ -0,0 +1,171 @@
+"""
+Synthetic data generator for benchmarks and load tests.
+
+Produces reproducible (seeded) clients and appointments with realistic
+skew: a small share of clients books most appointments, bookings cluster
+on weekdays and business hours, and status depends on whether the
+appointment lies in the past or the future.
+
+Usage:
+    python -m benchmarks.datagen --database-url sqlite:///./bench.db \
+        --clients 100000 --appointments 2000000
+"""
+
+import argparse
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List
+
+FIRST_NAMES = [
+    "John", "Jane", "Ahmed", "Fatima", "Omar", "Aisha", "Ali", "Sara", "Hassan", "Zara",
+    "Michael", "Emily", "David", "Maria", "Yusuf", "Layla", "Daniel", "Noor", "James", "Hana",
+]
+LAST_NAMES = [
+    "Doe", "Smith", "Hassan", "Ali", "Khan", "Ahmed", "Sadiq", "Brown", "Garcia", "Malik",
+    "Wilson", "Rahman", "Taylor", "Hussain", "Clark", "Iqbal", "Lewis", "Chaudhry", "Walker", "Butt",
+]
+
+CLIENT_STATUSES = ["active", "inactive", "pending"]
+CLIENT_STATUS_WEIGHTS = [80, 15, 5]
+
+PAST_STATUSES = ["completed", "cancelled", "no-show", "scheduled"]
+PAST_STATUS_WEIGHTS = [70, 15, 10, 5]
+FUTURE_STATUSES = ["scheduled", "cancelled"]
+FUTURE_STATUS_WEIGHTS = [90, 10]
+
+# Booking hours 07:00-21:00, peaking late morning and after work
+BOOKING_HOURS = list(range(7, 22))
+BOOKING_HOUR_WEIGHTS = [2, 6, 10, 12, 12, 8, 7, 9, 10, 9, 8, 9, 7, 4, 2]
+
+# Mon..Sun
+WEEKDAY_WEIGHTS = [18, 18, 18, 18, 15, 8, 5]
+
+def generate_clients(count: int, seed: int = 42, now: datetime = None) -> Iterator[Dict[str, Any]]:
+    """Yield client rows with signup dates spread over the last three years"""
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc)
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        created_at = now - timedelta(days=(rng.random() ** 1.5) * 3 * 365, seconds=rng.randrange(86400))
+        yield {
+            "id": f"c{i}",
+            "name": f"{first} {last}",
+            "email": f"{first.lower()}.{last.lower()}.{i}@example.com",
+            "phone": f"{rng.randrange(10**9, 10**10)}",
+            "status": rng.choices(CLIENT_STATUSES, CLIENT_STATUS_WEIGHTS)[0],
+            "notes": rng.choice([None, None, None, "Prefers evening sessions", "Referred by a friend"]),
+            "created_at": created_at,
+            "updated_at": None,
+            "is_active": True,
+        }
+
+def _pick_day(rng: random.Random, start: datetime, days: int) -> datetime:
+    """Pick a day in [start, start + days) weighted by weekday"""
+    while True:
+        day = start + timedelta(days=rng.randrange(days))
+        if rng.random() * max(WEEKDAY_WEIGHTS) < WEEKDAY_WEIGHTS[day.weekday()]:
+            return day
+
+def generate_appointments(
+    count: int,
+    client_count: int,
+    seed: int = 42,
+    now: datetime = None,
+    past_days: int = 365,
+    future_days: int = 60
+) -> Iterator[Dict[str, Any]]:
+    """Yield appointment rows skewed towards a small set of frequent clients"""
+    rng = random.Random(seed + 1)
+    now = (now or datetime.now(timezone.utc)).replace(minute=0, second=0, microsecond=0)
+    start = (now - timedelta(days=past_days)).replace(hour=0)
+    total_days = past_days + future_days
+    for i in range(count):
+        # Squaring a uniform sample makes low client indexes far more frequent
+        client_index = int((rng.random() ** 2) * client_count)
+        day = _pick_day(rng, start, total_days)
+        hour = rng.choices(BOOKING_HOURS, BOOKING_HOUR_WEIGHTS)[0]
+        appointment_time = day.replace(hour=hour, minute=rng.choice([0, 0, 15, 30, 45]))
+        if appointment_time < now:
+            status = rng.choices(PAST_STATUSES, PAST_STATUS_WEIGHTS)[0]
+        else:
+            status = rng.choices(FUTURE_STATUSES, FUTURE_STATUS_WEIGHTS)[0]
+        is_recurring = rng.random() < 0.2
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "client_id": f"c{client_index}",
+            "time": appointment_time,
+            "status": status,
+            "notes": rng.choice([None, None, "Follow-up session", "Initial consultation"]),
+            "is_recurring": is_recurring,
+            "recurring_pattern": {"frequency": "weekly", "count": 4} if is_recurring else None,
+            "reminder_sent": status != "scheduled",
+            "reminder_time": appointment_time - timedelta(hours=24),
+            "created_at": appointment_time - timedelta(days=rng.randrange(1, 30)),
+            "updated_at": None,
+            "is_active": True,
+        }
+
+def _batches(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def populate(engine, clients: int, appointments: int, seed: int = 42, batch_size: int = 10000) -> Dict[str, float]:
+    """Create the schema on engine and bulk-load synthetic rows, returning timings"""
+    from app.models.models import Base, Client, Appointment
+    from app.services.client_stats_service import rebuild_client_stats
+
+    Base.metadata.create_all(bind=engine)
+    now = datetime.now(timezone.utc)
+    timings = {}
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for batch in _batches(generate_clients(clients, seed, now), batch_size):
+            conn.execute(Client.__table__.insert(), batch)
+    timings["clients_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        for batch in _batches(generate_appointments(appointments, clients, seed, now), batch_size):
+            conn.execute(Appointment.__table__.insert(), batch)
+    timings["appointments_seconds"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        rebuild_client_stats(conn)
+    timings["client_stats_seconds"] = time.perf_counter() - start
+
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic clients and appointments")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", "sqlite:///./bench.db"))
+    parser.add_argument("--clients", type=int, default=100000)
+    parser.add_argument("--appointments", type=int, default=2000000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    # The app's engine is built from DATABASE_URL at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    from sqlalchemy import create_engine # type: ignore
+
+    engine = create_engine(args.database_url)
+    timings = populate(engine, args.clients, args.appointments, args.seed, args.batch_size)
+    print(
+        f"Inserted {args.clients} clients in {timings['clients_seconds']:.1f}s and "
+        f"{args.appointments} appointments in {timings['appointments_seconds']:.1f}s"
+    )
+
+if __name__ == "__main__":
+    main()
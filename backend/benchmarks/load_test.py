@@ -0,0 +1,139 @@
+"""
+httpx-based load scenario reporting p50/p95/p99 latency per endpoint.
+
+Start the API against the database under test (SQLite or a local
+Postgres loaded with benchmarks.datagen) with RATE_LIMIT_ENABLED=false, so
+the single load generator is not throttled, then run:
+
+    python -m benchmarks.load_test --base-url http://localhost:8000 \
+        --duration 30 --concurrency 32 --label postgres
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+# Report row aggregating every endpoint
+OVERALL = "ALL"
+
+def _scenario(client_ids: List[str]) -> List[Tuple[str, int, Callable[[], Tuple[str, str]]]]:
+    """Weighted (name, weight, request factory) list modelled on the frontend's traffic"""
+    def client_id():
+        return random.choice(client_ids)
+
+    def next_week():
+        start = datetime.utcnow()
+        return start.isoformat(), (start + timedelta(days=7)).isoformat()
+
+    return [
+        ("GET /api/clients/", 10, lambda: ("GET", "/api/clients/")),
+        ("GET /api/clients/?search", 5, lambda: ("GET", "/api/clients/?search=hassan")),
+        ("GET /api/clients/{id}", 15, lambda: ("GET", f"/api/clients/{client_id()}")),
+        ("GET /api/clients/{id}/appointments", 10, lambda: ("GET", f"/api/clients/{client_id()}/appointments")),
+        ("GET /api/clients/{id}/analytics", 5, lambda: ("GET", f"/api/clients/{client_id()}/analytics")),
+        ("GET /api/appointments/ (week)", 15, lambda: (
+            "GET", "/api/appointments/?date_from={}&date_to={}".format(*next_week())
+        )),
+        ("GET /api/appointments/conflicts", 10, lambda: (
+            "GET", f"/api/appointments/conflicts?client_id={client_id()}"
+                   f"&appointment_time={(datetime.utcnow() + timedelta(days=2)).isoformat()}"
+        )),
+        ("GET /api/appointments/reminders/pending", 3, lambda: ("GET", "/api/appointments/reminders/pending")),
+        ("GET /api/analytics/dashboard", 5, lambda: ("GET", "/api/analytics/dashboard")),
+        ("GET /api/analytics/trends", 2, lambda: ("GET", "/api/analytics/trends?days=30")),
+        ("GET /api/analytics/reports/appointment-performance", 1, lambda: (
+            "GET", "/api/analytics/reports/appointment-performance"
+        )),
+    ]
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+async def run_load(base_url: str, duration: float, concurrency: int, client_ids: List[str]) -> Dict[str, Dict[str, float]]:
+    """Drive the weighted scenario for duration seconds and collect latencies"""
+    scenario = _scenario(client_ids)
+    names = [name for name, _, _ in scenario]
+    weights = [weight for _, weight, _ in scenario]
+    factories = {name: factory for name, _, factory in scenario}
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    deadline = time.perf_counter() + duration
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        async def worker():
+            while time.perf_counter() < deadline:
+                name = random.choices(names, weights)[0]
+                method, url = factories[name]()
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, url)
+                    if response.status_code >= 500:
+                        errors[name] += 1
+                except httpx.HTTPError:
+                    errors[name] += 1
+                latencies[name].append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    report = {}
+    rows = [(name, latencies[name], errors[name]) for name in names]
+    rows.append((OVERALL, [value for name in names for value in latencies[name]], sum(errors.values())))
+    for name, values, error_count in rows:
+        values = sorted(values)
+        if not values:
+            continue
+        report[name] = {
+            "requests": len(values),
+            "errors": error_count,
+            "rps": len(values) / duration,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return report
+
+def print_report(report: Dict[str, Dict[str, float]], label: str):
+    print(f"\nLoad test results ({label})")
+    print(f"{'endpoint':<52}{'reqs':>7}{'err':>5}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, row in report.items():
+        print(
+            f"{name:<52}{row['requests']:>7}{row['errors']:>5}{row['rps']:>8.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+        )
+
+async def _client_ids(base_url: str) -> List[str]:
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+        response = await client.get("/api/clients/")
+        response.raise_for_status()
+        return [row["id"] for row in response.json()][:1000] or ["1"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a weighted load scenario against the API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--label", default="default", help="Name for this run, e.g. sqlite or postgres")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    client_ids = asyncio.run(_client_ids(args.base_url))
+    report = asyncio.run(run_load(args.base_url, args.duration, args.concurrency, client_ids))
+    print_report(report, args.label)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"label": args.label, "results": report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Production server configuration.
+
+    gunicorn app.main:app -c gunicorn.conf.py
+
+Gunicorn manages the worker processes; each worker runs the app on uvicorn
+with uvloop and httptools (both come with uvicorn[standard]). On SIGTERM the
+master stops accepting connections and every worker finishes its in-flight
+requests and runs the app's lifespan shutdown within graceful_timeout.
+"""
+
+import multiprocessing
+import os
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+
+# One async worker per CPU; WEB_CONCURRENCY overrides (e.g. for containers with CPU quotas)
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "app.server.UvicornWorker"
+
+# Workers log to stdout for the platform to collect: a rotating LOG_FILE must not be
+# shared by several processes (set it only with per-process or external rotation)
+os.environ.setdefault("LOG_FILE", "")
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+
+# Must exceed SHUTDOWN_DRAIN_SECONDS so the lifespan shutdown can complete
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+
+# Proxies whose X-Forwarded-For/-Proto uvicorn applies to request.client and the scheme
+# (comma-separated IPs, or * when only the platform proxy can reach the app)
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+accesslog = os.getenv("ACCESS_LOG", "-") or None  # empty disables the access log
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+def post_fork(server, worker):
+    # Pooled connections opened in the master while preloading must not be shared
+    from app.db.database import engine, replica_engines
+
+    for pooled_engine in [engine, *replica_engines]:
+        pooled_engine.dispose(close=False)
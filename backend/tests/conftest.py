@@ -0,0 +1,23 @@
+import os
+import tempfile
+
+import pytest # type: ignore
+
+# Point the app at a throwaway database before any app module is imported
+TEST_DATABASE_PATH = os.path.join(tempfile.gettempdir(), "wellness_test.db")
+os.environ["DATABASE_URL"] = "sqlite:///" + TEST_DATABASE_PATH
+os.environ.setdefault("SEED_DEMO_DATA", "false")
+os.environ.setdefault("LOG_FILE", "")
+
+@pytest.fixture
+def client():
+    """Test client for the app on an empty database"""
+    from fastapi.testclient import TestClient # type: ignore
+    from app.db.database import engine
+    from app.main import app
+    from app.models.models import Base
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,15 @@
+def _create_appointments(client, count):
+    client_id = client.post("/api/clients/", json={"name": "Test Client", "email": "test@example.com"}).json()["id"]
+    return [
+        client.post("/api/appointments/", json={"client_id": client_id, "time": f"2026-03-0{day}T10:00:00Z"}).json()["id"]
+        for day in range(1, count + 1)
+    ]
+
+def test_performance_report_skips_deleted_appointments(client):
+    appointment_ids = _create_appointments(client, 2)
+    assert client.delete(f"/api/appointments/{appointment_ids[0]}").status_code == 200
+
+    report = client.get("/api/analytics/reports/appointment-performance").json()
+
+    assert report["performance_metrics"]["total_appointments"] == 1
+    assert report["performance_metrics"]["scheduled_appointments"] == 1
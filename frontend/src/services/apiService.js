@@ -5,6 +5,8 @@ class ApiService {
     this.retryAttempts = 3;
     this.retryDelay = 1000; // 1 second
     this.timeout = 30000; // 30 seconds
+    // Set by the API after our writes; sent back so our next reads see them (cookies don't cross sites)
+    this.primaryUntil = null;
   }
 
   // Retry logic with exponential backoff
@@ -15,8 +17,8 @@ class ApiService {
       } catch (error) {
         if (i === attempts - 1) throw error;
         
-        // Don't retry on client errors (4xx)
-        if (error.status >= 400 && error.status < 500) {
+        // Don't retry on client errors (4xx), except while an earlier attempt with the same Idempotency-Key is still running
+        if (error.status >= 400 && error.status < 500 && error.code !== 'IDEMPOTENCY_KEY_IN_PROGRESS') {
           throw error;
         }
         
@@ -38,12 +40,18 @@ class ApiService {
         signal: controller.signal,
         headers: {
           'Content-Type': 'application/json',
+          ...(this.primaryUntil ? { 'X-DB-Primary-Until': this.primaryUntil } : {}),
           ...options.headers,
         },
       });
 
       clearTimeout(timeoutId);
 
+      const primaryUntil = response.headers.get('X-DB-Primary-Until');
+      if (primaryUntil) {
+        this.primaryUntil = primaryUntil;
+      }
+
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({}));
         const error = new Error(errorData.error?.message || `HTTP ${response.status}`);
@@ -97,9 +105,12 @@ class ApiService {
   }
 
   async createClient(clientData) {
+    // One key for every attempt, so a retry after a lost response is not created twice
+    const idempotencyKey = crypto.randomUUID();
     return this.retryRequest(async () => {
       const response = await this.fetchWithTimeout(`${API_BASE_URL}/clients/`, {
         method: 'POST',
+        headers: { 'Idempotency-Key': idempotencyKey },
         body: JSON.stringify(clientData)
       });
       return response.json();
@@ -179,9 +190,12 @@ class ApiService {
   }
 
   async createAppointment(appointmentData) {
+    // One key for every attempt, so a retry after a lost response is not created twice
+    const idempotencyKey = crypto.randomUUID();
     return this.retryRequest(async () => {
       const response = await this.fetchWithTimeout(`${API_BASE_URL}/appointments/`, {
         method: 'POST',
+        headers: { 'Idempotency-Key': idempotencyKey },
         body: JSON.stringify(appointmentData)
       });
       return response.json();